@@ -0,0 +1,85 @@
+import os
+import time
+from collections import Counter
+
+# Окно, за которое ошибки сводятся в одно сообщение, с.
+ERROR_WINDOW = float(os.getenv('ERROR_WINDOW', 30 * 60))
+
+
+def minutes(seconds):
+    """Длительность в целых минутах, не меньше одной."""
+    return max(round(seconds / 60), 1)
+
+
+class ErrorAggregator:
+    """Сводит повторяющиеся ошибки в редкие сообщения.
+
+    О первой ошибке сбоя сообщается сразу, дальше ошибки считаются по
+    классам и не чаще раза в `window` секунд уходят одной сводкой
+    («GetApiError ×37 за последние 30 мин»). После первого успешного
+    опроса отправляется одно сообщение о восстановлении.
+
+    Методы `on_error` и `on_success` возвращают текст для отправки или
+    None; после успешной отправки нужно вызвать `sent`, иначе сообщение
+    будет предложено снова.
+    """
+
+    def __init__(self, window=ERROR_WINDOW, clock=time.monotonic):
+        """Агрегатор с окном сводки `window` секунд."""
+        self.window = window
+        self.clock = clock
+        self.counts = Counter()
+        self.total = 0
+        self.started = None
+        self.notified_at = None
+        self._recovering = False
+
+    def on_error(self, error):
+        """Учитывает ошибку; возвращает сообщение, если пора его отправить."""
+        now = self.clock()
+        self.counts[type(error).__name__] += 1
+        self.total += 1
+        self._recovering = False
+        if self.started is None:
+            self.started = now
+        if self.notified_at is None:
+            return str(error)
+        if now - self.notified_at >= self.window:
+            return self.summary(now)
+        return None
+
+    def on_success(self):
+        """Сообщение о восстановлении после сбоя или None."""
+        if self.started is None:
+            return None
+        if self.notified_at is None:
+            self.reset()
+            return None
+        self._recovering = True
+        duration = minutes(self.clock() - self.started)
+        return (
+            f'Работа восстановлена: {self.total} ошибок за {duration} мин'
+        )
+
+    def summary(self, now):
+        """Сводка ошибок, накопленных с последнего сообщения."""
+        counts = ', '.join(
+            f'{name} ×{count}' for name, count in self.counts.most_common()
+        )
+        return f'{counts} за последние {minutes(now - self.notified_at)} мин'
+
+    def sent(self):
+        """Отмечает, что последнее предложенное сообщение доставлено."""
+        if self._recovering:
+            self.reset()
+            return
+        self.notified_at = self.clock()
+        self.counts.clear()
+
+    def reset(self):
+        """Возвращает агрегатор в исходное состояние."""
+        self.counts.clear()
+        self.total = 0
+        self.started = None
+        self.notified_at = None
+        self._recovering = False
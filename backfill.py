@@ -0,0 +1,291 @@
+import argparse
+import calendar
+import logging
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import bootstrap  # noqa: F401 (.env до чтения настроек модулями)
+import engine
+import homework
+from log_config import setup_logging
+from status_index import date_code, homework_key
+from storage import STATE_DB
+from streaming import check_stream, get_api_stream
+from transport import PooledTransport
+
+BACKFILL_DB = os.getenv('BACKFILL_DB', STATE_DB or 'backfill.sqlite3')
+BACKFILL_WORKERS = int(os.getenv('BACKFILL_WORKERS', 8))
+WINDOW_DAYS = 30
+# Строк в одной транзакции, если окно не закрылось раньше.
+BATCH_SIZE = 500
+PROGRESS_INTERVAL = 5
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS history (
+    tenant TEXT NOT NULL,
+    homework TEXT NOT NULL,
+    status TEXT NOT NULL,
+    date_updated INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    message TEXT NOT NULL,
+    PRIMARY KEY (tenant, homework, status, date_updated)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS backfill_progress (
+    tenant TEXT PRIMARY KEY,
+    done_until INTEGER NOT NULL,
+    finished INTEGER NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+'''
+
+logger = logging.getLogger(__name__)
+
+
+def parse_date(value):
+    """Начало истории: секунды эпохи или дата вида 2023-01-31."""
+    if value.isdigit():
+        return int(value)
+    return calendar.timegm(time.strptime(value, '%Y-%m-%d'))
+
+
+class HistoryStore:
+    """История статусов в SQLite с контрольными точками загрузки.
+
+    Каждое окно записывается одной транзакцией вместе с контрольной
+    точкой. Загруженные арендаторы при повторном запуске пропускаются;
+    прерванный арендатор продолжает с контрольной точки, а записанные
+    строки не дублируются благодаря INSERT OR IGNORE.
+    """
+
+    def __init__(self, path=BACKFILL_DB):
+        """Открывает базу истории и создаёт таблицы."""
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(SCHEMA)
+
+    def resume_point(self, tenant, from_date):
+        """С какой даты продолжать; None, если арендатор уже загружен."""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT done_until, finished FROM backfill_progress '
+                'WHERE tenant = ?', (tenant,)
+            ).fetchone()
+        if row is None:
+            return from_date
+        done_until, finished = row
+        return None if finished else max(done_until, from_date)
+
+    def ingest(self, tenant, rows, done_until, finished=False):
+        """Записывает окно истории и контрольную точку одной транзакцией."""
+        with self._lock, self._conn:
+            self._conn.executemany(
+                'INSERT OR IGNORE INTO history (tenant, homework, status, '
+                'date_updated, name, message) VALUES (?, ?, ?, ?, ?, ?)',
+                [(tenant, *row) for row in rows]
+            )
+            self._conn.execute(
+                'INSERT INTO backfill_progress (tenant, done_until, finished) '
+                'VALUES (?, ?, ?) ON CONFLICT(tenant) DO UPDATE SET '
+                'done_until = excluded.done_until, '
+                'finished = excluded.finished',
+                (tenant, done_until, int(finished))
+            )
+
+    def count(self, tenant=None):
+        """Число записей истории (всех или одного арендатора)."""
+        query, args = 'SELECT COUNT(*) FROM history', ()
+        if tenant is not None:
+            query, args = query + ' WHERE tenant = ?', (tenant,)
+        with self._lock:
+            return self._conn.execute(query, args).fetchone()[0]
+
+    def close(self):
+        """Закрывает базу."""
+        with self._lock:
+            self._conn.close()
+
+
+class Progress:
+    """Счётчики загрузки и периодический отчёт о скорости."""
+
+    def __init__(self, tenants, interval=PROGRESS_INTERVAL):
+        """Счётчики для `tenants` арендаторов."""
+        self.tenants = tenants
+        self.interval = interval
+        self.done = 0
+        self.failed = 0
+        self.items = 0
+        self.skipped = 0
+        self.started = time.monotonic()
+        self._reported = self.started
+        self._lock = threading.Lock()
+
+    def add(self, items=0, skipped=0):
+        """Учитывает записанные и отброшенные дз."""
+        with self._lock:
+            self.items += items
+            self.skipped += skipped
+            if time.monotonic() - self._reported >= self.interval:
+                self._reported = time.monotonic()
+                logger.info(self.line())
+
+    def finish(self, failed=False):
+        """Учитывает завершённого арендатора."""
+        with self._lock:
+            self.done += 1
+            self.failed += failed
+
+    def line(self):
+        """Строка отчёта о ходе загрузки."""
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        return (
+            f'{self.done}/{self.tenants} арендаторов, {self.items} дз '
+            f'({self.items / elapsed:.0f} дз/с), отброшено {self.skipped}, '
+            f'ошибок {self.failed}'
+        )
+
+
+def validate(homeworks, progress=None):
+    """Строки истории из дз, прошедших parse_status, по одной.
+
+    Отброшенные дз учитываются в `progress`.
+    """
+    for item in homeworks:
+        try:
+            message = homework.parse_status(item)
+        except (AttributeError, KeyError, ValueError) as error:
+            logger.warning(f'Дз пропущена: {error}')
+            if progress is not None:
+                progress.add(skipped=1)
+            continue
+        yield (
+            str(homework_key(item)), item['status'],
+            date_code(item.get('date_updated')), item['homework_name'],
+            message,
+        )
+
+
+def windows(rows, start, window, size=BATCH_SIZE):
+    """Собирает поток строк в пачки: (контрольная точка, строки).
+
+    Пачка закрывается при смене окна по date_updated или по достижении
+    `size` строк, так что в памяти не больше одной пачки. Пока строки
+    идут по возрастанию даты, контрольная точка сдвигается к началу
+    текущего окна: всё более раннее уже записано. Если порядок нарушен,
+    она остаётся на `start` — повтор безопасен благодаря INSERT OR IGNORE.
+
+    API Практикума отдаёт дз от новых к старым, и `from_date` ограничивает
+    выборку только снизу, так что для его ответов точка не сдвигается:
+    прерванный арендатор загружается заново с начала, а возобновление
+    работает с точностью до арендатора.
+    """
+    batch, current, done_until, last = [], None, start, start
+    ordered = True
+    for row in rows:
+        number = max(row[2] - start, 0) // window
+        ordered = ordered and row[2] >= last
+        last = row[2]
+        done_until = start + number * window if ordered else start
+        if batch and (number != current or len(batch) >= size):
+            yield done_until, batch
+            batch = []
+        current = number
+        batch.append(row)
+    if batch:
+        yield done_until, batch
+
+
+def backfill_tenant(store, tenant, from_date, window, transport, progress):
+    """Загружает историю одного арендатора, продолжая с контрольной точки."""
+    start = store.resume_point(tenant.key, from_date)
+    if start is None:
+        logger.info(f'[{tenant.key}] История уже загружена')
+        return 0
+    # Ответ за годы истории разбирается потоком: в памяти только пачка.
+    stream = get_api_stream(start, tenant.headers, transport)
+    rows = validate(check_stream(stream), progress)
+    items = 0
+    for done_until, batch in windows(rows, start, window):
+        store.ingest(tenant.key, batch, done_until)
+        progress.add(len(batch))
+        items += len(batch)
+    store.ingest(tenant.key, (), stream.meta['current_date'], finished=True)
+    return items
+
+
+def run(tenants, store, from_date=0, window=WINDOW_DAYS * 86400,
+        workers=BACKFILL_WORKERS, transport=None):
+    """Загружает историю всех арендаторов параллельно."""
+    progress = Progress(len(tenants))
+    pool = ThreadPoolExecutor(workers, thread_name_prefix='backfill')
+    try:
+        futures = {
+            pool.submit(
+                backfill_tenant, store, tenant, from_date, window,
+                transport, progress
+            ): tenant
+            for tenant in tenants
+        }
+        for future in as_completed(futures):
+            error = future.exception()
+            if error is not None:
+                logger.error(f'[{futures[future].key}] Сбой загрузки: {error}')
+            progress.finish(failed=error is not None)
+    finally:
+        # При прерывании не начинаем новых арендаторов; записанные окна
+        # останутся, и повторный запуск продолжит с них.
+        pool.shutdown(cancel_futures=True)
+    logger.info(f'Загрузка завершена: {progress.line()}')
+    return progress
+
+
+def parse_args(argv=None):
+    """Параметры загрузки истории."""
+    parser = argparse.ArgumentParser(
+        description='Загрузка истории статусов дз в локальную базу.'
+    )
+    parser.add_argument('--from-date', type=parse_date, default=0,
+                        help='секунды эпохи или дата ГГГГ-ММ-ДД')
+    parser.add_argument('--window-days', type=float, default=WINDOW_DAYS,
+                        help='размер окна одной транзакции, дней')
+    parser.add_argument('--workers', type=int, default=BACKFILL_WORKERS)
+    parser.add_argument('--db', default=BACKFILL_DB)
+    parser.add_argument('--tenants-file', default=engine.TENANTS_FILE)
+    return parser.parse_args(argv)
+
+
+def load_tenants(path):
+    """Арендаторы из файла, а без него — токен из PRACTICUM."""
+    if os.path.exists(path):
+        return engine.load_tenants(path)
+    if not homework.PRACTICUM_TOKEN:
+        raise SystemExit('Нет ни файла арендаторов, ни токена PRACTICUM')
+    return [engine.Tenant(homework.PRACTICUM_TOKEN, homework.TELEGRAM_CHAT_ID)]
+
+
+def main(argv=None):
+    """Точка входа команды backfill."""
+    args = parse_args(argv)
+    tenants = load_tenants(args.tenants_file)
+    store = HistoryStore(args.db)
+    transport = PooledTransport(pool_maxsize=args.workers)
+    try:
+        progress = run(
+            tenants, store, args.from_date, int(args.window_days * 86400),
+            args.workers, transport
+        )
+    finally:
+        transport.close()
+        store.close()
+    print(progress.line())
+    return 1 if progress.failed else 0
+
+
+if __name__ == '__main__':
+    homework.configure()
+    setup_logging()
+    raise SystemExit(main())
@@ -0,0 +1,150 @@
+import argparse
+import asyncio
+import time
+import tracemalloc
+
+import telebot
+
+import bot_api
+import engine
+import homework
+from benchmarks.fake_servers import FakePracticum, FakeTelegram
+from delivery import SendQueue, percentile
+from scheduler import PollPolicy
+from transport import PooledTransport
+
+
+def parse_args(argv=None):
+    """Параметры нагрузки и заглушек."""
+    parser = argparse.ArgumentParser(
+        description='Нагрузочный тест цепочки get_api_answer → '
+                    'check_response → parse_status → send_message.'
+    )
+    parser.add_argument('--tenants', type=int, default=200)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--period', type=float, default=1,
+                        help='интервал опроса одного арендатора, с')
+    parser.add_argument('--max-in-flight', type=int, default=64)
+    parser.add_argument('--send-workers', type=int, default=8)
+    parser.add_argument('--practicum-latency', type=float, default=0.01)
+    parser.add_argument('--practicum-errors', type=float, default=0.0)
+    parser.add_argument('--payload-size', type=int, default=0,
+                        help='число неизменных дз в каждом ответе')
+    parser.add_argument('--change-rate', type=float, default=0.1)
+    parser.add_argument('--telegram-latency', type=float, default=0.01)
+    parser.add_argument('--telegram-errors', type=float, default=0.0)
+    parser.add_argument('--telegram-payload-size', type=int, default=0,
+                        help='число сущностей разметки в каждом ответе')
+    parser.add_argument('--client', choices=('pooled', 'telebot'),
+                        default='pooled',
+                        help='клиент Bot API: свой с пулом или telebot')
+    return parser.parse_args(argv)
+
+
+def make_tenants(args):
+    """Арендаторы с постоянным интервалом опроса без отступов."""
+    return [
+        engine.Tenant(
+            token=f'token-{number}', chat_id=str(number), timestamp=0,
+            policy=PollPolicy(args.period, fast=args.period,
+                              maximum=args.period, jitter=0),
+        )
+        for number in range(args.tenants)
+    ]
+
+
+def memory_per_tenant(args, bot, transport):
+    """Прирост памяти на арендатора после одного цикла опроса."""
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    polling = engine.PollingEngine(
+        make_tenants(args), bot, args.max_in_flight, args.period, transport
+    )
+
+    async def poll_all():
+        await asyncio.gather(*map(polling.poll_once, polling.tenants))
+
+    asyncio.run(poll_all())
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    grown = sum(stat.size_diff for stat in after.compare_to(before, 'lineno'))
+    return grown / args.tenants
+
+
+def throughput(args, bot, transport):
+    """Запускает движок на `duration` секунд."""
+    sender = SendQueue(
+        bot, workers=args.send_workers, global_rate=0, chat_rate=0
+    ).start()
+    polling = engine.PollingEngine(
+        make_tenants(args), bot, args.max_in_flight, args.period, transport,
+        sender=sender,
+    )
+
+    async def run_for():
+        try:
+            await asyncio.wait_for(polling.run(), args.duration)
+        except asyncio.TimeoutError:
+            pass
+
+    asyncio.run(run_for())
+    sender.stop(timeout=5)
+    return sender
+
+
+def main(argv=None):
+    """Запуск бенчмарка и печать отчёта."""
+    args = parse_args(argv)
+    practicum = FakePracticum(
+        args.practicum_latency, args.practicum_errors,
+        args.change_rate, args.payload_size,
+    ).start()
+    telegram = FakeTelegram(
+        practicum, args.telegram_latency, args.telegram_errors,
+        payload_size=args.telegram_payload_size,
+    ).start()
+    homework.ENDPOINT = practicum.endpoint
+    if args.client == 'telebot':
+        telebot.apihelper.API_URL = telegram.api_url
+        bot = telebot.TeleBot(token='1234:bench')
+    else:
+        bot = bot_api.TeleBot(
+            '1234:bench', api_url=telegram.api_url,
+            pool_maxsize=args.send_workers
+        )
+    transport = PooledTransport(pool_maxsize=args.max_in_flight)
+    try:
+        memory = memory_per_tenant(args, bot, transport)
+        practicum.requests = practicum.errors = 0
+        practicum.changes.clear()
+        telegram.latencies.clear()
+        started = time.monotonic()
+        sender = throughput(args, bot, transport)
+        elapsed = time.monotonic() - started
+    finally:
+        transport.close()
+        practicum.stop()
+        telegram.stop()
+    latencies = telegram.latencies
+    report = {
+        'tenants': args.tenants,
+        'polls': practicum.requests,
+        'polls/s': practicum.requests / elapsed,
+        'api errors': practicum.errors,
+        'telegram messages': telegram.messages,
+        'telegram 429': telegram.errors,
+        'e2e p50, ms': percentile(latencies, 0.5) * 1000,
+        'e2e p99, ms': percentile(latencies, 0.99) * 1000,
+        'memory/tenant, bytes': memory,
+        'send queue': sender.stats(),
+        'http pool': transport.stats(),
+    }
+    for name, value in report.items():
+        if isinstance(value, float):
+            value = f'{value:.1f}'
+        print(f'{name:>22}: {value}')
+    return report
+
+
+if __name__ == '__main__':
+    main()
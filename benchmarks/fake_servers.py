@@ -0,0 +1,210 @@
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+STATUSES = ('reviewing', 'approved', 'rejected')
+CHANGED_NAME = re.compile(r'"(hw-\d+\.zip)"')
+
+
+class FakeServer(ThreadingHTTPServer):
+    """Локальный HTTP-сервер с настраиваемой задержкой и долей ошибок."""
+
+    daemon_threads = True
+    handler = None
+
+    def __init__(self, latency=0.0, error_rate=0.0):
+        """Сервер на свободном порту localhost."""
+        super().__init__(('127.0.0.1', 0), self.handler)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self._thread = None
+
+    @property
+    def url(self):
+        """Базовый адрес сервера."""
+        return f'http://127.0.0.1:{self.server_port}'
+
+    def start(self):
+        """Запускает сервер в фоновом потоке."""
+        self._thread = threading.Thread(
+            target=self.serve_forever, daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Останавливает сервер."""
+        self.shutdown()
+        self.server_close()
+
+    def hit(self):
+        """Учитывает запрос, выдерживает задержку; True — ответить ошибкой."""
+        if self.latency:
+            time.sleep(self.latency)
+        failed = random.random() < self.error_rate
+        with self.lock:
+            self.requests += 1
+            self.errors += failed
+        return failed
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def reply(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class _PracticumHandler(_Handler):
+
+    def do_GET(self):
+        server = self.server
+        if server.hit():
+            self.reply(500, {'code': 'server_error'})
+            return
+        token = self.headers.get('Authorization', '')
+        self.reply(200, {
+            'homeworks': server.homeworks(token),
+            'current_date': int(time.time()),
+        })
+
+
+class FakePracticum(FakeServer):
+    """Заглушка эндпоинта `homework_statuses`.
+
+    С вероятностью `change_rate` на каждый запрос у студента меняется
+    статус очередной работы; время изменения запоминается в `changes`,
+    чтобы измерить задержку до сообщения в Telegram. `payload_size` —
+    число неизменившихся работ, добавляемых в каждый ответ.
+    """
+
+    handler = _PracticumHandler
+
+    def __init__(self, latency=0.0, error_rate=0.0, change_rate=0.1,
+                 payload_size=0):
+        """Заглушка с долей запросов `change_rate`, меняющих статус."""
+        super().__init__(latency, error_rate)
+        self.change_rate = change_rate
+        self.payload_size = payload_size
+        self.changes = {}
+        self._counter = 0
+
+    @property
+    def endpoint(self):
+        """Адрес, подставляемый в `homework.ENDPOINT`."""
+        return f'{self.url}/api/user_api/homework_statuses/'
+
+    def homeworks(self, token):
+        """Работы для ответа: новое изменение и балласт."""
+        homeworks = [
+            {
+                'id': -number,
+                'homework_name': f'old-{number}.zip',
+                'status': 'approved',
+                'reviewer_comment': 'Принято!',
+                'date_updated': '2021-04-11T10:31:09Z',
+                'lesson_name': 'Балласт',
+            }
+            for number in range(self.payload_size)
+        ]
+        if random.random() < self.change_rate:
+            with self.lock:
+                self._counter += 1
+                number = self._counter
+            name = f'hw-{number}.zip'
+            self.changes[name] = time.monotonic()
+            homeworks.insert(0, {
+                'id': number,
+                'homework_name': name,
+                'status': random.choice(STATUSES),
+                'reviewer_comment': '',
+                'date_updated': time.strftime('%Y-%m-%dT%H:%M:%SZ'),
+                'lesson_name': 'Бенчмарк',
+            })
+        return homeworks
+
+
+class _TelegramHandler(_Handler):
+
+    def do_POST(self):
+        server = self.server
+        length = int(self.headers.get('Content-Length') or 0)
+        params = parse_qs(urlsplit(self.path).query)
+        params.update(parse_qs(self.rfile.read(length).decode()))
+        if server.hit():
+            self.reply(429, {
+                'ok': False, 'error_code': 429,
+                'description': 'Too Many Requests: retry later',
+                'parameters': {'retry_after': server.retry_after},
+            })
+            return
+        chat_id = params.get('chat_id', ['0'])[0]
+        text = params.get('text', [''])[0]
+        server.received(chat_id, text)
+        self.reply(200, {'ok': True, 'result': {
+            'message_id': server.requests,
+            'date': int(time.time()),
+            'chat': {'id': int(chat_id), 'type': 'private'},
+            'text': text,
+            'entities': server.entities(text),
+        }})
+
+    do_GET = do_POST
+
+
+class FakeTelegram(FakeServer):
+    """Заглушка Bot API Telegram.
+
+    Принимает `sendMessage`, с долей `error_rate` отвечает 429 и считает
+    задержку от изменения статуса до доставки сообщения. `payload_size` —
+    число сущностей разметки, добавляемых в каждый ответ.
+    """
+
+    handler = _TelegramHandler
+
+    def __init__(self, practicum, latency=0.0, error_rate=0.0,
+                 retry_after=1, payload_size=0):
+        """Заглушка, сверяющая сообщения с изменениями `practicum`."""
+        super().__init__(latency, error_rate)
+        self.practicum = practicum
+        self.retry_after = retry_after
+        self.payload_size = payload_size
+        self.messages = 0
+        self.latencies = []
+
+    @property
+    def api_url(self):
+        """Шаблон адреса для `telebot.apihelper.API_URL`."""
+        return self.url + '/bot{0}/{1}'
+
+    def entities(self, text):
+        """Балласт ответа: разметка на весь текст сообщения."""
+        return [
+            {'type': 'bold', 'offset': 0, 'length': len(text)}
+            for _ in range(self.payload_size)
+        ]
+
+    def received(self, chat_id, text):
+        """Учитывает доставленное сообщение."""
+        now = time.monotonic()
+        with self.lock:
+            self.messages += 1
+            for name in CHANGED_NAME.findall(text):
+                changed = self.practicum.changes.pop(name, None)
+                if changed is not None:
+                    self.latencies.append(now - changed)
@@ -0,0 +1,85 @@
+import argparse
+import gc
+import random
+import tracemalloc
+
+from benchmarks.fake_servers import STATUSES
+from status_index import StatusIndex, homework_key
+
+
+def parse_args(argv=None):
+    """Размер состояния: число арендаторов и дз у каждого."""
+    parser = argparse.ArgumentParser(
+        description='Память на состояние опроса: копии словарей дз '
+                    'против компактного StatusIndex.'
+    )
+    parser.add_argument('--tenants', type=int, default=10000)
+    parser.add_argument('--homeworks', type=int, default=15,
+                        help='число дз у одного арендатора')
+    return parser.parse_args(argv)
+
+
+def make_response(tenant, count):
+    """Список дз в том виде, в каком его отдаёт API."""
+    return [
+        {
+            'id': tenant * 1000 + number,
+            'homework_name': f'student{tenant}__hw{number:02}.zip',
+            'status': random.choice(STATUSES),
+            'reviewer_comment': 'Работа проверена: есть замечания. ' * 3,
+            'date_updated': f'2023-0{number % 9 + 1}-1{number % 10}'
+                            f'T10:{number % 60:02}:09Z',
+            'lesson_name': f'Итоговый проект спринта {number}',
+        }
+        for number in range(count)
+    ]
+
+
+def dict_state(homeworks):
+    """Прежний подход: копия словаря каждой дз по её id."""
+    return {homework_key(hw): dict(hw) for hw in homeworks}
+
+
+def index_state(homeworks):
+    """Компактный индекс статусов."""
+    index = StatusIndex()
+    index.diff(homeworks)
+    return index
+
+
+def measure(build, args):
+    """Байт на арендатора, которые удерживает состояние."""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    states = [
+        build(make_response(tenant, args.homeworks))
+        for tenant in range(args.tenants)
+    ]
+    gc.collect()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    grown = sum(stat.size_diff for stat in after.compare_to(before, 'lineno'))
+    del states
+    return grown / args.tenants
+
+
+def main(argv=None):
+    """Запуск бенчмарка и печать отчёта."""
+    args = parse_args(argv)
+    report = {
+        'dict per homework': measure(dict_state, args),
+        'StatusIndex': measure(index_state, args),
+    }
+    for name, per_tenant in report.items():
+        print(
+            f'{name:>18}: {per_tenant:8.0f} B/tenant, '
+            f'{per_tenant / args.homeworks:6.0f} B/homework'
+        )
+    saved = 1 - report['StatusIndex'] / report['dict per homework']
+    print(f'{"saved":>18}: {saved:.0%}')
+    return report
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Тяжёлые зависимости, которые не должны загружаться при импорте модуля.
+HEAVY = ('requests', 'telebot', 'dotenv', 'urllib3', 'http.server')
+
+
+def parse_args(argv=None):
+    """Модуль, число замеров и допустимое время импорта."""
+    parser = argparse.ArgumentParser(
+        description='Время импорта модуля по отчёту python -X importtime.'
+    )
+    parser.add_argument('--module', default='homework')
+    parser.add_argument('--runs', type=int, default=7)
+    parser.add_argument('--top', type=int, default=10,
+                        help='сколько самых медленных модулей показать')
+    parser.add_argument('--max-ms', type=float, default=80,
+                        help='порог медианного времени импорта, мс')
+    return parser.parse_args(argv)
+
+
+def importtime(module):
+    """Замер одного холодного процесса: {модуль: (своё, всего)} в мкс.
+
+    Учитываются только модули, загруженные импортом `module`, без
+    запуска самого интерпретатора (site и кодеки).
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    timings = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        own, total, name = line[len('import time:'):].split('|')
+        if not own.strip().isdigit():
+            continue
+        if name == ' site':
+            timings.clear()
+            continue
+        timings[name.strip()] = (int(own), int(total))
+    return timings
+
+
+def measure(module, runs):
+    """Медиана времени импорта в мс и модули последнего замера."""
+    importtime(module)
+    samples = [importtime(module) for _ in range(runs)]
+    median = statistics.median(sample[module][1] for sample in samples)
+    return median / 1000, samples[-1]
+
+
+def main(argv=None):
+    """Печатает отчёт; код 1, если порог превышен или загружено лишнее."""
+    args = parse_args(argv)
+    median, timings = measure(args.module, args.runs)
+    slowest = sorted(timings.items(), key=lambda item: -item[1][0])
+    for name, (own, total) in slowest[:args.top]:
+        print(f'{own / 1000:8.1f} мс {total / 1000:8.1f} мс  {name}')
+    print(f'import {args.module}: {median:.1f} мс (медиана {args.runs} '
+          f'замеров, порог {args.max_ms:.0f} мс)')
+    heavy = [name for name in HEAVY if name in timings]
+    if heavy:
+        print(f'Загружены при импорте: {", ".join(heavy)}')
+    return 1 if heavy or median > args.max_ms else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
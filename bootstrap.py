@@ -0,0 +1,24 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def is_entry_point():
+    """Запущен ли процесс одним из скриптов проекта."""
+    path = getattr(sys.modules.get('__main__'), '__file__', None)
+    return path is not None and os.path.dirname(os.path.abspath(path)) == ROOT
+
+
+def load_env():
+    """Переносит переменные из .env в окружение, не перезаписывая их."""
+    from dotenv import load_dotenv
+
+    load_dotenv()
+
+
+# Настройки модулей читаются из окружения при импорте, поэтому точки
+# входа импортируют bootstrap раньше остальных модулей проекта. Импорт
+# из тестов и чужого кода .env не трогает.
+if is_entry_point():
+    load_env()
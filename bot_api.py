@@ -0,0 +1,93 @@
+import os
+import threading
+
+from delivery import SEND_WORKERS
+from exceptions import SendError, TelegramError
+from lazy import lazy_import
+
+requests = lazy_import('requests')
+
+# Шаблон адреса метода, как `telebot.apihelper.API_URL`: токен и метод.
+API_URL = os.getenv(
+    'TELEGRAM_API_URL', 'https://api.telegram.org/bot{0}/{1}'
+)
+CONNECT_TIMEOUT = float(os.getenv('CONNECT_TIMEOUT', 5))
+TELEGRAM_TIMEOUT = float(os.getenv('TELEGRAM_TIMEOUT', 30))
+
+
+class TeleBot:
+    """Минимальный клиент Bot API вместо `telebot.TeleBot`.
+
+    Умеет только `send_message` с той же сигнатурой. Все потоки отправки
+    работают через одну сессию с пулом на `pool_maxsize` соединений,
+    поэтому воркеры `SendQueue` шлют в разные чаты параллельно без
+    нового TLS-рукопожатия на каждое сообщение. Ошибки Telegram
+    поднимаются как `TelegramError` с кодом и `parameters` ответа,
+    сетевые — как `SendError`.
+    """
+
+    def __init__(self, token, api_url=API_URL, pool_maxsize=SEND_WORKERS,
+                 timeout=(CONNECT_TIMEOUT, TELEGRAM_TIMEOUT)):
+        """Клиент бота с токеном `token` и пулом соединений."""
+        self.token = token
+        self.api_url = api_url
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=1, pool_maxsize=pool_maxsize, pool_block=True
+        )
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.sent = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def call(self, method, **params):
+        """Вызывает метод Bot API и возвращает поле `result` ответа."""
+        try:
+            response = self.session.post(
+                self.api_url.format(self.token, method), data=params,
+                timeout=self.timeout
+            )
+        except requests.RequestException as error:
+            self._count(failed=True)
+            # В тексте ошибки requests есть адрес, а в нём — токен бота.
+            raise SendError(
+                f'Bot API недоступен: {str(error).replace(self.token, "***")}'
+            ) from None
+        try:
+            result_json = response.json()
+        except ValueError:
+            self._count(failed=True)
+            raise TelegramError(
+                f'Bot API вернул не JSON, код {response.status_code}',
+                response.status_code
+            ) from None
+        if not result_json.get('ok'):
+            self._count(failed=True)
+            raise TelegramError(
+                f'{method}: {result_json.get("description")}',
+                result_json.get('error_code', response.status_code),
+                result_json
+            )
+        self._count(failed=False)
+        return result_json.get('result')
+
+    def send_message(self, chat_id, text, **kwargs):
+        """Отправляет текстовое сообщение в чат."""
+        return self.call('sendMessage', chat_id=chat_id, text=text, **kwargs)
+
+    def _count(self, failed):
+        with self._lock:
+            if failed:
+                self.errors += 1
+            else:
+                self.sent += 1
+
+    def stats(self):
+        """Число успешных и неудачных вызовов Bot API."""
+        return {'sent': self.sent, 'errors': self.errors}
+
+    def close(self):
+        """Закрывает соединения пула."""
+        self.session.close()
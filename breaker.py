@@ -0,0 +1,120 @@
+import logging
+import os
+import threading
+import time
+from http import HTTPStatus
+
+from exceptions import CircuitOpenError, EndpointError, GetApiError
+
+FAILURE_THRESHOLD = int(os.getenv('BREAKER_FAILURES', 5))
+RECOVERY_TIMEOUT = float(os.getenv('BREAKER_RECOVERY', 60))
+MAX_RECOVERY_TIMEOUT = float(os.getenv('BREAKER_MAX_RECOVERY', 900))
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+logger = logging.getLogger(__name__)
+
+
+def is_endpoint_failure(error):
+    """Говорит ли ошибка о недоступности эндпоинта, а не о токене."""
+    if isinstance(error, GetApiError):
+        return True
+    if isinstance(error, EndpointError):
+        code = error.status_code
+        return (code is None or code >= HTTPStatus.INTERNAL_SERVER_ERROR
+                or code == HTTPStatus.TOO_MANY_REQUESTS)
+    return False
+
+
+class CircuitBreaker:
+    """Общий для всех арендаторов предохранитель эндпоинта.
+
+    После `failure_threshold` сбоев подряд размыкается: запросы не
+    выполняются `recovery_timeout` секунд. Затем пропускает ровно один
+    пробный запрос; успех замыкает цепь, сбой снова размыкает её с
+    удвоенным (до `max_recovery_timeout`) временем ожидания.
+    """
+
+    def __init__(self, failure_threshold=FAILURE_THRESHOLD,
+                 recovery_timeout=RECOVERY_TIMEOUT,
+                 max_recovery_timeout=MAX_RECOVERY_TIMEOUT,
+                 clock=time.monotonic):
+        """Предохранитель в закрытом состоянии."""
+        self.failure_threshold = failure_threshold
+        self.base_timeout = recovery_timeout
+        self.max_timeout = max(max_recovery_timeout, recovery_timeout)
+        self.recovery_timeout = recovery_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+
+    def allow(self):
+        """Можно ли выполнить запрос; в полуоткрытом состоянии — один."""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and self.remaining() == 0:
+                self.state = HALF_OPEN
+                logger.info('Предохранитель: пробный запрос к эндпоинту')
+                return True
+            return False
+
+    def blocked(self):
+        """Отклонит ли предохранитель запрос прямо сейчас."""
+        return self.state == HALF_OPEN or self.remaining() > 0
+
+    def remaining(self):
+        """Секунд до пробного запроса (0, если цепь не разомкнута)."""
+        if self.state != OPEN:
+            return 0
+        left = self.opened_at + self.recovery_timeout - self._clock()
+        return max(left, 0)
+
+    def record(self, error=None):
+        """Учитывает результат запроса."""
+        if error is not None and is_endpoint_failure(error):
+            self._failure()
+        else:
+            self._success()
+
+    def _success(self):
+        with self._lock:
+            if self.state != CLOSED:
+                logger.info('Предохранитель замкнут: эндпоинт доступен')
+            self.state = CLOSED
+            self.failures = 0
+            self.recovery_timeout = self.base_timeout
+
+    def _failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN:
+                self.recovery_timeout = min(
+                    self.recovery_timeout * 2, self.max_timeout
+                )
+            elif self.failures < self.failure_threshold:
+                return
+            self.state = OPEN
+            self.opened_at = self._clock()
+            logger.warning(
+                f'Предохранитель разомкнут на {self.recovery_timeout:.0f} с '
+                f'после {self.failures} сбоев подряд'
+            )
+
+    def call(self, func, *args, **kwargs):
+        """Выполняет запрос через предохранитель."""
+        if not self.allow():
+            raise CircuitOpenError(
+                'Запросы к эндпоинту приостановлены предохранителем'
+            )
+        try:
+            result = func(*args, **kwargs)
+        except Exception as error:
+            self.record(error)
+            raise
+        self.record()
+        return result
@@ -0,0 +1,196 @@
+import logging
+import math
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+# База аренд; все реплики должны видеть один и тот же файл.
+LEASE_DB = os.getenv('LEASE_DB', '')
+LEASE_TTL = float(os.getenv('LEASE_TTL', 30))
+REPLICA_ID = os.getenv(
+    'REPLICA_ID', f'{os.getenv("DYNO", socket.gethostname())}:{os.getpid()}'
+)
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS replicas (
+    pool TEXT NOT NULL,
+    owner TEXT NOT NULL,
+    seen REAL NOT NULL,
+    PRIMARY KEY (pool, owner)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS leases (
+    tenant TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    expires REAL NOT NULL
+) WITHOUT ROWID;
+'''
+
+logger = logging.getLogger(__name__)
+
+
+class LeaseManager:
+    """Аренда арендаторов между репликами через общую базу SQLite.
+
+    Каждый арендатор принадлежит не более чем одной реплике: аренда
+    выдаётся на `ttl` секунд и продлевается сердцебиением каждые
+    `ttl / 3`. Реплика берёт не больше своей доли арендаторов, поэтому
+    при масштабировании работа расходится по репликам, а аренды упавшей
+    реплики после истечения забирают оставшиеся.
+    """
+
+    def __init__(self, path=LEASE_DB, owner=REPLICA_ID, ttl=LEASE_TTL,
+                 pool='', before_release=None, clock=time.time):
+        """Подключается к общей базе аренд `path`."""
+        self.path = path
+        self.owner = owner
+        self.ttl = ttl
+        self.pool = pool
+        self.before_release = before_release
+        self.clock = clock
+        self.tenants = []
+        self.owned = frozenset()
+        self._renewed_at = clock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            path, timeout=ttl / 3, isolation_level=None,
+            check_same_thread=False
+        )
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript(SCHEMA)
+
+    def owns(self, tenant):
+        """Принадлежит ли арендатор этой реплике.
+
+        Аренда, не продлённая за `ttl`, могла уже перейти к другой
+        реплике, поэтому после сбоя сердцебиения ответ — нет.
+        """
+        return (tenant in self.owned
+                and self.clock() - self._renewed_at < self.ttl)
+
+    def heartbeat(self, tenants=None):
+        """Продлевает аренды и добирает свою долю свободных арендаторов."""
+        if tenants is not None:
+            self.tenants = list(tenants)
+        # Состояние сбрасывается заранее: отданного арендатора новая
+        # реплика должна продолжить с последнего водяного знака.
+        if self.before_release is not None:
+            self.before_release()
+        now = self.clock()
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                owned = self._renew(now)
+                quota = math.ceil(len(self.tenants) / self._replicas(now))
+                if len(owned) > quota:
+                    self._release(sorted(owned)[quota:])
+                    owned = set(sorted(owned)[:quota])
+                for tenant in self.tenants:
+                    if len(owned) >= quota:
+                        break
+                    if tenant not in owned and self._acquire(tenant, now):
+                        owned.add(tenant)
+                self._conn.execute('COMMIT')
+            except BaseException:
+                self._conn.execute('ROLLBACK')
+                raise
+        if owned != self.owned:
+            logger.info(
+                f'Реплика {self.owner}: {len(owned)} из '
+                f'{len(self.tenants)} арендаторов'
+            )
+        self.owned = frozenset(owned)
+        self._renewed_at = now
+        return self.owned
+
+    def _replicas(self, now):
+        self._conn.execute(
+            'INSERT INTO replicas (pool, owner, seen) VALUES (?, ?, ?) '
+            'ON CONFLICT(pool, owner) DO UPDATE SET seen = excluded.seen',
+            (self.pool, self.owner, now)
+        )
+        self._conn.execute(
+            'DELETE FROM replicas WHERE pool = ? AND seen < ?',
+            (self.pool, now - self.ttl)
+        )
+        return self._conn.execute(
+            'SELECT COUNT(*) FROM replicas WHERE pool = ?', (self.pool,)
+        ).fetchone()[0]
+
+    def _renew(self, now):
+        self._conn.execute(
+            'UPDATE leases SET expires = ? WHERE owner = ?',
+            (now + self.ttl, self.owner)
+        )
+        mine = {
+            tenant for tenant, in self._conn.execute(
+                'SELECT tenant FROM leases WHERE owner = ?', (self.owner,)
+            )
+        }
+        return mine.intersection(self.tenants)
+
+    def _acquire(self, tenant, now):
+        cursor = self._conn.execute(
+            'INSERT INTO leases (tenant, owner, expires) VALUES (?, ?, ?) '
+            'ON CONFLICT(tenant) DO UPDATE SET owner = excluded.owner, '
+            'expires = excluded.expires WHERE leases.expires < ?',
+            (tenant, self.owner, now + self.ttl, now)
+        )
+        return cursor.rowcount == 1
+
+    def _release(self, tenants):
+        self._conn.executemany(
+            'DELETE FROM leases WHERE tenant = ? AND owner = ?',
+            [(tenant, self.owner) for tenant in tenants]
+        )
+
+    def release_all(self):
+        """Отдаёт все аренды, например при остановке реплики."""
+        if self.before_release is not None:
+            self.before_release()
+        with self._lock:
+            self._release(self.owned)
+            self._conn.execute(
+                'DELETE FROM replicas WHERE pool = ? AND owner = ?',
+                (self.pool, self.owner)
+            )
+        self.owned = frozenset()
+
+    def _beat(self):
+        while not self._stop.wait(self.ttl / 3):
+            try:
+                self.heartbeat()
+            except sqlite3.Error as error:
+                logger.error(f'Не удалось продлить аренды: {error}')
+                # Аренды истекли, их могла забрать другая реплика.
+                if self.clock() - self._renewed_at >= self.ttl:
+                    self.owned = frozenset()
+
+    def start(self, tenants):
+        """Берёт аренды и запускает фоновое сердцебиение."""
+        self.heartbeat(tenants)
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._beat, name='leases', daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Останавливает сердцебиение и отдаёт аренды."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.release_all()
+        self._conn.close()
+
+
+def open_leases(path=LEASE_DB, **kwargs):
+    """Менеджер аренд, если задан путь к общей базе."""
+    if not path:
+        return None
+    return LeaseManager(path, **kwargs)
@@ -0,0 +1,314 @@
+import heapq
+import itertools
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+
+import metrics
+from exceptions import SendError
+from lazy import lazy_import
+from scheduler import TokenBucket
+
+requests = lazy_import('requests')
+telebot = lazy_import('telebot')
+
+GLOBAL_RATE = float(os.getenv('TELEGRAM_GLOBAL_RATE', 30))
+CHAT_RATE = float(os.getenv('TELEGRAM_CHAT_RATE', 1))
+SEND_WORKERS = int(os.getenv('SEND_WORKERS', 4))
+MAX_ATTEMPTS = int(os.getenv('SEND_MAX_ATTEMPTS', 5))
+RETRY_BACKOFF = 1.0
+MAX_RETRY_DELAY = 300
+LATENCY_WINDOW = 1000
+# Предельная длина текста одного сообщения Telegram.
+MESSAGE_LIMIT = 4096
+SEPARATOR = '\n\n'
+# Ошибки Telegram, которые бессмысленно повторять: неверный запрос,
+# бот заблокирован или чат не найден.
+PERMANENT_ERRORS = (400, 403, 404)
+# Итог отправки: доставлено, повторить позже, отказаться от сообщения.
+# Значения совместимы с прежним булевым результатом.
+SENT, RETRY, DROP = True, False, None
+
+logger = logging.getLogger(__name__)
+
+
+def retry_after(error):
+    """Пауза из ответа Telegram 429 (`parameters.retry_after`) или None."""
+    result_json = getattr(error, 'result_json', None) or {}
+    return (result_json.get('parameters') or {}).get('retry_after')
+
+
+def failure(error):
+    """Итог неудачной отправки: DROP для постоянных ошибок, иначе RETRY."""
+    if getattr(error, 'error_code', None) in PERMANENT_ERRORS:
+        return DROP
+    return RETRY
+
+
+def percentile(values, share):
+    """Перцентиль выборки; 0 для пустой выборки."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * share), len(ordered) - 1)]
+
+
+def pack_messages(texts, limit=MESSAGE_LIMIT):
+    """Склеивает тексты по порядку в как можно меньше сообщений.
+
+    Возвращает пары (сообщение, сколько текстов в нём закончилось).
+    Текст длиннее `limit` режется на части; он засчитывается сообщению
+    с его последней частью.
+    """
+    packed, current, count = [], '', 0
+    for text in texts:
+        parts = [
+            text[start:start + limit] for start in range(0, len(text), limit)
+        ] or ['']
+        for part in parts:
+            if current and len(current) + len(SEPARATOR) + len(part) <= limit:
+                current += SEPARATOR + part
+            else:
+                if current:
+                    packed.append((current, count))
+                current, count = part, 0
+        count += 1
+    if count:
+        packed.append((current, count))
+    return packed
+
+
+def pack_outbox(messages, limit=MESSAGE_LIMIT):
+    """Склеивает сообщения outbox по чатам: (chat_id, текст, их id)."""
+    chats = {}
+    for message in messages:
+        chats.setdefault(message.chat_id, []).append(message)
+    packed = []
+    for chat_id, items in chats.items():
+        position = 0
+        for text, count in pack_messages([item.text for item in items], limit):
+            ids = [item.id for item in items[position:position + count]]
+            packed.append((chat_id, text, ids))
+            position += count
+    return packed
+
+
+class Job:
+    """Сообщение в очереди на отправку."""
+
+    __slots__ = ('chat_id', 'text', 'attempts', 'enqueued', 'on_done')
+
+    def __init__(self, chat_id, text, on_done=None):
+        """Сообщение `text` для чата `chat_id`."""
+        self.chat_id = chat_id
+        self.text = text
+        self.on_done = on_done
+        self.attempts = 0
+        self.enqueued = time.monotonic()
+
+
+class SendQueue:
+    """Асинхронная очередь отправки сообщений в Telegram.
+
+    Сообщения одного чата отправляются строго по порядку и не чаще
+    `chat_rate` в секунду, все чаты вместе — не чаще `global_rate`.
+    При ошибке 429 выдерживается `retry_after`, при прочих временных
+    ошибках — экспоненциальная пауза, после `max_attempts` попыток
+    сообщение отбрасывается с записью в лог.
+    """
+
+    def __init__(self, bot, workers=SEND_WORKERS, global_rate=GLOBAL_RATE,
+                 chat_rate=CHAT_RATE, max_attempts=MAX_ATTEMPTS,
+                 backoff=RETRY_BACKOFF):
+        """Очередь отправки через `bot` в `workers` потоков."""
+        self.bot = bot
+        self.workers = workers
+        self.chat_interval = 1 / chat_rate if chat_rate else 0
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self._bucket = TokenBucket(global_rate, global_rate)
+        self._cond = threading.Condition()
+        self._chats = {}
+        self._next_allowed = {}
+        self._ready = []
+        self._seq = itertools.count()
+        self._threads = []
+        self._stopping = False
+        self._abandoned = False
+        self.depth = 0
+        self.counters = {'sent': 0, 'failed': 0, 'retried': 0}
+        self.send_latency = deque(maxlen=LATENCY_WINDOW)
+        self.delivery_latency = deque(maxlen=LATENCY_WINDOW)
+
+    def start(self):
+        """Запускает рабочие потоки."""
+        for number in range(self.workers):
+            thread = threading.Thread(
+                target=self._work, name=f'send-{number}', daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def submit(self, chat_id, text, on_done=None):
+        """Ставит сообщение в очередь; не блокирует вызывающего.
+
+        `on_done(outcome)` вызывается из рабочего потока, когда
+        сообщение доставлено (SENT) или отброшено: после постоянной
+        ошибки (DROP) или исчерпав попытки (RETRY — outbox повторит позже).
+        """
+        with self._cond:
+            jobs = self._chats.get(chat_id)
+            if jobs is None:
+                jobs = self._chats[chat_id] = deque()
+                self._schedule(chat_id, max(
+                    time.monotonic(), self._next_allowed.get(chat_id, 0)
+                ))
+            jobs.append(Job(chat_id, text, on_done))
+            self.depth += 1
+
+    def _schedule(self, chat_id, not_before):
+        heapq.heappush(self._ready, (not_before, next(self._seq), chat_id))
+        self._cond.notify()
+
+    def _take(self):
+        with self._cond:
+            while True:
+                if self._abandoned:
+                    return None
+                now = time.monotonic()
+                if self._ready and self._ready[0][0] <= now:
+                    chat_id = heapq.heappop(self._ready)[2]
+                    return self._chats[chat_id][0]
+                if self._stopping and not self.depth:
+                    return None
+                timeout = self._ready[0][0] - now if self._ready else None
+                self._cond.wait(timeout)
+
+    def _work(self):
+        while True:
+            job = self._take()
+            if job is None:
+                return
+            delay = None
+            try:
+                delay = self._send(job)
+            except Exception as error:
+                # Поток не должен умирать: иначе чат навсегда останется
+                # в очереди, а depth не уменьшится.
+                logger.error(f'Сбой потока отправки: {error}')
+                self._done(job, RETRY)
+            finally:
+                self._finish(job, delay)
+
+    def _send(self, job):
+        """Отправляет сообщение; возвращает паузу до повтора или None."""
+        time.sleep(self._bucket.reserve())
+        started = time.monotonic()
+        try:
+            self.bot.send_message(chat_id=job.chat_id, text=job.text)
+        except SendError as error:
+            return self._retry_delay(job, error, retry_after(error))
+        except telebot.apihelper.ApiException as error:
+            return self._retry_delay(job, error, retry_after(error))
+        except requests.RequestException as error:
+            return self._retry_delay(job, error, None)
+        except Exception as error:
+            # Ошибка в клиенте бота (например, неожиданный ответ API)
+            # считается обычной неудачной попыткой.
+            return self._retry_delay(job, error, None)
+        finished = time.monotonic()
+        metrics.SEND_LATENCY.observe(finished - started)
+        self.send_latency.append(finished - started)
+        self.delivery_latency.append(finished - job.enqueued)
+        self._count('sent')
+        logger.debug('Сообщение отправлено успешно!')
+        self._done(job, SENT)
+        return None
+
+    def _retry_delay(self, job, error, pause):
+        job.attempts += 1
+        code = getattr(error, 'error_code', None)
+        if job.attempts >= self.max_attempts or code in PERMANENT_ERRORS:
+            self._count('failed')
+            metrics.ERRORS.inc('SendError')
+            logger.error(f'Ошибка отправки сообщения: {error}')
+            self._done(job, failure(error))
+            return None
+        if pause is None:
+            pause = min(self.backoff * 2 ** job.attempts, MAX_RETRY_DELAY)
+            pause *= random.uniform(0.5, 1)
+        self._count('retried')
+        logger.warning(
+            f'Повтор отправки в чат {job.chat_id} через {pause:.1f} с: '
+            f'{error}'
+        )
+        return pause
+
+    def _done(self, job, outcome):
+        if job.on_done is None:
+            return
+        try:
+            job.on_done(outcome)
+        except Exception as error:
+            logger.error(f'Ошибка обработчика доставки: {error}')
+
+    def _count(self, name):
+        with self._cond:
+            self.counters[name] += 1
+
+    def _finish(self, job, delay):
+        with self._cond:
+            jobs = self._chats[job.chat_id]
+            if delay is None:
+                jobs.popleft()
+                self.depth -= 1
+                delay = self.chat_interval
+                self._next_allowed[job.chat_id] = time.monotonic() + delay
+            if jobs:
+                self._schedule(job.chat_id, time.monotonic() + delay)
+            else:
+                del self._chats[job.chat_id]
+            self._cond.notify_all()
+
+    def join(self, timeout=None):
+        """Ждёт, пока очередь опустеет; True, если успела."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self.depth:
+                left = deadline and deadline - time.monotonic()
+                if left is not None and left <= 0:
+                    return False
+                self._cond.wait(left)
+        return True
+
+    def stop(self, timeout=None):
+        """Дожидается отправки очереди и останавливает потоки.
+
+        Если очередь не опустела за `timeout`, новые сообщения больше
+        не берутся: дослать успевают только уже начатые.
+        """
+        drained = self.join(timeout)
+        with self._cond:
+            self._stopping = True
+            self._abandoned = not drained
+            self._cond.notify_all()
+        if drained:
+            for thread in self._threads:
+                thread.join()
+        return drained
+
+    def stats(self):
+        """Глубина очереди, счётчики и задержки отправки."""
+        return {
+            'depth': self.depth,
+            'chats': len(self._chats),
+            **self.counters,
+            'send_latency_p50': percentile(self.send_latency, 0.5),
+            'send_latency_p99': percentile(self.send_latency, 0.99),
+            'delivery_latency_p50': percentile(self.delivery_latency, 0.5),
+            'delivery_latency_p99': percentile(self.delivery_latency, 0.99),
+        }
@@ -0,0 +1,116 @@
+import logging
+import os
+import time
+
+# Дайджест для чата из CHAT_ID: "hourly", "daily", период в секундах
+# или местное время "09:00"; пусто — сообщения уходят сразу.
+DIGEST = os.getenv('DIGEST', '')
+ALIASES = {'hourly': 3600, 'daily': 86400}
+
+logger = logging.getLogger(__name__)
+
+
+class DigestSchedule:
+    """Когда отправлять дайджест: каждые N секунд или ежедневно в ЧЧ:ММ."""
+
+    __slots__ = ('interval', 'at')
+
+    def __init__(self, interval=None, at=None):
+        """Период `interval` в секундах или время `at` (часы, минуты)."""
+        self.interval = interval
+        self.at = at
+
+    @classmethod
+    def parse(cls, spec):
+        """Расписание из строки настройки или None для мгновенной отправки."""
+        spec = str(spec or '').strip().lower()
+        if not spec:
+            return None
+        if spec in ALIASES:
+            return cls(interval=ALIASES[spec])
+        if ':' in spec:
+            hours, minutes = (int(part) for part in spec.split(':'))
+            if not (0 <= hours < 24 and 0 <= minutes < 60):
+                raise ValueError(f'Неверное время дайджеста: {spec}')
+            return cls(at=(hours, minutes))
+        interval = float(spec)
+        if interval <= 0:
+            raise ValueError(f'Неверный период дайджеста: {spec}')
+        return cls(interval=interval)
+
+    def next_after(self, now):
+        """Ближайший срок отправки после момента `now` (секунды эпохи)."""
+        if self.interval:
+            return (now // self.interval + 1) * self.interval
+        local = time.localtime(now)
+        hours, minutes = self.at
+        day = local.tm_mday
+        while True:
+            due = time.mktime((
+                local.tm_year, local.tm_mon, day, hours, minutes, 0, 0, 0, -1
+            ))
+            if due > now:
+                return due
+            day += 1
+
+
+class Digests:
+    """Расписания дайджестов по чатам.
+
+    Сообщения чатов с дайджестом копятся в outbox и выгружаются одной
+    пачкой, когда наступает срок; остальные чаты получают их сразу.
+    """
+
+    def __init__(self, clock=time.time):
+        """Пустой набор расписаний."""
+        self.clock = clock
+        self.schedules = {}
+        self.next_flush = {}
+
+    def __len__(self):
+        """Число чатов в режиме дайджеста."""
+        return len(self.schedules)
+
+    def add(self, chat_id, spec):
+        """Включает дайджест для чата, если задано расписание."""
+        schedule = DigestSchedule.parse(spec)
+        if schedule is None:
+            return
+        chat_id = str(chat_id)
+        self.schedules[chat_id] = schedule
+        self.next_flush[chat_id] = schedule.next_after(self.clock())
+
+    def held(self):
+        """Чаты, чьи сообщения пока копятся.
+
+        Чаты с наступившим сроком в список не попадают, и их срок сразу
+        сдвигается на следующий: один вызов — одна выгрузка дайджеста.
+        """
+        now = self.clock()
+        held = []
+        for chat_id, due in self.next_flush.items():
+            if now < due:
+                held.append(chat_id)
+            else:
+                self.next_flush[chat_id] = (
+                    self.schedules[chat_id].next_after(now)
+                )
+        return held
+
+
+def build_digests(chats, durable):
+    """Дайджесты для пар (chat_id, расписание).
+
+    Копить сообщения можно только в outbox, поэтому без хранилища
+    (`durable` ложно) дайджест выключается с предупреждением.
+    """
+    digests = Digests()
+    for chat_id, spec in chats:
+        if spec and not durable:
+            logger.warning(
+                f'Дайджест для чата {chat_id} требует STATE_DB, '
+                'сообщения будут отправляться сразу'
+            )
+            continue
+        digests.add(chat_id, spec)
+    return digests
@@ -0,0 +1,518 @@
+import asyncio
+import functools
+import json
+import logging
+import os
+import random
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+import bootstrap  # noqa: F401 (.env до чтения настроек модулями)
+import homework
+import metrics
+from alerts import ErrorAggregator
+from bot_api import TeleBot
+from breaker import CircuitBreaker
+from coordination import open_leases
+from delivery import DROP, SendQueue, pack_messages, pack_outbox
+from digest import build_digests
+from exceptions import (CircuitOpenError, CurrentDateKeyError,
+                        CurrentDatTypeError, SendError)
+from lifecycle import SHUTDOWN_TIMEOUT, Control
+from response_cache import open_cache
+from scheduler import PollPolicy, RequestBudget
+from status_index import StatusIndex
+from storage import OUTBOX_BATCH, fingerprint, open_store, tenant_key
+from transport import (HEDGE_REQUESTS, CachingTransport,
+                       ConditionalTransport, HedgedTransport, PooledTransport)
+
+TENANTS_FILE = os.getenv('TENANTS_FILE', 'tenants.json')
+MAX_IN_FLIGHT = int(os.getenv('MAX_IN_FLIGHT', 64))
+# Как часто выгружать outbox, если новых сообщений не появлялось, с.
+OUTBOX_INTERVAL = float(os.getenv('OUTBOX_INTERVAL', 5))
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Tenant:
+    """Пара «токен Практикума — чат Telegram» и её состояние опроса."""
+
+    token: str
+    chat_id: str
+    timestamp: int = field(default_factory=lambda: int(time.time()))
+    errors: ErrorAggregator = field(default_factory=ErrorAggregator)
+    digest: str = ''
+    policy: PollPolicy = None
+    index: StatusIndex = field(default_factory=StatusIndex)
+
+    @property
+    def headers(self):
+        """Заголовки запроса к API от имени этого студента."""
+        return homework.make_headers(self.token)
+
+    @property
+    def key(self):
+        """Короткий идентификатор для логов, не раскрывающий токен."""
+        return tenant_key(self.token)
+
+
+def load_tenants(path=TENANTS_FILE):
+    """Читает список арендаторов из JSON-файла."""
+    with open(path, encoding='utf-8') as file:
+        data = json.load(file)
+    return [
+        Tenant(token=item['token'], chat_id=str(item['chat_id']),
+               digest=item.get('digest', ''))
+        for item in data
+    ]
+
+
+class PollingEngine:
+    """Опрашивает API для множества арендаторов в одном процессе.
+
+    Блокирующие вызовы `requests` и `TeleBot` выполняются в пуле потоков,
+    а семафор ограничивает число одновременных запросов к API.
+    """
+
+    def __init__(self, tenants, bot, max_in_flight=MAX_IN_FLIGHT,
+                 period=homework.RETRY_PERIOD, transport=None, store=None,
+                 sender=None, breaker=None, reporter=None, leases=None,
+                 control=None):
+        """Движок для арендаторов `tenants` и общего бота `bot`."""
+        self.tenants = list(tenants)
+        self.bot = bot
+        self.sender = sender
+        self.breaker = breaker or CircuitBreaker()
+        self.transport = transport
+        self.store = store
+        self.period = period
+        self.budget = RequestBudget()
+        self.max_in_flight = max_in_flight
+        self._semaphore = None
+        self._outbox_ready = asyncio.Event()
+        self._in_outbox = set()
+        self.waiting = 0
+        self.reporter = reporter
+        self.leases = leases
+        self.control = control
+        self.stopping = False
+        self._poll_now = asyncio.Event()
+        self._loops = None
+        self._deadline = None
+        self.digests = build_digests(
+            ((tenant.chat_id, tenant.digest) for tenant in self.tenants),
+            store is not None
+        )
+        self.counters = dict.fromkeys(('polls', 'errors', 'messages'), 0)
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_in_flight, thread_name_prefix='poll'
+        )
+        for tenant in self.tenants:
+            if tenant.policy is None:
+                tenant.policy = PollPolicy(period)
+        self.restore()
+
+    def restore(self):
+        """Восстанавливает водяные знаки арендаторов из хранилища."""
+        if self.store is None:
+            return
+        watermarks = self.store.load_watermarks()
+        for tenant in self.tenants:
+            tenant.timestamp = watermarks.get(tenant.key, tenant.timestamp)
+        logger.info(f'Восстановлено состояние {len(watermarks)} арендаторов')
+
+    async def _call(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    async def notify(self, tenant, message):
+        """Отправляет сообщение арендатору (через очередь, если она есть)."""
+        self.counters['messages'] += 1
+        if self.sender is not None:
+            self.sender.submit(tenant.chat_id, message)
+            return True
+        return await self._call(
+            homework.send_to_chat, self.bot, tenant.chat_id, message
+        )
+
+    async def alert(self, tenant, message):
+        """Отправляет сообщение агрегатора ошибок арендатора, если есть."""
+        if message and await self.notify(tenant, message):
+            tenant.errors.sent()
+
+    async def notify_error(self, tenant, error):
+        """Учитывает ошибку; о сбое сообщается сводками, а не каждой."""
+        await self.alert(tenant, tenant.errors.on_error(error))
+
+    async def notify_status(self, tenant, hw, message=None):
+        """Записывает статус дз в outbox, а без хранилища отправляет."""
+        if message is None:
+            message = homework.parse_status(hw)
+        if self.store is None:
+            return await self.notify(tenant, message)
+        if await self._call(
+                self.store.enqueue, tenant.key, fingerprint(hw),
+                tenant.chat_id, message):
+            self._outbox_ready.set()
+        return True
+
+    async def report(self, tenant, changes):
+        """Сообщает об изменениях; неотправленные вернутся при опросе.
+
+        Без хранилища изменения одного опроса склеиваются в как можно
+        меньше сообщений; с хранилищем это делает выгрузка outbox.
+        """
+        rendered = homework.render_changes(changes)
+        if self.store:
+            for hw, message in rendered:
+                await self.notify_status(tenant, hw, message)
+            return
+        sent = 0
+        texts = [text for _, text in rendered]
+        for message, count in pack_messages(texts):
+            if not await self.notify(tenant, message):
+                for missed, _ in rendered[sent:]:
+                    tenant.index.forget(missed)
+                raise SendError('Не удалось отправить статус дз')
+            sent += count
+
+    def _delivered(self, ids, outcome):
+        for message_id in ids:
+            self._in_outbox.discard(message_id)
+            if outcome:
+                self.store.mark_sent(message_id)
+            else:
+                self.store.mark_failed(message_id, outcome is DROP)
+
+    async def drain_outbox(self, hold=()):
+        """Передаёт пачку сообщений outbox на отправку, склеив по чатам."""
+        batch = await self._call(
+            self.store.pending_messages, OUTBOX_BATCH,
+            frozenset(self._in_outbox), hold
+        )
+        for chat_id, text, ids in pack_outbox(batch):
+            self._in_outbox.update(ids)
+            self.counters['messages'] += 1
+            if self.sender is not None:
+                self.sender.submit(
+                    chat_id, text, functools.partial(self._delivered, ids)
+                )
+                continue
+            outcome = await self._call(
+                homework.send_to_chat, self.bot, chat_id, text
+            )
+            await self._call(self._delivered, ids, outcome)
+        return len(batch)
+
+    async def _outbox_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(
+                    self._outbox_ready.wait(), OUTBOX_INTERVAL
+                )
+            except asyncio.TimeoutError:
+                pass
+            self._outbox_ready.clear()
+            hold = self.digests.held()
+            try:
+                while await self.drain_outbox(hold) >= OUTBOX_BATCH:
+                    pass
+            except sqlite3.Error as error:
+                # Например, «database is locked» при общей базе: выгрузку
+                # повторим позже, опрос арендаторов продолжается.
+                self._store_error('Сбой выгрузки outbox', error)
+                await asyncio.sleep(OUTBOX_INTERVAL)
+
+    def _store_error(self, text, error):
+        self.counters['errors'] += 1
+        metrics.count_error(error)
+        logger.error(f'{text}: {error}')
+
+    async def take_turn(self, tenant):
+        """Опрашивает ли эта реплика арендатора сейчас.
+
+        Получив арендатора от другой реплики, продолжаем с её водяного
+        знака, чтобы не отправить статусы повторно.
+        """
+        if self.leases is None:
+            return True
+        if not self.leases.owns(tenant.key):
+            return False
+        if self.store:
+            try:
+                stored = await self._call(
+                    self.store.load_watermark, tenant.key
+                )
+            except sqlite3.Error as error:
+                # Без водяного знака нового владельца можно отправить
+                # статусы повторно: пропускаем ход до следующего периода.
+                self._store_error(
+                    f'[{tenant.key}] Не удалось прочитать водяной знак', error
+                )
+                return False
+            tenant.timestamp = max(tenant.timestamp, stored or 0)
+        return True
+
+    async def _idle_delay(self, tenant):
+        if self.breaker.blocked():
+            return self._suspended()
+        if not await self.take_turn(tenant):
+            return self.period
+        return None
+
+    def _suspended(self):
+        # Пока эндпоинт недоступен, арендаторы не шлют запросов и
+        # после восстановления возвращаются вразнобой.
+        return self.breaker.remaining() + random.uniform(0, self.period)
+
+    async def _fetch(self, tenant):
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        try:
+            return await self._call(
+                self.breaker.call, homework.request_api, tenant.timestamp,
+                tenant.headers, self.transport
+            )
+        finally:
+            self._semaphore.release()
+
+    async def poll_once(self, tenant):
+        """Один цикл опроса API; возвращает паузу до следующего."""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        idle = await self._idle_delay(tenant)
+        if idle is not None:
+            return idle
+        homeworks, failure = [], None
+        self.counters['polls'] += 1
+        try:
+            await asyncio.sleep(self.budget.reserve())
+            response = await self._fetch(tenant)
+            homeworks = homework.check_response(response)
+            changes = tenant.index.diff(homeworks)
+            await self.report(tenant, changes)
+            if not changes:
+                logger.debug(f'[{tenant.key}] Новые статусы отсутствуют')
+            tenant.timestamp = response['current_date']
+            await self.alert(tenant, tenant.errors.on_success())
+            if self.store:
+                await self._call(
+                    self.store.save_watermark, tenant.key, tenant.timestamp
+                )
+        except CircuitOpenError:
+            return self._suspended()
+        except (CurrentDatTypeError, CurrentDateKeyError) as error:
+            self.counters['errors'] += 1
+            metrics.count_error(error)
+            logger.error(f'[{tenant.key}] {error}')
+        except Exception as error:
+            failure = error
+            self.counters['errors'] += 1
+            metrics.count_error(error)
+            logger.error(f'[{tenant.key}] Сбой в работе программы: {error}')
+            await self.notify_error(tenant, error)
+        return tenant.policy.next_delay(homeworks, failure)
+
+    async def _tenant_loop(self, tenant):
+        # Разносим первые запросы по периоду, чтобы тысячи арендаторов
+        # не обращались к API одновременно.
+        await self.pause(random.uniform(0, self.period))
+        lag = metrics.LagTracker(metrics.LOOP_LAG)
+        while True:
+            lag.check()
+            delay = await self.poll_once(tenant)
+            lag.expect(delay)
+            await self.pause(delay)
+
+    async def pause(self, delay):
+        """Пауза между опросами, которую прерывает `poll_now()`."""
+        try:
+            await asyncio.wait_for(self._poll_now.wait(), delay)
+        except asyncio.TimeoutError:
+            pass
+
+    def poll_now(self):
+        """Будит всех арендаторов для немедленного опроса."""
+        event, self._poll_now = self._poll_now, asyncio.Event()
+        event.set()
+
+    def stop(self):
+        """Останавливает опрос; `run()` досылает outbox и завершается."""
+        self.stopping = True
+        if self._loops is not None:
+            self._loops.cancel()
+
+    def _on_signal(self):
+        if self.control.stopping:
+            self.stop()
+        elif self.control.poll_requested:
+            self.control.poll_requested = False
+            self.poll_now()
+
+    def _subscribe(self):
+        loop = asyncio.get_running_loop()
+        self.control.subscribe(
+            lambda: loop.call_soon_threadsafe(self._on_signal)
+        )
+
+    async def _finish(self):
+        # Досылаем outbox и ждём очередь отправки, чтобы отметки
+        # о доставке попали в базу до её закрытия.
+        while await self.drain_outbox(self.digests.held()) >= OUTBOX_BATCH:
+            pass
+        if self.sender is not None:
+            await self._call(self.sender.join, self._remaining())
+
+    def _remaining(self):
+        if self._deadline is None:
+            self._deadline = time.monotonic() + SHUTDOWN_TIMEOUT
+        return max(self._deadline - time.monotonic(), 0)
+
+    async def shutdown(self):
+        """Досылает сообщения не дольше SHUTDOWN_TIMEOUT секунд.
+
+        Срок общий для выгрузки outbox и остановки очереди отправки.
+        """
+        logger.info('Остановка: досылаем сообщения и сохраняем состояние')
+        self._deadline = time.monotonic() + SHUTDOWN_TIMEOUT
+        if not self.store:
+            return
+        try:
+            await asyncio.wait_for(self._finish(), self._remaining())
+        except asyncio.TimeoutError:
+            logger.warning('Не все сообщения outbox успели уйти')
+
+    def _stop_sender(self):
+        # До закрытия базы: отметки о доставке пишутся из потоков отправки.
+        if self.sender is not None and not self.sender.stop(
+                timeout=self._remaining()):
+            logger.warning(
+                'Очередь отправки не опустела: остаток уйдёт из outbox '
+                'после перезапуска'
+            )
+
+    async def _report_loop(self):
+        while True:
+            await asyncio.sleep(self.period)
+            if hasattr(self.transport, 'stats'):
+                logger.info(f'Транспорт: {self.transport.stats()}')
+            if self.sender is not None:
+                logger.info(f'Очередь отправки: {self.sender.stats()}')
+            if self.store:
+                try:
+                    await self._call(self.store.flush)
+                except sqlite3.Error as error:
+                    self._store_error('Не удалось сохранить состояние', error)
+            if self.reporter is not None:
+                self.reporter(self.stats())
+
+    def stats(self):
+        """Счётчики движка и его очередей."""
+        stats = dict(self.counters, tenants=len(self.tenants),
+                     api_waiting=self.waiting)
+        if self.sender is not None:
+            stats['send'] = self.sender.stats()
+        if hasattr(self.transport, 'stats'):
+            stats['transport'] = self.transport.stats()
+        return stats
+
+    def track_metrics(self):
+        """Публикует глубину очередей движка в метриках."""
+        metrics.QUEUE_DEPTH.track('api_waiting', lambda: self.waiting)
+        if self.sender is not None:
+            metrics.QUEUE_DEPTH.track('send', lambda: self.sender.depth)
+        if self.store:
+            metrics.QUEUE_DEPTH.track('state', self.store.pending)
+
+    async def run(self):
+        """Запускает бесконечный опрос всех арендаторов."""
+        self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        self.track_metrics()
+        logger.info(f'Запуск опроса для {len(self.tenants)} арендаторов')
+        if self.leases is not None:
+            self.leases.start(tenant.key for tenant in self.tenants)
+        if self.control is not None:
+            self._subscribe()
+        loops = [self._report_loop()]
+        if self.store:
+            loops.append(self._outbox_loop())
+        self._loops = asyncio.gather(
+            *loops, *(self._tenant_loop(tenant) for tenant in self.tenants)
+        )
+        if self.stopping:
+            self._loops.cancel()
+        try:
+            await self._loops
+        except asyncio.CancelledError:
+            if not self.stopping:
+                raise
+            await self.shutdown()
+        finally:
+            if self.leases is not None:
+                self.leases.stop()
+            self._stop_sender()
+            self._executor.shutdown(wait=False)
+            if self.store:
+                self.store.close()
+
+
+def check_bot_token():
+    """Проверяет токен бота, общий для всех арендаторов."""
+    if not homework.TELEGRAM_TOKEN:
+        text_error = 'Отсутствует обязательная переменная: "TELEGRAM_TOKEN"'
+        logger.critical(text_error)
+        raise SystemExit(text_error)
+
+
+def serve(tenants, reporter=None, pool=''):
+    """Опрашивает арендаторов до остановки процесса."""
+    bot = TeleBot(token=homework.TELEGRAM_TOKEN)
+    # Поток и соединение на каждый запрос в полёте, вдвое — с дублями:
+    # иначе ожидание сокета попадёт в срок опроса и в p95.
+    in_flight = MAX_IN_FLIGHT * (2 if HEDGE_REQUESTS else 1)
+    transport = ConditionalTransport(
+        HedgedTransport(
+            PooledTransport(pool_maxsize=in_flight), hedge=HEDGE_REQUESTS,
+            workers=in_flight
+        )
+    )
+    cache = open_cache()
+    if cache is not None:
+        transport = CachingTransport(cache, transport)
+    sender = SendQueue(bot).start()
+    store = open_store()
+    leases = open_leases(
+        pool=pool, before_release=store.flush if store else None
+    )
+    control = Control()
+    polling = PollingEngine(
+        tenants, bot, transport=transport, store=store, sender=sender,
+        reporter=reporter, leases=leases, control=control
+    )
+    try:
+        with control:
+            asyncio.run(polling.run())
+    finally:
+        # Очередь отправки останавливает run() в пределах того же срока.
+        transport.close()
+        bot.close()
+
+
+def main():
+    """Многопользовательский режим работы бота."""
+    check_bot_token()
+    tenants = load_tenants()
+    metrics.start_server()
+    serve(tenants)
+
+
+if __name__ == '__main__':
+    homework.configure()
+    homework.log_settings()
+    main()
@@ -7,7 +7,9 @@ class TokenVariablesError(Exception):
 class EndpointError(Exception):
     """Ошибка при запросе к эндпоинту."""
 
-    pass
+    def __init__(self, message='', status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
 
 
 class SendError(Exception):
@@ -16,6 +18,15 @@ class SendError(Exception):
     pass
 
 
+class TelegramError(SendError):
+    """Ошибка, которую вернул Bot API Telegram."""
+
+    def __init__(self, message='', error_code=None, result_json=None):
+        super().__init__(message)
+        self.error_code = error_code
+        self.result_json = result_json
+
+
 class GetApiError(Exception):
     """Ошибка при запросе к эндпоинту."""
 
@@ -38,3 +49,9 @@ class CurrentDatTypeError(Exception):
     """Ошибка при не соответствии типа current_date."""
 
     pass
+
+
+class CircuitOpenError(Exception):
+    """Ошибка при обращении к эндпоинту, отключённому предохранителем."""
+
+    pass
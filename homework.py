@@ -4,15 +4,26 @@ import time
 from http import HTTPStatus
 from json import JSONDecodeError
 
-import requests
-import telebot
-from dotenv import load_dotenv
-from telebot import TeleBot
-
+import bootstrap  # .env до чтения настроек модулями
+import metrics
+from alerts import ErrorAggregator
+from bot_api import TeleBot
+from coordination import open_leases
+from delivery import DROP, SENT, failure, pack_messages, pack_outbox
+from digest import DIGEST, build_digests
 from exceptions import (CurrentDateKeyError, CurrentDatTypeError,
-                        GetApiError, JSONError, EndpointError)
+                        GetApiError, JSONError, EndpointError, SendError)
+from lazy import lazy_import
+from lifecycle import SHUTDOWN_TIMEOUT, Control, Wakeup
+from log_config import setup_logging
+from scheduler import PollPolicy
+from status_index import StatusIndex
+from storage import OUTBOX_BATCH, fingerprint, open_store, tenant_key
 
-load_dotenv()
+# requests загружается при первом запросе, а pyTelegramBotAPI — только
+# ради его исключений: импорт модуля и тесты не платят за них.
+requests = lazy_import('requests')
+telebot = lazy_import('telebot')
 
 PRACTICUM_TOKEN = os.getenv('PRACTICUM')
 TELEGRAM_TOKEN = os.getenv('TOKEN')
@@ -22,6 +33,9 @@ TELEGRAM_CHAT_ID = os.getenv('CHAT_ID')
 RETRY_PERIOD = 600
 ENDPOINT = 'https://practicum.yandex.ru/api/user_api/homework_statuses/'
 HEADERS = {'Authorization': f'OAuth {PRACTICUM_TOKEN}'}
+CONNECT_TIMEOUT = float(os.getenv('CONNECT_TIMEOUT', 5))
+READ_TIMEOUT = float(os.getenv('READ_TIMEOUT', 30))
+_POLL_TRANSPORT = None
 
 
 HOMEWORK_VERDICTS = {
@@ -31,6 +45,21 @@ HOMEWORK_VERDICTS = {
 }
 
 
+def configure():
+    """Перечитывает токены из .env и окружения.
+
+    Остальные настройки скрипты проекта получают из .env через
+    `bootstrap` ещё до импорта модулей; configure() нужен, когда бот
+    запускают из чужого кода. Тесты задают настройки напрямую.
+    """
+    global PRACTICUM_TOKEN, TELEGRAM_TOKEN, TELEGRAM_CHAT_ID, HEADERS
+    bootstrap.load_env()
+    PRACTICUM_TOKEN = os.getenv('PRACTICUM')
+    TELEGRAM_TOKEN = os.getenv('TOKEN')
+    TELEGRAM_CHAT_ID = os.getenv('CHAT_ID')
+    HEADERS = make_headers(PRACTICUM_TOKEN)
+
+
 def check_tokens():
     """Проверяет доступность пременных окружения."""
     TOKEN_MAMES = ('PRACTICUM_TOKEN', 'TELEGRAM_TOKEN', 'TELEGRAM_CHAT_ID')
@@ -45,24 +74,69 @@ def check_tokens():
         raise SystemExit(text_error)
 
 
+def make_headers(token):
+    """Собирает заголовки запроса для токена Практикума."""
+    return {'Authorization': f'OAuth {token}'}
+
+
 def send_message(bot, message):
     """Отправляет сообщение."""
+    return send_to_chat(bot, TELEGRAM_CHAT_ID, message)
+
+
+def send_to_chat(bot, chat_id, message):
+    """Отправляет сообщение в указанный чат.
+
+    Возвращает SENT (True), RETRY (False) или DROP (None) для ошибок,
+    после которых повторять отправку бессмысленно.
+    """
     try:
-        bot.send_message(chat_id=TELEGRAM_CHAT_ID, text=message)
-    except telebot.apihelper.ApiException as e:
+        with metrics.Timer(metrics.SEND_LATENCY):
+            bot.send_message(chat_id=chat_id, text=message)
+    except (SendError, telebot.apihelper.ApiException) as e:
+        metrics.ERRORS.inc('SendError')
         logger.error(f'Ошибка отправки сообщения: {e}')
-    else:
-        logger.debug('Сообщение отправлено успешно!')
+        return failure(e)
+    logger.debug('Сообщение отправлено успешно!')
+    return SENT
 
 
 def get_api_answer(timestamp):
-    """Делает запрос к эндпоинту."""
+    """Делает запрос к эндпоинту не дольше POLL_DEADLINE секунд."""
+    return request_api(timestamp, HEADERS, poll_transport())
+
+
+def poll_transport():
+    """Транспорт main(): `requests` с общим сроком на весь опрос.
+
+    READ_TIMEOUT ограничивает каждое чтение сокета, а не ответ целиком:
+    медленно капающий ответ без общего срока повесил бы main().
+    """
+    global _POLL_TRANSPORT
+    if _POLL_TRANSPORT is None:
+        from transport import HedgedTransport
+
+        _POLL_TRANSPORT = HedgedTransport(requests, hedge=False, workers=2)
+    return _POLL_TRANSPORT
+
+
+def request_api(timestamp, headers, transport=None):
+    """Делает запрос к эндпоинту с заголовками конкретного токена.
+
+    transport — объект с методом `get` (например, пул соединений),
+    по умолчанию используется модуль `requests`.
+    """
+    transport = transport or requests
     try:
-        response = requests.get(
-            ENDPOINT, headers=HEADERS, params={'from_date': timestamp}
-        )
+        with metrics.Timer(metrics.API_LATENCY):
+            response = transport.get(
+                ENDPOINT, headers=headers, params={'from_date': timestamp},
+                timeout=(CONNECT_TIMEOUT, READ_TIMEOUT)
+            )
         if response.status_code != HTTPStatus.OK:
-            raise EndpointError(f'Эндпоинт - {ENDPOINT} не доступен')
+            raise EndpointError(
+                f'Эндпоинт - {ENDPOINT} не доступен', response.status_code
+            )
         return response.json()
     except requests.RequestException as error:
         raise GetApiError(f'Ошибка при запросе к основному API: {error}')
@@ -109,54 +183,202 @@ def parse_status(homework):
     return f'Изменился статус проверки работы "{homework_name}". {verdict}'
 
 
+def render_changes(changes):
+    """Сообщения об изменениях: пары (дз, текст).
+
+    Каждая дз разбирается отдельно. Индекс уже запомнил все изменения
+    пачки, поэтому дз, которую parse_status не принимает, пропускается
+    с записью в лог, а не прерывает обработку остальных: иначе их новые
+    статусы потерялись бы.
+    """
+    rendered = []
+    for homework in changes:
+        try:
+            rendered.append((homework, parse_status(homework)))
+        except (AttributeError, KeyError, ValueError) as error:
+            metrics.count_error(error)
+            logger.error(f'Дз пропущена: {error}')
+    return rendered
+
+
 def main():
     """Основная логика работы бота."""
     check_tokens()
     bot = TeleBot(token=TELEGRAM_TOKEN)
-    timestamp = int(time.time())
-    last_message = ''
-    while True:
-        try:
-            response = get_api_answer(timestamp)
-            verified_hw = check_response(response)
-            if verified_hw:
-                last_message = check_last_message(
-                    bot, parse_status(verified_hw[0]), last_message
-                )
-            else:
-                logger.debug('Новые статусы отсутствуют')
-            timestamp = response['current_date']
-        except (CurrentDatTypeError, CurrentDateKeyError) as error:
-            logger.error(error)
-        except Exception as error:
-            last_message = check_last_message(
-                bot, str(error), last_message
-            )
-            logger.error(f'Сбой в работе программы: {error}')
-        finally:
-            time.sleep(RETRY_PERIOD)
+    store = open_store()
+    key = tenant_key(PRACTICUM_TOKEN)
+    timestamp = restore_timestamp(store, key)
+    leases = lease_token(store, key)
+    errors = ErrorAggregator()
+    digests = build_digests([(TELEGRAM_CHAT_ID, DIGEST)], store is not None)
+    index = StatusIndex()
+    policy = PollPolicy(RETRY_PERIOD)
+    lag = metrics.LagTracker(metrics.LOOP_LAG)
+    metrics.start_server()
+    with Control() as control:
+        while not control.stopping:
+            lag.check()
+            homeworks, failure, turn = [], None, timestamp
+            try:
+                turn = take_turn(leases, store, key, timestamp)
+                if turn is None:
+                    continue
+                response = get_api_answer(turn)
+                homeworks = check_response(response)
+                changes = index.diff(homeworks)
+                report_changes(bot, index, changes, store, digests)
+                if not changes:
+                    logger.debug('Новые статусы отсутствуют')
+                timestamp = response['current_date']
+                alert(bot, errors, errors.on_success())
+                if store:
+                    store.save_watermark(key, timestamp)
+            except (CurrentDatTypeError, CurrentDateKeyError) as error:
+                metrics.count_error(error)
+                logger.error(error)
+            except Exception as error:
+                failure = error
+                metrics.count_error(error)
+                alert(bot, errors, errors.on_error(error))
+                logger.error(f'Сбой в работе программы: {error}')
+            finally:
+                # Резервная реплика ждёт базовый период, не растягивая
+                # паузу политики: аренда освободится через LEASE_TTL.
+                delay = (RETRY_PERIOD if turn is None
+                         else policy.next_delay(homeworks, failure))
+                lag.expect(delay)
+                # Как Control.sleep, но time.sleep вызывается из main.
+                try:
+                    try:
+                        control.sleeping = True
+                        delay = control.delay(delay)
+                        time.sleep(delay)
+                    finally:
+                        control.sleeping = False
+                except Wakeup:
+                    pass
+    shutdown(bot, store, leases, digests)
 
 
-def check_last_message(bot, message, last_message):
-    """Сверяет сообщение с предыдущим."""
-    if message != last_message:
-        send_message(bot, message)
-    return message
+def shutdown(bot, store, leases, digests):
+    """Досылает outbox за SHUTDOWN_TIMEOUT секунд и сохраняет состояние."""
+    logger.info('Остановка: досылаем сообщения и сохраняем состояние')
+    if store:
+        deadline = time.monotonic() + SHUTDOWN_TIMEOUT
+        drain_outbox(bot, store, digests.held(), deadline)
+    if leases:
+        leases.stop()
+    if store:
+        store.close()
 
 
-def log_settings():
-    """Настройка логгера."""
-    logging.basicConfig(
-        level=logging.DEBUG,
-        encoding='utf-8',
-        filename=os.path.join(os.path.dirname(__file__), 'program.log'),
-        format='%(asctime)s|%(levelname)s|%(lineno)d|'
-        '%(funcName)s|%(message)s|%(name)s',
+def restore_timestamp(store, key):
+    """Возвращает сохранённый current_date или текущее время."""
+    saved = store.load_watermark(key) if store else None
+    if saved is None:
+        return int(time.time())
+    logger.info(f'Опрос продолжается с сохранённой метки {saved}')
+    return saved
+
+
+def lease_token(store, key):
+    """Берёт аренду токена, если реплик несколько (задан LEASE_DB)."""
+    leases = open_leases(before_release=store.flush if store else None)
+    if leases:
+        leases.start([key])
+    return leases
+
+
+def take_turn(leases, store, key, timestamp):
+    """Метка для запроса или None, если токен опрашивает другая реплика."""
+    if leases is None:
+        return timestamp
+    if not leases.owns(key):
+        logger.debug('Токен опрашивает другая реплика')
+        return None
+    stored = store.load_watermark(key) if store else None
+    return max(timestamp, stored or 0)
+
+
+def report_status(bot, homework, store=None, message=None):
+    """Записывает статус дз в outbox, а без хранилища отправляет сразу."""
+    if message is None:
+        message = parse_status(homework)
+    if store is None:
+        return send_message(bot, message)
+    store.enqueue(
+        tenant_key(PRACTICUM_TOKEN), fingerprint(homework),
+        TELEGRAM_CHAT_ID, message
     )
+    return True
+
+
+def report_changes(bot, index, changes, store=None, digests=None):
+    """Сообщает об изменениях статусов и выгружает outbox.
+
+    Все изменения одного опроса склеиваются в как можно меньше сообщений,
+    дз, о которых не составить сообщение, пропускаются (`render_changes`).
+    Если сообщение не ушло, изменения забываются индексом и метка
+    времени не сдвигается: статус придёт снова при следующем опросе.
+    """
+    rendered = render_changes(changes)
+    if store:
+        for homework, message in rendered:
+            report_status(bot, homework, store, message)
+        drain_outbox(bot, store, digests.held() if digests else ())
+        return
+    sent = 0
+    for message, count in pack_messages([text for _, text in rendered]):
+        if not send_message(bot, message):
+            for missed, _ in rendered[sent:]:
+                index.forget(missed)
+            raise SendError('Не удалось отправить статус дз')
+        sent += count
+
+
+def drain_outbox(bot, store, hold=(), deadline=None):
+    """Отправляет недоставленные сообщения outbox, склеивая их по чатам.
+
+    Сообщения чатов из `hold` (ждущих своего дайджеста) остаются в outbox,
+    как и всё, что не успело уйти до `deadline` (time.monotonic()).
+    """
+    sent = 0
+    try:
+        while True:
+            batch = store.pending_messages(hold=hold)
+            for chat_id, text, ids in pack_outbox(batch):
+                if deadline is not None and time.monotonic() >= deadline:
+                    logger.warning('Не все сообщения outbox успели уйти')
+                    return sent
+                outcome = send_to_chat(bot, chat_id, text)
+                for message_id in ids:
+                    if outcome:
+                        store.mark_sent(message_id)
+                    else:
+                        store.mark_failed(message_id, outcome is DROP)
+                if not outcome:
+                    return sent
+                sent += len(ids)
+            if len(batch) < OUTBOX_BATCH:
+                return sent
+    finally:
+        store.flush()
+
+
+def alert(bot, errors, message):
+    """Отправляет сообщение агрегатора ошибок, если оно есть."""
+    if message and send_message(bot, message):
+        errors.sent()
+
+
+def log_settings():
+    """Настройка логгера: запись в файл идёт в фоновом потоке."""
+    return setup_logging()
 
 
 # Здесь установлены настройки логгера для текущего файла :
 logger = logging.getLogger(__name__)
 if __name__ == '__main__':
+    configure()
     log_settings()
     main()
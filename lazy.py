@@ -0,0 +1,26 @@
+import importlib.util
+import sys
+import threading
+
+_LOCK = threading.Lock()
+
+
+def lazy_import(name):
+    """Модуль, который загрузится при первом обращении к его атрибуту.
+
+    Объект сразу попадает в `sys.modules`, поэтому `import name` в других
+    местах (и `monkeypatch` в тестах) работает с тем же модулем.
+    """
+    with _LOCK:
+        module = sys.modules.get(name)
+        if module is not None:
+            return module
+        spec = importlib.util.find_spec(name)
+        if spec is None:
+            raise ModuleNotFoundError(f'No module named {name!r}', name=name)
+        loader = importlib.util.LazyLoader(spec.loader)
+        spec.loader = loader
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[name] = module
+        loader.exec_module(module)
+        return module
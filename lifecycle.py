@@ -0,0 +1,166 @@
+import logging
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+
+import bootstrap  # noqa: F401 (.env до чтения настроек модулями)
+
+# Сколько секунд после SIGTERM/SIGINT досылаются сообщения и сохраняется
+# состояние; Heroku даёт процессу 30 секунд до SIGKILL.
+SHUTDOWN_TIMEOUT = float(os.getenv('SHUTDOWN_TIMEOUT', 20))
+# Unix-сокет для команд `poll` и `stop`: `python lifecycle.py poll`.
+CONTROL_SOCKET = os.getenv('CONTROL_SOCKET', '')
+COMMANDS = {'poll': 'SIGUSR1', 'stop': 'SIGTERM'}
+
+logger = logging.getLogger(__name__)
+
+
+class Wakeup(Exception):
+    """Прерывает паузу между опросами.
+
+    Обработчик сигнала поднимает его, только пока выставлен флаг
+    `Control.sleeping`. Флаг ставится и снимается внутри `try`, который
+    перехватывает `Wakeup`, поэтому запрос и отправка сообщений никогда
+    не обрываются на середине, а исключение не выходит за пределы паузы.
+    """
+
+
+class Control:
+    """Управление циклом опроса сигналами.
+
+    SIGTERM и SIGINT останавливают цикл после текущего опроса, SIGUSR1
+    запускает опрос немедленно. Те же команды принимает unix-сокет
+    `CONTROL_SOCKET`. Подписчики (`subscribe`) узнают о сигналах из
+    обработчика — так их получает цикл asyncio.
+    """
+
+    def __init__(self, path=CONTROL_SOCKET):
+        """Управление без обработчиков; их ставит `install()`."""
+        self.path = path
+        self.stopping = False
+        self.poll_requested = False
+        self.sleeping = False
+        self._listeners = []
+        self._previous = {}
+        self._socket = None
+
+    def __enter__(self):
+        """Устанавливает обработчики сигналов."""
+        return self.install()
+
+    def __exit__(self, exc_type, exc, traceback):
+        """Возвращает прежние обработчики сигналов."""
+        self.restore()
+
+    def subscribe(self, callback):
+        """Вызывать `callback()` при каждом сигнале управления."""
+        self._listeners.append(callback)
+
+    def delay(self, delay):
+        """Длительность паузы: 0, если сигнал пришёл во время опроса."""
+        if self.stopping or self.poll_requested:
+            self.poll_requested = False
+            return 0
+        return delay
+
+    def sleep(self, delay):
+        """Пауза между опросами, которую прерывает сигнал управления."""
+        try:
+            try:
+                self.sleeping = True
+                time.sleep(self.delay(delay))
+            finally:
+                self.sleeping = False
+        except Wakeup:
+            pass
+
+    def request_stop(self, *args):
+        """Обработчик SIGTERM/SIGINT."""
+        if not self.stopping:
+            logger.info('Получен сигнал остановки')
+        self.stopping = True
+        self._notify()
+
+    def request_poll(self, *args):
+        """Обработчик SIGUSR1."""
+        logger.info('Запрошен внеочередной опрос')
+        self.poll_requested = True
+        self._notify()
+
+    def _notify(self):
+        for callback in self._listeners:
+            callback()
+        if self.sleeping:
+            # Пауза прервана — запрос на опрос исполнен.
+            self.sleeping = False
+            self.poll_requested = False
+            raise Wakeup
+
+    def install(self):
+        """Перехватывает сигналы; вне главного потока ничего не делает."""
+        if threading.current_thread() is not threading.main_thread():
+            return self
+        handlers = {
+            'SIGTERM': self.request_stop,
+            'SIGINT': self.request_stop,
+            'SIGUSR1': self.request_poll,
+        }
+        for name, handler in handlers.items():
+            number = getattr(signal, name, None)
+            if number is not None:
+                self._previous[number] = signal.signal(number, handler)
+        if self.path:
+            self._listen()
+        return self
+
+    def restore(self):
+        """Снимает обработчики и закрывает управляющий сокет."""
+        for number, handler in self._previous.items():
+            signal.signal(number, handler)
+        self._previous.clear()
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+            os.unlink(self.path)
+
+    def _listen(self):
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._socket.bind(self.path)
+        threading.Thread(
+            target=self._serve, args=(self._socket,),
+            name='control', daemon=True
+        ).start()
+
+    def _serve(self, sock):
+        # Команда превращается в сигнал главному потоку: только так
+        # можно прервать его паузу.
+        main = threading.main_thread().ident
+        while True:
+            try:
+                command = sock.recv(64).decode().strip()
+            except OSError:
+                return
+            name = COMMANDS.get(command)
+            if name is None:
+                logger.warning(f'Неизвестная команда управления: {command}')
+                continue
+            signal.pthread_kill(main, getattr(signal, name))
+
+
+def send_command(command, path=CONTROL_SOCKET):
+    """Отправляет команду работающему боту через управляющий сокет."""
+    if command not in COMMANDS:
+        raise ValueError(
+            f'Команда должна быть одной из: {", ".join(COMMANDS)}'
+        )
+    with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sock:
+        sock.sendto(command.encode(), path)
+
+
+if __name__ == '__main__':
+    send_command(sys.argv[1] if len(sys.argv) > 1 else 'poll')
@@ -0,0 +1,99 @@
+import atexit
+import gzip
+import logging
+import os
+import queue
+import shutil
+from logging.handlers import (QueueHandler, QueueListener,
+                              RotatingFileHandler, TimedRotatingFileHandler)
+
+LOG_FILE = os.getenv(
+    'LOG_FILE', os.path.join(os.path.dirname(__file__), 'program.log')
+)
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'DEBUG')
+# Уровни отдельных модулей: "engine=INFO,transport=WARNING".
+LOG_LEVELS = os.getenv('LOG_LEVELS', '')
+LOG_MAX_BYTES = int(os.getenv('LOG_MAX_BYTES', 10 * 1024 * 1024))
+LOG_BACKUPS = int(os.getenv('LOG_BACKUPS', 5))
+# Ротация по времени ('midnight', 'H', ...) вместо ротации по размеру.
+LOG_ROTATE_WHEN = os.getenv('LOG_ROTATE_WHEN', '')
+LOG_FORMAT = (
+    '%(asctime)s|%(levelname)s|%(lineno)d|'
+    '%(funcName)s|%(message)s|%(name)s'
+)
+
+
+class BackgroundListener(QueueListener):
+    """QueueListener, который можно безопасно останавливать повторно."""
+
+    def stop(self):
+        """Дописывает оставшиеся записи и останавливает поток."""
+        if self._thread is not None:
+            super().stop()
+
+
+def gzip_namer(name):
+    """Имя архива для ротированного файла."""
+    return f'{name}.gz'
+
+
+def gzip_rotator(source, dest):
+    """Сжимает ротированный лог и удаляет исходный файл."""
+    with open(source, 'rb') as log_file, gzip.open(dest, 'wb') as archive:
+        shutil.copyfileobj(log_file, archive)
+    os.remove(source)
+
+
+def parse_levels(spec):
+    """Разбирает строку вида "module=LEVEL,..." в словарь."""
+    levels = {}
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        name, _, level = item.partition('=')
+        levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def file_handler(path, max_bytes=LOG_MAX_BYTES, backups=LOG_BACKUPS,
+                 when=LOG_ROTATE_WHEN):
+    """Файловый обработчик с ротацией и сжатием старых файлов."""
+    if when:
+        handler = TimedRotatingFileHandler(
+            path, when=when, backupCount=backups, encoding='utf-8',
+            delay=True
+        )
+    else:
+        handler = RotatingFileHandler(
+            path, maxBytes=max_bytes, backupCount=backups, encoding='utf-8',
+            delay=True
+        )
+    handler.namer = gzip_namer
+    handler.rotator = gzip_rotator
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    return handler
+
+
+def setup_logging(path=LOG_FILE, level=LOG_LEVEL, levels=LOG_LEVELS,
+                  handler=None):
+    """Настраивает неблокирующее логирование.
+
+    Вызывающий код только кладёт записи в очередь, а запись в файл,
+    ротацию и сжатие выполняет фоновый поток `QueueListener`. Повторный
+    вызов заменяет очередь, установленную прежним.
+    """
+    records = queue.SimpleQueue()
+    listener = BackgroundListener(
+        records, handler or file_handler(path), respect_handler_level=True
+    )
+    root = logging.getLogger()
+    # Воркер, запущенный через fork, наследует QueueHandler супервизора,
+    # а очередь того в дочернем процессе никто не читает.
+    for old in root.handlers[:]:
+        if isinstance(old, QueueHandler):
+            root.removeHandler(old)
+    root.setLevel(level)
+    root.addHandler(QueueHandler(records))
+    for name, module_level in parse_levels(levels).items():
+        logging.getLogger(name).setLevel(module_level)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
@@ -0,0 +1,267 @@
+import bisect
+import inspect
+import logging
+import os
+import threading
+import time
+
+import exceptions
+
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+# Порт эндпоинта /metrics, 0 — эндпоинт выключен.
+METRICS_PORT = int(os.getenv('METRICS_PORT', 0))
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30
+)
+LAG_BUCKETS = (0.01, 0.1, 0.5, 1, 5, 10, 30, 60, 300)
+
+logger = logging.getLogger(__name__)
+
+
+def _labels(values):
+    if not values:
+        return ''
+    pairs = ','.join(f'{name}="{value}"' for name, value in values)
+    return '{' + pairs + '}'
+
+
+class Metric:
+    """Базовая метрика: имя, описание и блокировка."""
+
+    kind = 'untyped'
+
+    def __init__(self, name, documentation):
+        """Имя метрики и её описание для Prometheus."""
+        self.name = name
+        self.documentation = documentation
+        self._lock = threading.Lock()
+
+    def header(self):
+        """Строки HELP и TYPE."""
+        return [
+            f'# HELP {self.name} {self.documentation}',
+            f'# TYPE {self.name} {self.kind}',
+        ]
+
+
+class Counter(Metric):
+    """Счётчик с одной меткой."""
+
+    kind = 'counter'
+
+    def __init__(self, name, documentation, label, values=()):
+        """Счётчик по значениям метки `label`."""
+        super().__init__(name, documentation)
+        self.label = label
+        self.values = dict.fromkeys(values, 0)
+
+    def inc(self, value, amount=1):
+        """Увеличивает счётчик для значения метки."""
+        with self._lock:
+            self.values[value] = self.values.get(value, 0) + amount
+
+    def render(self):
+        """Строки в текстовом формате Prometheus."""
+        return self.header() + [
+            f'{self.name}{_labels([(self.label, value)])} {count}'
+            for value, count in sorted(self.values.items())
+        ]
+
+
+class Gauge(Metric):
+    """Показатель, значения которого считываются при запросе метрик."""
+
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, label):
+        """Показатель, значения которого читаются из источников."""
+        super().__init__(name, documentation)
+        self.label = label
+        self.sources = {}
+
+    def track(self, value, source):
+        """Регистрирует функцию, возвращающую текущее значение."""
+        self.sources[value] = source
+
+    def render(self):
+        """Строки в текстовом формате Prometheus."""
+        lines = self.header()
+        for value, source in sorted(self.sources.items()):
+            try:
+                current = source()
+            except Exception as error:
+                logger.warning(f'Метрика {self.name} недоступна: {error}')
+                continue
+            lines.append(
+                f'{self.name}{_labels([(self.label, value)])} {current}'
+            )
+        return lines
+
+
+class Histogram(Metric):
+    """Гистограмма с фиксированными границами корзин."""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, buckets=LATENCY_BUCKETS):
+        """Гистограмма с верхними границами корзин `buckets`."""
+        super().__init__(name, documentation)
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        """Учитывает одно наблюдение."""
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def render(self):
+        """Строки в текстовом формате Prometheus."""
+        lines = self.header()
+        total = 0
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            total += count
+            lines.append(f'{self.name}_bucket{{le="{bound}"}} {total}')
+        lines.append(f'{self.name}_sum {self.sum}')
+        lines.append(f'{self.name}_count {total}')
+        return lines
+
+
+class Timer:
+    """Контекстный менеджер, измеряющий длительность блока."""
+
+    __slots__ = ('histogram', 'started')
+
+    def __init__(self, histogram):
+        """Замер пишется в гистограмму `histogram`."""
+        self.histogram = histogram
+
+    def __enter__(self):
+        """Запоминает время начала."""
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        """Записывает длительность в гистограмму."""
+        self.histogram.observe(time.perf_counter() - self.started)
+
+
+class LagTracker:
+    """Отставание пробуждения цикла от запланированного."""
+
+    __slots__ = ('histogram', 'expected')
+
+    def __init__(self, histogram):
+        """Отставание пишется в гистограмму `histogram`."""
+        self.histogram = histogram
+        self.expected = None
+
+    def expect(self, delay):
+        """Запоминает, когда цикл должен проснуться."""
+        self.expected = time.monotonic() + delay
+
+    def check(self):
+        """Учитывает отставание текущего пробуждения."""
+        if self.expected is not None:
+            self.histogram.observe(max(time.monotonic() - self.expected, 0))
+            self.expected = None
+
+
+def exception_names():
+    """Имена всех исключений из exceptions.py."""
+    return [
+        name for name, value in vars(exceptions).items()
+        if inspect.isclass(value) and issubclass(value, Exception)
+    ]
+
+
+API_LATENCY = Histogram(
+    'homework_api_request_seconds',
+    'Длительность запросов к API Практикума.'
+)
+SEND_LATENCY = Histogram(
+    'homework_telegram_send_seconds',
+    'Длительность отправки сообщений в Telegram.'
+)
+LOOP_LAG = Histogram(
+    'homework_poll_lag_seconds',
+    'Отставание начала опроса от запланированного времени.',
+    LAG_BUCKETS
+)
+ERRORS = Counter(
+    'homework_errors_total',
+    'Число исключений по классам.',
+    'exception', exception_names()
+)
+QUEUE_DEPTH = Gauge(
+    'homework_queue_depth',
+    'Глубина внутренних очередей.',
+    'queue'
+)
+API_BYTES = Counter(
+    'homework_api_bytes_total',
+    'Байты ответов API: переданные по сети и сэкономленные сжатием и 304.',
+    'kind', ('on_wire', 'saved')
+)
+CONDITIONAL = Counter(
+    'homework_api_conditional_total',
+    'Условные опросы API по исходу.',
+    'outcome', ('changed', 'decode_skipped', 'not_modified')
+)
+OUTBOX_DROPPED = Counter(
+    'homework_outbox_dropped_total',
+    'Сообщения outbox, от доставки которых пришлось отказаться.',
+    'reason', ('permanent_error',)
+)
+REGISTRY = [
+    API_LATENCY, SEND_LATENCY, LOOP_LAG, ERRORS, QUEUE_DEPTH, API_BYTES,
+    CONDITIONAL, OUTBOX_DROPPED,
+]
+
+
+def count_error(error):
+    """Учитывает исключение в счётчике по его классу."""
+    ERRORS.inc(type(error).__name__)
+
+
+def render():
+    """Все метрики в текстовом формате Prometheus."""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+def _serve_metrics(handler):
+    if handler.path.split('?')[0] != '/metrics':
+        handler.send_error(404)
+        return
+    body = render().encode()
+    handler.send_response(200)
+    handler.send_header('Content-Type', 'text/plain; version=0.0.4')
+    handler.send_header('Content-Length', str(len(body)))
+    handler.end_headers()
+    handler.wfile.write(body)
+
+
+def start_server(port=METRICS_PORT, host=METRICS_HOST):
+    """Запускает эндпоинт /metrics в фоновом потоке, если задан порт."""
+    if not port:
+        return None
+    # http.server тянет за собой ssl и email, поэтому импортируется,
+    # только когда метрики включены.
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        do_GET = _serve_metrics
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    logger.info(f'Метрики доступны на http://{host}:{port}/metrics')
+    return server
@@ -0,0 +1,168 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from storage import tenant_key
+
+# Сколько секунд одинаковый опрос (токен и from_date) берётся из кэша;
+# 0 — кэш выключен.
+RESPONSE_CACHE_TTL = float(os.getenv('RESPONSE_CACHE_TTL', 30))
+RESPONSE_CACHE_SIZE = int(os.getenv('RESPONSE_CACHE_SIZE', 1024))
+# База SQLite, через которую кэш разделяют процессы-воркеры.
+RESPONSE_CACHE_DB = os.getenv('RESPONSE_CACHE_DB', '')
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    body BLOB NOT NULL,
+    stored REAL NOT NULL,
+    used REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS responses_used ON responses (used);
+'''
+
+logger = logging.getLogger(__name__)
+
+
+def cache_key(authorization, from_date):
+    """Ключ кэша: хеш токена и начало периода опроса."""
+    return f'{tenant_key(authorization)}:{from_date}'
+
+
+class MemoryCache:
+    """Кэш тел ответов в памяти процесса с TTL и вытеснением LRU."""
+
+    def __init__(self, ttl=RESPONSE_CACHE_TTL, maxsize=RESPONSE_CACHE_SIZE,
+                 clock=time.monotonic):
+        """Кэш на `maxsize` записей, каждая живёт `ttl` секунд."""
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.clock = clock
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        """Число записей, включая ещё не вытесненные устаревшие."""
+        return len(self._items)
+
+    def get(self, key):
+        """Тело ответа или None, если его нет или оно устарело."""
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            stored, body = item
+            if self.clock() - stored >= self.ttl:
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return body
+
+    def put(self, key, body):
+        """Запоминает тело ответа, вытесняя давно не читавшиеся."""
+        with self._lock:
+            self._items[key] = (self.clock(), body)
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+
+class DiskCache:
+    """Кэш тел ответов в SQLite, общий для нескольких процессов."""
+
+    def __init__(self, path=RESPONSE_CACHE_DB, ttl=RESPONSE_CACHE_TTL,
+                 maxsize=RESPONSE_CACHE_SIZE, clock=time.time):
+        """Открывает базу кэша `path` и создаёт таблицу."""
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=OFF')
+        self._conn.executescript(SCHEMA)
+
+    def __len__(self):
+        """Число записей в базе."""
+        with self._lock:
+            return self._conn.execute(
+                'SELECT COUNT(*) FROM responses'
+            ).fetchone()[0]
+
+    def get(self, key):
+        """Тело ответа или None, если его нет или оно устарело."""
+        now = self.clock()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                'SELECT body FROM responses WHERE key = ? AND stored > ?',
+                (key, now - self.ttl)
+            ).fetchone()
+            if row is not None:
+                self._conn.execute(
+                    'UPDATE responses SET used = ? WHERE key = ?', (now, key)
+                )
+        return None if row is None else bytes(row[0])
+
+    def put(self, key, body):
+        """Запоминает тело ответа и вытесняет устаревшие и лишние записи."""
+        now = self.clock()
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO responses (key, body, stored, used) '
+                'VALUES (?, ?, ?, ?)', (key, body, now, now)
+            )
+            self._conn.execute(
+                'DELETE FROM responses WHERE stored <= ?', (now - self.ttl,)
+            )
+            self._conn.execute(
+                'DELETE FROM responses WHERE key IN (SELECT key FROM '
+                'responses ORDER BY used DESC LIMIT -1 OFFSET ?)',
+                (self.maxsize,)
+            )
+
+    def close(self):
+        """Закрывает базу."""
+        with self._lock:
+            self._conn.close()
+
+
+class TieredCache:
+    """Несколько уровней кэша: промах верхнего ищется в следующих."""
+
+    def __init__(self, *layers):
+        """Уровни перечисляются от быстрого к медленному."""
+        self.layers = layers
+
+    def get(self, key):
+        """Тело ответа из первого уровня, где оно есть."""
+        for number, layer in enumerate(self.layers):
+            body = layer.get(key)
+            if body is not None:
+                for upper in self.layers[:number]:
+                    upper.put(key, body)
+                return body
+        return None
+
+    def put(self, key, body):
+        """Запоминает тело ответа на всех уровнях."""
+        for layer in self.layers:
+            layer.put(key, body)
+
+    def close(self):
+        """Закрывает уровни, которые это умеют."""
+        for layer in self.layers:
+            if hasattr(layer, 'close'):
+                layer.close()
+
+
+def open_cache(ttl=RESPONSE_CACHE_TTL, path=RESPONSE_CACHE_DB):
+    """Кэш ответов по настройкам окружения или None, если он выключен."""
+    if not ttl:
+        return None
+    memory = MemoryCache(ttl)
+    if not path:
+        return memory
+    return TieredCache(memory, DiskCache(path, ttl))
@@ -0,0 +1,101 @@
+import os
+import random
+import threading
+import time
+
+from exceptions import EndpointError, GetApiError
+
+REVIEWING_PERIOD = int(os.getenv('REVIEWING_PERIOD', 120))
+MAX_PERIOD = int(os.getenv('MAX_PERIOD', 3600))
+# Общий лимит запросов к API в час на все арендаторы, 0 — без лимита.
+REQUEST_BUDGET = int(os.getenv('REQUEST_BUDGET', 0))
+BACKOFF_FACTOR = 2
+JITTER = 0.1
+BACKOFF_ERRORS = (EndpointError, GetApiError)
+
+
+class PollPolicy:
+    """Решает, через сколько секунд снова опрашивать API.
+
+    Пока работа на ревью, опрашивает часто. При простое и при ошибках
+    доступа к эндпоинту интервал растёт экспоненциально со случайным
+    разбросом, но не больше `maximum`. Первый интервал простоя равен
+    базовому периоду.
+    """
+
+    def __init__(self, base, fast=REVIEWING_PERIOD, maximum=MAX_PERIOD,
+                 factor=BACKOFF_FACTOR, jitter=JITTER):
+        """Политика с базовым интервалом `base` секунд."""
+        self.base = base
+        self.fast = min(fast, base)
+        self.maximum = max(maximum, base)
+        self.factor = factor
+        self.jitter = jitter
+        self.in_review = set()
+        self.idle_streak = 0
+        self.error_streak = 0
+
+    def _backoff(self, streak):
+        delay = min(self.base * self.factor ** streak, self.maximum)
+        if streak:
+            delay *= random.uniform(1 - self.jitter, 1 + self.jitter)
+        return delay
+
+    def next_delay(self, homeworks=None, error=None):
+        """Интервал до следующего опроса по итогам текущего."""
+        if isinstance(error, BACKOFF_ERRORS):
+            self.error_streak += 1
+            return self._backoff(self.error_streak)
+        self.error_streak = 0
+        for homework in homeworks or ():
+            if not isinstance(homework, dict):
+                continue
+            key = homework.get('id', homework.get('homework_name'))
+            if homework.get('status') == 'reviewing':
+                self.in_review.add(key)
+            else:
+                self.in_review.discard(key)
+        if homeworks or self.in_review:
+            self.idle_streak = 0
+        else:
+            self.idle_streak += 1
+        if self.in_review:
+            return self.fast
+        return self._backoff(max(self.idle_streak - 1, 0))
+
+
+class TokenBucket:
+    """Потокобезопасное ведро токенов: `rate` токенов в секунду."""
+
+    def __init__(self, rate, capacity=1, clock=time.monotonic):
+        """Ведро на `capacity` токенов, пополняемое `rate` в секунду."""
+        self.rate = rate
+        self.capacity = max(capacity, 1)
+        self._clock = clock
+        self._tokens = self.capacity
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """Резервирует токен; возвращает, сколько секунд подождать."""
+        if not self.rate:
+            return 0
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(
+                self.capacity,
+                self._tokens + (now - self._updated) * self.rate
+            )
+            self._updated = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0
+            return -self._tokens / self.rate
+
+
+class RequestBudget(TokenBucket):
+    """Общий для всех арендаторов лимит запросов в час."""
+
+    def __init__(self, per_hour=REQUEST_BUDGET, clock=time.monotonic):
+        """Бюджет на `per_hour` запросов в час."""
+        super().__init__(per_hour / 3600, per_hour / 60, clock)
@@ -0,0 +1,132 @@
+import calendar
+import sys
+import threading
+import zlib
+from array import array
+
+# Статусы кодируются номерами; таблица общая для всех арендаторов.
+STATUSES = [None]
+_STATUS_CODES = {None: 0}
+_STATUS_LOCK = threading.Lock()
+
+
+class HomeworkRecord:
+    """Последний известный статус одной дз."""
+
+    __slots__ = ('name', 'status', 'date_updated')
+
+    def __init__(self, name, status, date_updated):
+        """Название, статус и время обновления дз."""
+        self.name = name
+        self.status = status
+        self.date_updated = date_updated
+
+
+def homework_key(homework):
+    """Ключ дз в индексе: id, а при его отсутствии — название."""
+    return homework.get('id', homework.get('homework_name'))
+
+
+def status_code(status):
+    """Номер статуса в общей таблице `STATUSES`."""
+    code = _STATUS_CODES.get(status)
+    if code is None:
+        with _STATUS_LOCK:
+            code = _STATUS_CODES.setdefault(status, len(STATUSES))
+            if code == len(STATUSES):
+                STATUSES.append(status)
+    return code
+
+
+def date_code(value):
+    """`date_updated` вида '2021-04-11T10:31:09Z' в секундах эпохи."""
+    if isinstance(value, int):
+        return value
+    try:
+        return calendar.timegm((
+            int(value[0:4]), int(value[5:7]), int(value[8:10]),
+            int(value[11:13]), int(value[14:16]), int(value[17:19]),
+        ))
+    except (TypeError, ValueError):
+        # Нестандартная дата всё равно должна отличаться от других.
+        return -1 - zlib.crc32(str(value).encode())
+
+
+class StatusIndex:
+    """Индекс статусов дз по id.
+
+    За один проход по ответу API находит работы, у которых сменился
+    статус или время обновления, и сразу запоминает новое состояние.
+    Хранится только нужное для сравнения: код статуса и время обновления
+    в массивах и ссылка на название, а не копии словарей из ответа.
+    """
+
+    __slots__ = ('_positions', '_statuses', '_dates', '_names', '_free')
+
+    def __init__(self):
+        """Пустой индекс."""
+        self._positions = {}
+        self._statuses = array('H')
+        self._dates = array('q')
+        self._names = []
+        self._free = []
+
+    def __len__(self):
+        """Число дз в индексе."""
+        return len(self._positions)
+
+    def __contains__(self, key):
+        """Есть ли дз с таким ключом в индексе."""
+        return key in self._positions
+
+    def get(self, key):
+        """Запись о дз по ключу или None."""
+        position = self._positions.get(key)
+        if position is None:
+            return None
+        return HomeworkRecord(
+            self._names[position], STATUSES[self._statuses[position]],
+            self._dates[position]
+        )
+
+    def forget(self, homework):
+        """Удаляет дз из индекса, чтобы её статус снова считался новым."""
+        position = self._positions.pop(homework_key(homework), None)
+        if position is not None:
+            self._names[position] = None
+            self._free.append(position)
+
+    def _add(self, key, name, status, date):
+        if self._free:
+            position = self._free.pop()
+            self._statuses[position] = status
+            self._dates[position] = date
+            self._names[position] = name
+        else:
+            position = len(self._names)
+            self._statuses.append(status)
+            self._dates.append(date)
+            self._names.append(name)
+        self._positions[key] = position
+
+    def diff(self, homeworks):
+        """Возвращает дз с реальными изменениями статуса."""
+        changes = []
+        for homework in homeworks or ():
+            key = homework_key(homework)
+            status = status_code(homework.get('status'))
+            date = date_code(homework.get('date_updated'))
+            position = self._positions.get(key)
+            if position is None:
+                name = homework.get('homework_name')
+                if isinstance(name, str):
+                    name = sys.intern(name)
+                self._add(key, name, status, date)
+            elif (self._statuses[position] == status
+                    and self._dates[position] == date):
+                continue
+            else:
+                self._statuses[position] = status
+                self._dates[position] = date
+            changes.append(homework)
+        return changes
@@ -0,0 +1,267 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter, namedtuple
+
+import metrics
+
+STATE_DB = os.getenv('STATE_DB', '')
+FLUSH_EVERY = int(os.getenv('STATE_FLUSH_EVERY', 100))
+FLUSH_INTERVAL = float(os.getenv('STATE_FLUSH_INTERVAL', 5))
+OUTBOX_BATCH = int(os.getenv('OUTBOX_BATCH', 50))
+# Пауза перед повтором после n неудачных выгрузок: base * (2**n - 1),
+# то есть первый повтор сразу, дальше всё реже, но не реже раза в час.
+OUTBOX_RETRY_DELAY = float(os.getenv('OUTBOX_RETRY_DELAY', 5))
+OUTBOX_MAX_RETRY_DELAY = float(os.getenv('OUTBOX_MAX_RETRY_DELAY', 3600))
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS watermarks (
+    tenant TEXT PRIMARY KEY,
+    watermark INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY,
+    tenant TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    chat_id TEXT NOT NULL,
+    text TEXT NOT NULL,
+    created REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    delivered REAL,
+    retry_at REAL NOT NULL DEFAULT 0,
+    dropped REAL,
+    UNIQUE (tenant, fingerprint)
+);
+CREATE INDEX IF NOT EXISTS outbox_pending ON outbox (id)
+    WHERE delivered IS NULL;
+'''
+
+# Столбцы, добавленные в outbox позже: базы прежних версий дополняются.
+OUTBOX_COLUMNS = (
+    ('retry_at', 'REAL NOT NULL DEFAULT 0'),
+    ('dropped', 'REAL'),
+)
+
+OutboxMessage = namedtuple('OutboxMessage', 'id chat_id text')
+
+logger = logging.getLogger(__name__)
+
+
+def tenant_key(token):
+    """Короткий идентификатор арендатора, не раскрывающий токен."""
+    return hashlib.sha256(str(token).encode()).hexdigest()[:12]
+
+
+def fingerprint(homework):
+    """Отпечаток статуса дз: id, статус и время обновления."""
+    return '{}:{}:{}'.format(
+        homework.get('id', homework.get('homework_name')),
+        homework.get('status'),
+        homework.get('date_updated'),
+    )
+
+
+class StateStore:
+    """Постоянное состояние опроса в SQLite (режим WAL).
+
+    Хранит для каждого арендатора последний `current_date` и outbox —
+    сообщения об изменениях статусов с ключом идемпотентности
+    (отпечатком статуса). Записи копятся в памяти и сбрасываются одной
+    транзакцией каждые `flush_every` изменений или `flush_interval` секунд,
+    поэтому водяной знак не опережает сообщения, найденные до него.
+    """
+
+    def __init__(self, path=STATE_DB, flush_every=FLUSH_EVERY,
+                 flush_interval=FLUSH_INTERVAL, retry_delay=OUTBOX_RETRY_DELAY,
+                 max_retry_delay=OUTBOX_MAX_RETRY_DELAY):
+        """Открывает базу `path`; запись копится до `flush_every` изменений."""
+        self.path = path
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(SCHEMA)
+        self._migrate()
+        self._watermarks = {}
+        self._outbox = {}
+        self._sent = {}
+        self._failed = Counter()
+        self._dropped = {}
+        self._flushed_at = time.monotonic()
+
+    def _migrate(self):
+        columns = {
+            row[1] for row in self._conn.execute('PRAGMA table_info(outbox)')
+        }
+        for name, definition in OUTBOX_COLUMNS:
+            if name not in columns:
+                self._conn.execute(
+                    f'ALTER TABLE outbox ADD COLUMN {name} {definition}'
+                )
+
+    def load_watermark(self, tenant):
+        """Последний сохранённый `current_date` арендатора или None."""
+        with self._lock:
+            if tenant in self._watermarks:
+                return self._watermarks[tenant]
+            row = self._conn.execute(
+                'SELECT watermark FROM watermarks WHERE tenant = ?',
+                (tenant,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def load_watermarks(self):
+        """Все сохранённые `current_date` по арендаторам."""
+        with self._lock:
+            rows = dict(self._conn.execute(
+                'SELECT tenant, watermark FROM watermarks'
+            ))
+            rows.update(self._watermarks)
+        return rows
+
+    def save_watermark(self, tenant, current_date):
+        """Запоминает `current_date` арендатора."""
+        with self._lock:
+            self._watermarks[tenant] = current_date
+            self._maybe_flush()
+
+    def enqueue(self, tenant, key, chat_id, text):
+        """Записывает сообщение в outbox; False, если ключ уже был."""
+        with self._lock:
+            if (tenant, key) in self._outbox or self._conn.execute(
+                'SELECT 1 FROM outbox WHERE tenant = ? AND fingerprint = ?',
+                (tenant, key)
+            ).fetchone():
+                return False
+            self._outbox[tenant, key] = (chat_id, text, time.time())
+            self._maybe_flush()
+        return True
+
+    def pending_messages(self, limit=OUTBOX_BATCH, exclude=(), hold=()):
+        """Очередная пачка недоставленных сообщений в порядке записи.
+
+        Сообщения после неудачной выгрузки ждут своей паузы (`mark_failed`).
+        `exclude` — id уже переданных на отправку сообщений, `hold` —
+        чаты, чьи сообщения пока не нужно выгружать.
+        """
+        held = ''
+        if hold:
+            held = f'AND chat_id NOT IN ({", ".join("?" * len(hold))}) '
+        with self._lock:
+            self.flush()
+            rows = self._conn.execute(
+                'SELECT id, chat_id, text FROM outbox '
+                'WHERE delivered IS NULL AND dropped IS NULL '
+                f'AND retry_at <= ? {held}ORDER BY id LIMIT ?',
+                (time.time(), *hold, limit + len(exclude))
+            ).fetchall()
+        return [
+            OutboxMessage(*row) for row in rows if row[0] not in exclude
+        ][:limit]
+
+    def mark_sent(self, message_id):
+        """Отмечает сообщение outbox доставленным."""
+        with self._lock:
+            self._sent[message_id] = time.time()
+            self._maybe_flush()
+
+    def mark_failed(self, message_id, permanent=False):
+        """Учитывает неудачную попытку доставки.
+
+        Сообщение повторяется с растущей паузой, пока его не доставят;
+        отбрасывается только после постоянной ошибки Telegram.
+        """
+        with self._lock:
+            if permanent:
+                self._dropped[message_id] = time.time()
+                metrics.OUTBOX_DROPPED.inc('permanent_error')
+                logger.error(
+                    f'Сообщение outbox {message_id} отброшено: '
+                    'Telegram отказал в доставке'
+                )
+            else:
+                self._failed[message_id] += 1
+            self._maybe_flush()
+
+    def is_delivered(self, tenant, key):
+        """Доставлено ли сообщение с таким ключом."""
+        with self._lock:
+            self.flush()
+            row = self._conn.execute(
+                'SELECT delivered FROM outbox '
+                'WHERE tenant = ? AND fingerprint = ?',
+                (tenant, key)
+            ).fetchone()
+        return row is not None and row[0] is not None
+
+    def pending(self):
+        """Число изменений, ещё не записанных на диск."""
+        return (len(self._watermarks) + len(self._outbox)
+                + len(self._sent) + len(self._failed) + len(self._dropped))
+
+    def _maybe_flush(self):
+        if (self.pending() >= self.flush_every
+                or time.monotonic() - self._flushed_at >= self.flush_interval):
+            self.flush()
+
+    def flush(self):
+        """Записывает накопленные изменения одной транзакцией."""
+        with self._lock:
+            if self.pending():
+                with self._conn:
+                    self._conn.executemany(
+                        'INSERT INTO watermarks (tenant, watermark) '
+                        'VALUES (?, ?) ON CONFLICT(tenant) '
+                        'DO UPDATE SET watermark = excluded.watermark',
+                        self._watermarks.items()
+                    )
+                    self._conn.executemany(
+                        'INSERT OR IGNORE INTO outbox '
+                        '(tenant, fingerprint, chat_id, text, created) '
+                        'VALUES (?, ?, ?, ?, ?)',
+                        [key + value for key, value in self._outbox.items()]
+                    )
+                    self._conn.executemany(
+                        'UPDATE outbox SET delivered = ? WHERE id = ?',
+                        [(when, id_) for id_, when in self._sent.items()]
+                    )
+                    self._conn.executemany(
+                        'UPDATE outbox SET attempts = attempts + ?, '
+                        'retry_at = ? + min(?, ? * '
+                        '((1 << min(attempts + ? - 1, 20)) - 1)) '
+                        'WHERE id = ?',
+                        [(count, time.time(), self.max_retry_delay,
+                          self.retry_delay, count, id_)
+                         for id_, count in self._failed.items()]
+                    )
+                    self._conn.executemany(
+                        'UPDATE outbox SET dropped = ? WHERE id = ?',
+                        [(when, id_) for id_, when in self._dropped.items()]
+                    )
+                logger.debug(f'Состояние сохранено: {self.pending()} записей')
+                self._watermarks.clear()
+                self._outbox.clear()
+                self._sent.clear()
+                self._failed.clear()
+                self._dropped.clear()
+            self._flushed_at = time.monotonic()
+
+    def close(self):
+        """Сбрасывает изменения и закрывает базу."""
+        with self._lock:
+            self.flush()
+            self._conn.close()
+
+
+def open_store(path=STATE_DB):
+    """Открывает хранилище состояния, если задан путь к базе."""
+    if not path:
+        return None
+    return StateStore(path)
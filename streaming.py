@@ -0,0 +1,178 @@
+import codecs
+import json
+import re
+from http import HTTPStatus
+
+import requests
+
+import homework
+from exceptions import (CurrentDateKeyError, CurrentDatTypeError,
+                        EndpointError, GetApiError, JSONError)
+
+CHUNK_SIZE = 64 * 1024
+WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+
+class _Reader:
+    """Буфер поверх потока байт, дочитывающий данные по требованию."""
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._utf8 = codecs.getincrementaldecoder('utf-8')()
+        self._json = json.JSONDecoder()
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def fill(self):
+        """Дочитывает следующий кусок; False, если поток закончился."""
+        if self.eof:
+            return False
+        chunk = next(self._chunks, None)
+        if chunk is None:
+            self.eof = True
+            tail = self._utf8.decode(b'', final=True)
+        else:
+            tail = self._utf8.decode(chunk)
+        self.buffer = self.buffer[self.pos:] + tail
+        self.pos = 0
+        return chunk is not None or bool(tail)
+
+    def peek(self):
+        """Следующий значимый символ или пустая строка в конце потока."""
+        while True:
+            self.pos = WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer) or not self.fill():
+                return self.buffer[self.pos:self.pos + 1]
+
+    def expect(self, char):
+        """Пропускает ожидаемый символ разметки."""
+        if self.peek() != char:
+            raise JSONError(
+                f'Ошибка при обработке JSON: ожидался "{char}" '
+                f'вместо "{self.peek()}"'
+            )
+        self.pos += 1
+
+    def value(self):
+        """Читает одно JSON-значение целиком."""
+        self.peek()
+        while True:
+            try:
+                value, end = self._json.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError as error:
+                if self.fill():
+                    continue
+                raise JSONError(f'Ошибка при обработке JSON: {error}')
+            # Число в конце буфера может оказаться обрезанным.
+            if end == len(self.buffer) and self.fill():
+                continue
+            self.pos = end
+            return value
+
+
+class HomeworkStream:
+    """Потоковый разбор ответа API.
+
+    Итерация выдаёт элементы `homeworks` по одному, не строя весь список
+    в памяти. Остальные ключи верхнего уровня (например, `current_date`)
+    попадают в `meta`; ключи, стоящие после `homeworks`, доступны после
+    окончания итерации.
+    """
+
+    def __init__(self, chunks):
+        """Поток разбора ответа из кусков тела `chunks`."""
+        self._reader = _Reader(chunks)
+        self.meta = {}
+        self.has_homeworks = False
+
+    def __iter__(self):
+        """Выдаёт дз по мере чтения потока."""
+        reader = self._reader
+        if reader.peek() != '{':
+            raise TypeError(
+                'Полученная структура данных не соответствует заданной (dict)'
+            )
+        reader.pos += 1
+        if reader.peek() == '}':
+            reader.pos += 1
+            return
+        while True:
+            key = reader.value()
+            reader.expect(':')
+            if key == 'homeworks':
+                yield from self._homeworks()
+            else:
+                self.meta[key] = reader.value()
+            if reader.peek() != ',':
+                break
+            reader.pos += 1
+        reader.expect('}')
+
+    def _homeworks(self):
+        reader = self._reader
+        self.has_homeworks = True
+        if reader.peek() != '[':
+            raise TypeError(
+                'Полученная структура данных ключа "homeworks"'
+                'не соответствует заданной (list)'
+            )
+        reader.pos += 1
+        if reader.peek() == ']':
+            reader.pos += 1
+            return
+        while True:
+            yield reader.value()
+            if reader.peek() != ',':
+                break
+            reader.pos += 1
+        reader.expect(']')
+
+
+def check_stream(stream):
+    """Потоковый аналог check_response: проверяет дз по одной."""
+    for item in stream:
+        if not isinstance(item, dict):
+            raise TypeError(
+                'Полученная структура данных дз не соответствует '
+                'заданной (dict)'
+            )
+        yield item
+    if not stream.has_homeworks:
+        raise KeyError('Ключ "homeworks" отсутствует')
+    if 'current_date' not in stream.meta:
+        raise CurrentDateKeyError('Ключ "current_date" отсутствует')
+    if not isinstance(stream.meta['current_date'], int):
+        raise CurrentDatTypeError(
+            'Полученная структура данных ключа "current_date"'
+            'не соответствует заданной (int)'
+        )
+
+
+def get_api_stream(timestamp, headers, transport=None):
+    """Делает запрос к эндпоинту и возвращает потоковый разбор ответа."""
+    transport = transport or requests
+    try:
+        response = transport.get(
+            homework.ENDPOINT, headers=headers,
+            params={'from_date': timestamp}, stream=True,
+            timeout=(homework.CONNECT_TIMEOUT, homework.READ_TIMEOUT)
+        )
+        if response.status_code != HTTPStatus.OK:
+            response.close()
+            raise EndpointError(
+                f'Эндпоинт - {homework.ENDPOINT} не доступен',
+                response.status_code
+            )
+    except requests.RequestException as error:
+        raise GetApiError(f'Ошибка при запросе к основному API: {error}')
+    return HomeworkStream(_chunks(response))
+
+
+def _chunks(response):
+    try:
+        yield from response.iter_content(CHUNK_SIZE)
+    except requests.RequestException as error:
+        raise GetApiError(f'Ошибка при запросе к основному API: {error}')
+    finally:
+        response.close()
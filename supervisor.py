@@ -0,0 +1,278 @@
+import bisect
+import hashlib
+import logging
+import multiprocessing
+import os
+import queue
+import signal
+import time
+
+import bootstrap  # noqa: F401 (.env до чтения настроек модулями)
+import engine
+import homework
+from lifecycle import SHUTDOWN_TIMEOUT, Control
+from log_config import LOG_FILE, setup_logging
+from storage import tenant_key
+
+WORKERS = int(os.getenv('WORKERS', os.cpu_count() or 1))
+# Число точек каждого воркера на кольце: чем больше, тем ровнее шарды.
+VIRTUAL_NODES = int(os.getenv('VIRTUAL_NODES', 100))
+# Не чаще одного перезапуска воркера за этот интервал, с.
+RESTART_DELAY = float(os.getenv('RESTART_DELAY', 5))
+CHECK_INTERVAL = 1
+# Воркер досылает сообщения после SIGTERM, поэтому ждём его дольше.
+STOP_TIMEOUT = SHUTDOWN_TIMEOUT + 5
+
+logger = logging.getLogger(__name__)
+
+
+def ring_hash(value):
+    """Стабильный между процессами и запусками хеш строки."""
+    digest = hashlib.blake2b(value.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'big')
+
+
+class HashRing:
+    """Консистентное хеширование с виртуальными узлами.
+
+    При добавлении или удалении узла переезжают только ключи, попавшие
+    на его участки кольца, — в среднем 1/N от всех.
+    """
+
+    def __init__(self, nodes=(), replicas=VIRTUAL_NODES):
+        """Кольцо узлов `nodes` по `replicas` точек на узел."""
+        self.replicas = replicas
+        self.nodes = set()
+        self._points = []
+        self._owners = []
+        for node in nodes:
+            self.add(node)
+
+    def add(self, node):
+        """Добавляет узел на кольцо."""
+        if node in self.nodes:
+            return
+        self.nodes.add(node)
+        for replica in range(self.replicas):
+            point = ring_hash(f'{node}#{replica}')
+            index = bisect.bisect(self._points, point)
+            self._points.insert(index, point)
+            self._owners.insert(index, node)
+
+    def remove(self, node):
+        """Убирает узел с кольца."""
+        if node not in self.nodes:
+            return
+        self.nodes.discard(node)
+        kept = [
+            (point, owner) for point, owner in zip(self._points, self._owners)
+            if owner != node
+        ]
+        self._points = [point for point, _ in kept]
+        self._owners = [owner for _, owner in kept]
+
+    def node_for(self, key):
+        """Узел, которому принадлежит ключ."""
+        if not self._points:
+            raise LookupError('На кольце нет узлов')
+        index = bisect.bisect(self._points, ring_hash(key))
+        return self._owners[index % len(self._points)]
+
+    def assign(self, keys):
+        """Раскладывает ключи по узлам."""
+        shards = {node: [] for node in self.nodes}
+        for key in keys:
+            shards[self.node_for(key)].append(key)
+        return shards
+
+
+def worker_names(count):
+    """Имена воркеров; воркер сохраняет имя и участки кольца."""
+    return [f'worker-{number}' for number in range(count)]
+
+
+def run_worker(name, tenants, stats):
+    """Точка входа процесса-воркера: опрос своего шарда арендаторов."""
+    # Ротация одного файла из нескольких процессов небезопасна.
+    setup_logging(f'{LOG_FILE}.{name}')
+    # При запуске через spawn воркер не наследует настройки супервизора.
+    homework.configure()
+    engine.serve(
+        [engine.Tenant(**item) for item in tenants],
+        reporter=lambda shard_stats: stats.put((name, shard_stats)),
+        pool=name
+    )
+
+
+class Supervisor:
+    """Запускает воркеры, следит за ними и собирает статистику шардов.
+
+    Арендаторы распределяются по воркерам консистентным хешированием.
+    Воркер опрашивает фиксированный набор арендаторов, поэтому при смене
+    числа воркеров перезапускаются только шарды, чей состав изменился;
+    водяные знаки и доставленные статусы переживают перезапуск
+    через STATE_DB.
+    """
+
+    def __init__(self, tenants, workers=WORKERS, target=run_worker,
+                 restart_delay=RESTART_DELAY, context=None):
+        """Раскладка арендаторов на `workers` воркеров."""
+        self.tenants = {tenant_key(item['token']): item for item in tenants}
+        self.ring = HashRing(worker_names(workers))
+        self.target = target
+        self.restart_delay = restart_delay
+        self.context = context or multiprocessing.get_context()
+        self.stats_queue = self.context.Queue()
+        self.processes = {}
+        self.shards = {}
+        self.shard_stats = {}
+        self.restarts = {}
+        self._started = {}
+
+    def plan(self):
+        """Состав шардов по текущему кольцу."""
+        return {
+            name: [self.tenants[key] for key in keys]
+            for name, keys in self.ring.assign(self.tenants).items()
+        }
+
+    def rebalance(self):
+        """Приводит воркеры к текущему кольцу; возвращает перезапущенные."""
+        shards = self.plan()
+        for name in set(self.processes) - set(shards):
+            self._stop(name)
+            self.shard_stats.pop(name, None)
+        changed = [
+            name for name, tenants in shards.items()
+            if name not in self.processes or self.shards.get(name) != tenants
+        ]
+        self.shards = shards
+        for name in changed:
+            self._stop(name)
+            self._spawn(name)
+        return changed
+
+    def resize(self, workers):
+        """Меняет число воркеров, перенося минимум арендаторов."""
+        names = set(worker_names(workers))
+        for name in names - self.ring.nodes:
+            self.ring.add(name)
+        for name in self.ring.nodes - names:
+            self.ring.remove(name)
+        logger.info(f'Число воркеров: {workers}')
+        return self.rebalance()
+
+    def _spawn(self, name):
+        process = self.context.Process(
+            target=self.target, name=name, daemon=True,
+            args=(name, self.shards[name], self.stats_queue)
+        )
+        process.start()
+        self.processes[name] = process
+        self._started[name] = time.monotonic()
+        logger.info(
+            f'Воркер {name} (pid {process.pid}): '
+            f'{len(self.shards[name])} арендаторов'
+        )
+
+    def _stop(self, name, timeout=STOP_TIMEOUT):
+        process = self.processes.pop(name, None)
+        if process is None:
+            return
+        process.terminate()
+        process.join(timeout)
+        if process.is_alive():
+            process.kill()
+            process.join()
+
+    def check(self):
+        """Перезапускает завершившиеся воркеры; возвращает их имена."""
+        restarted = []
+        now = time.monotonic()
+        for name, process in list(self.processes.items()):
+            if process.is_alive():
+                continue
+            if now - self._started[name] < self.restart_delay:
+                continue
+            logger.error(
+                f'Воркер {name} завершился с кодом {process.exitcode}, '
+                'перезапуск'
+            )
+            process.join()
+            self.restarts[name] = self.restarts.get(name, 0) + 1
+            self._spawn(name)
+            restarted.append(name)
+        return restarted
+
+    def collect(self):
+        """Забирает статистику, присланную воркерами."""
+        while True:
+            try:
+                name, stats = self.stats_queue.get_nowait()
+            except queue.Empty:
+                break
+            if name in self.shards:
+                self.shard_stats[name] = stats
+                logger.info(f'Шард {name}: {stats}')
+        return self.shard_stats
+
+    def stats(self):
+        """Сводка по всем шардам."""
+        summary = {}
+        for name, tenants in sorted(self.shards.items()):
+            process = self.processes.get(name)
+            summary[name] = dict(
+                self.shard_stats.get(name, {}),
+                tenants=len(tenants), restarts=self.restarts.get(name, 0),
+                alive=process is not None and process.is_alive()
+            )
+        return summary
+
+    def stop(self, timeout=STOP_TIMEOUT):
+        """Останавливает все воркеры, давая им одновременно завершиться."""
+        for process in self.processes.values():
+            process.terminate()
+        deadline = time.monotonic() + timeout
+        for name in list(self.processes):
+            self._stop(name, max(deadline - time.monotonic(), 0))
+
+    def poll_now(self):
+        """Просит все воркеры опросить API немедленно."""
+        for process in self.processes.values():
+            if process.is_alive():
+                os.kill(process.pid, signal.SIGUSR1)
+
+    def _forward(self, control):
+        if control.poll_requested and not control.stopping:
+            self.poll_now()
+
+    def run(self, interval=CHECK_INTERVAL):
+        """Запускает воркеры и следит за ними до сигнала остановки."""
+        self.rebalance()
+        try:
+            with Control() as control:
+                control.subscribe(lambda: self._forward(control))
+                while not control.stopping:
+                    control.sleep(interval)
+                    self.collect()
+                    self.check()
+        finally:
+            self.stop()
+
+
+def main():
+    """Многопроцессный режим: супервизор и шарды арендаторов."""
+    engine.check_bot_token()
+    tenants = [
+        {'token': tenant.token, 'chat_id': tenant.chat_id,
+         'digest': tenant.digest}
+        for tenant in engine.load_tenants()
+    ]
+    logger.info(f'{len(tenants)} арендаторов на {WORKERS} воркеров')
+    Supervisor(tenants).run()
+
+
+if __name__ == '__main__':
+    homework.configure()
+    setup_logging()
+    main()
@@ -0,0 +1,73 @@
+class TestErrorAggregator:
+
+    def make_aggregator(self):
+        from alerts import ErrorAggregator
+
+        self.now = 0.0
+        return ErrorAggregator(window=1800, clock=lambda: self.now)
+
+    def test_errors_are_summarized_by_class(self):
+        from exceptions import EndpointError, GetApiError
+
+        errors = self.make_aggregator()
+        assert errors.on_error(GetApiError('нет связи')) == 'нет связи', (
+            'О первой ошибке сбоя нужно сообщить сразу.'
+        )
+        errors.sent()
+        for number in range(37):
+            self.now += 10
+            if number % 5:
+                error = GetApiError()
+            else:
+                error = EndpointError('500')
+            assert errors.on_error(error) is None, (
+                'Ошибки внутри окна не должны отправляться по одной.'
+            )
+        self.now = 1800
+        assert errors.on_error(GetApiError()) == (
+            'GetApiError ×30, EndpointError ×8 за последние 30 мин'
+        )
+        errors.sent()
+
+        self.now = 1900
+        assert errors.on_success() == (
+            'Работа восстановлена: 39 ошибок за 32 мин'
+        )
+        errors.sent()
+        assert errors.on_success() is None
+        assert errors.on_error(GetApiError('снова')) == 'снова'
+
+    def test_unsent_messages_are_offered_again(self):
+        from exceptions import GetApiError
+
+        errors = self.make_aggregator()
+        assert errors.on_error(GetApiError('первая')) == 'первая'
+        assert errors.on_error(GetApiError('вторая')) == 'вторая', (
+            'Неотправленное уведомление о сбое должно повториться.'
+        )
+        errors.sent()
+        assert errors.on_success()
+        assert errors.on_success(), (
+            'Неотправленное сообщение о восстановлении должно повториться.'
+        )
+        errors.sent()
+        assert errors.started is None
+
+    def test_main_sends_one_alert_per_outage(
+            self, monkeypatch, homework_module
+    ):
+        from alerts import ErrorAggregator
+        from exceptions import GetApiError
+
+        sent = []
+        monkeypatch.setattr(
+            homework_module, 'send_message',
+            lambda bot, message: sent.append(message) or True
+        )
+        errors = ErrorAggregator()
+        for number in range(5):
+            homework_module.alert(
+                None, errors, errors.on_error(GetApiError(f'сбой {number}'))
+            )
+        homework_module.alert(None, errors, errors.on_success())
+        assert sent == ['сбой 0', 'Работа восстановлена: 5 ошибок за 1 мин']
@@ -0,0 +1,168 @@
+import json
+
+DAY = 86400
+
+
+def make_homework(number, day, status='approved'):
+    return {
+        'id': number, 'homework_name': f'hw{number}.zip', 'status': status,
+        'date_updated': f'1970-01-{day:02}T00:00:00Z',
+    }
+
+
+class FakeResponse:
+    status_code = 200
+
+    def __init__(self, data):
+        self.data = data
+
+    def iter_content(self, chunk_size=None):
+        raw = json.dumps(self.data).encode()
+        for start in range(0, len(raw), 16):
+            yield raw[start:start + 16]
+
+    def close(self):
+        pass
+
+
+class HistoryTransport:
+    """API, отдающий дз, обновлённые после from_date."""
+
+    def __init__(self, homeworks, current_date=40 * DAY):
+        self.homeworks = homeworks
+        self.current_date = current_date
+        self.requests = []
+
+    def get(self, url, headers=None, params=None, **kwargs):
+        from status_index import date_code
+
+        assert kwargs.get('stream'), 'История должна читаться потоком.'
+        from_date = params['from_date']
+        self.requests.append(from_date)
+        return FakeResponse({
+            'homeworks': [
+                hw for hw in self.homeworks
+                if date_code(hw['date_updated']) >= from_date
+            ],
+            'current_date': self.current_date,
+        })
+
+
+class TestBackfill:
+
+    def test_history_is_ingested_by_windows(self, tmp_path):
+        import backfill
+        import engine
+
+        homeworks = [make_homework(n, n + 1) for n in range(20)]
+        homeworks.append({
+            'id': 99, 'status': 'approved',
+            'date_updated': '1970-01-02T00:00:00Z',
+        })
+        store = backfill.HistoryStore(str(tmp_path / 'history.sqlite3'))
+        tenants = [engine.Tenant(token=f't{n}', chat_id=str(n))
+                   for n in range(3)]
+        transport = HistoryTransport(homeworks)
+
+        progress = backfill.run(
+            tenants, store, from_date=0, window=7 * DAY, workers=3,
+            transport=transport
+        )
+        assert (progress.done, progress.failed) == (3, 0)
+        assert progress.items == 60 and progress.skipped == 3, (
+            'Дз без названия должна отбрасываться проверкой parse_status.'
+        )
+        assert store.count() == 60
+        assert transport.requests == [0, 0, 0]
+
+        backfill.run(tenants, store, transport=transport)
+        assert transport.requests == [0, 0, 0], (
+            'Загруженных арендаторов не нужно опрашивать повторно.'
+        )
+        store.close()
+
+    def test_interrupted_backfill_resumes(self, tmp_path):
+        import backfill
+        import engine
+
+        homeworks = [make_homework(n, n + 1) for n in range(20)]
+        path = str(tmp_path / 'history.sqlite3')
+        store = backfill.HistoryStore(path)
+        tenant = engine.Tenant(token='t', chat_id='1')
+        rows = backfill.validate(homeworks)
+        first_end, first = next(backfill.windows(rows, 0, 7 * DAY))
+        store.ingest(tenant.key, first, first_end)
+        store.close()
+
+        store = backfill.HistoryStore(path)
+        transport = HistoryTransport(homeworks)
+        progress = backfill.run(
+            [tenant], store, window=7 * DAY, transport=transport
+        )
+        assert transport.requests == [7 * DAY], (
+            'Загрузка должна продолжаться с последнего записанного окна.'
+        )
+        assert progress.items == 13
+        assert store.count(tenant.key) == 20
+        store.close()
+
+    def test_interrupted_newest_first_backfill_restarts_tenant(
+            self, tmp_path
+    ):
+        import backfill
+        import engine
+
+        homeworks = [make_homework(n, n + 1) for n in range(20)]
+        homeworks.reverse()
+        store = backfill.HistoryStore(str(tmp_path / 'history.sqlite3'))
+        tenant = engine.Tenant(token='t', chat_id='1')
+        rows = backfill.validate(homeworks)
+        first_end, first = next(backfill.windows(rows, 0, 7 * DAY))
+        store.ingest(tenant.key, first, first_end)
+
+        transport = HistoryTransport(homeworks)
+        backfill.run([tenant], store, window=7 * DAY, transport=transport)
+        assert transport.requests == [0], (
+            'Прерванный арендатор загружается заново с начала истории.'
+        )
+        assert store.count(tenant.key) == 20
+        store.close()
+
+    def test_windows_consume_stream_lazily(self):
+        import backfill
+        from streaming import HomeworkStream, check_stream
+
+        homeworks = [make_homework(n, n + 1) for n in range(20)]
+        raw = json.dumps(
+            {'homeworks': homeworks, 'current_date': 40 * DAY}
+        ).encode()
+        all_chunks = [raw[i:i + 64] for i in range(0, len(raw), 64)]
+        read = []
+
+        def chunks():
+            for chunk in all_chunks:
+                read.append(chunk)
+                yield chunk
+
+        rows = backfill.validate(check_stream(HomeworkStream(chunks())))
+        batches = backfill.windows(rows, 0, 7 * DAY)
+        done_until, batch = next(batches)
+        assert (done_until, len(batch)) == (7 * DAY, 7)
+        assert len(read) < len(all_chunks), (
+            'Окна должны записываться по мере чтения ответа, '
+            'без загрузки всей истории в память.'
+        )
+
+    def test_newest_first_history_keeps_checkpoint(self):
+        import backfill
+
+        homeworks = [make_homework(n, n + 1) for n in range(20)]
+        homeworks.reverse()
+        batches = list(backfill.windows(
+            backfill.validate(homeworks), 0, 7 * DAY
+        ))
+        assert sum(len(batch) for _, batch in batches) == 20
+        assert {done_until for done_until, _ in batches} == {0}, (
+            'Для ответа от новых дз к старым контрольная точка '
+            'не должна сдвигаться.'
+        )
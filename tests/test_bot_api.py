@@ -0,0 +1,81 @@
+import socket
+
+
+class TestBotApi:
+
+    def make_telegram(self, **kwargs):
+        from benchmarks.fake_servers import FakePracticum, FakeTelegram
+
+        return FakeTelegram(FakePracticum(), **kwargs).start()
+
+    def test_concurrent_sends_to_many_chats(self):
+        from bot_api import TeleBot
+        from delivery import SendQueue
+
+        telegram = self.make_telegram()
+        bot = TeleBot('1234:token', api_url=telegram.api_url, pool_maxsize=4)
+        queue = SendQueue(bot, workers=4, global_rate=0, chat_rate=0)
+        delivered = []
+        for number in range(40):
+            queue.submit(str(number % 8), f'#{number}', delivered.append)
+        queue.start()
+        try:
+            assert queue.stop(timeout=5)
+        finally:
+            bot.close()
+            telegram.stop()
+        assert delivered == [True] * 40
+        assert telegram.messages == 40
+        assert bot.stats() == {'sent': 40, 'errors': 0}
+
+    def test_telegram_errors_map_to_send_error(self):
+        from bot_api import TeleBot
+        from delivery import retry_after
+        from exceptions import SendError, TelegramError
+
+        telegram = self.make_telegram(error_rate=1, retry_after=3)
+        bot = TeleBot('1234:token', api_url=telegram.api_url)
+        try:
+            bot.send_message(chat_id=1, text='текст')
+        except TelegramError as error:
+            assert isinstance(error, SendError)
+            assert error.error_code == 429
+            assert retry_after(error) == 3, (
+                'Пауза из ответа 429 должна доходить до очереди отправки.'
+            )
+        else:
+            raise AssertionError('Ответ 429 должен поднимать TelegramError.')
+        finally:
+            bot.close()
+            telegram.stop()
+
+    def test_telegram_payload_size(self):
+        from bot_api import TeleBot
+
+        telegram = self.make_telegram(payload_size=50)
+        bot = TeleBot('1234:token', api_url=telegram.api_url)
+        try:
+            message = bot.send_message(chat_id=1, text='текст')
+        finally:
+            bot.close()
+            telegram.stop()
+        assert len(message['entities']) == 50, (
+            'Размер ответа заглушки Telegram должен задаваться параметром.'
+        )
+
+    def test_network_error_hides_token(self, homework_module, caplog):
+        from bot_api import TeleBot
+
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            port = sock.getsockname()[1]
+        bot = TeleBot(
+            '1234:secret', api_url=f'http://127.0.0.1:{port}/bot{{0}}/{{1}}'
+        )
+        assert homework_module.send_to_chat(bot, '1', 'текст') is False, (
+            'Сетевая ошибка отправки не должна останавливать бота.'
+        )
+        assert 'Bot API недоступен' in caplog.text
+        assert 'secret' not in caplog.text
+        assert bot.stats()['errors'] == 1
+        bot.close()
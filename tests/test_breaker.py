@@ -0,0 +1,85 @@
+import asyncio
+
+import pytest
+import requests
+
+from exceptions import CircuitOpenError, EndpointError, GetApiError
+
+
+def failing():
+    raise GetApiError('нет связи')
+
+
+class TestCircuitBreaker:
+
+    def make_breaker(self):
+        from breaker import CircuitBreaker
+
+        self.now = 0.0
+        return CircuitBreaker(
+            failure_threshold=3, recovery_timeout=10,
+            max_recovery_timeout=40, clock=lambda: self.now
+        )
+
+    def test_opens_and_recovers_with_single_probe(self):
+        from breaker import CLOSED, HALF_OPEN, OPEN
+
+        breaker = self.make_breaker()
+        for _ in range(3):
+            with pytest.raises(GetApiError):
+                breaker.call(failing)
+        assert breaker.state == OPEN
+        with pytest.raises(CircuitOpenError):
+            breaker.call(lambda: 'не должен выполняться')
+
+        self.now = 10
+        assert breaker.allow(), 'После паузы допускается пробный запрос.'
+        assert breaker.state == HALF_OPEN
+        assert not breaker.allow(), 'Пробный запрос должен быть один.'
+        breaker.record()
+        assert breaker.state == CLOSED
+        assert breaker.call(lambda: 'ok') == 'ok'
+
+    def test_failed_probe_doubles_timeout(self):
+        from breaker import OPEN
+
+        breaker = self.make_breaker()
+        for _ in range(3):
+            breaker.record(GetApiError())
+        self.now = 10
+        with pytest.raises(GetApiError):
+            breaker.call(failing)
+        assert breaker.state == OPEN
+        assert breaker.remaining() == 20
+
+    def test_client_errors_do_not_open_circuit(self):
+        from breaker import CLOSED
+
+        breaker = self.make_breaker()
+        for _ in range(5):
+            breaker.record(EndpointError('401', 401))
+        assert breaker.state == CLOSED
+        for _ in range(3):
+            breaker.record(EndpointError('503', 503))
+        assert breaker.state != CLOSED
+
+    def test_engine_skips_requests_while_open(self, monkeypatch):
+        import engine
+
+        calls = []
+        monkeypatch.setattr(
+            requests, 'get', lambda *args, **kwargs: calls.append(args)
+        )
+        breaker = self.make_breaker()
+        for _ in range(3):
+            breaker.record(GetApiError())
+        tenant = engine.Tenant(token='token', chat_id='1')
+        polling = engine.PollingEngine(
+            [tenant], bot=None, period=60, breaker=breaker
+        )
+
+        delay = asyncio.run(polling.poll_once(tenant))
+        assert calls == [], (
+            'Пока предохранитель разомкнут, запросы к API не отправляются.'
+        )
+        assert 10 <= delay <= 70
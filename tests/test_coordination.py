@@ -0,0 +1,151 @@
+import asyncio
+
+TENANTS = [f'tenant-{number}' for number in range(10)]
+
+
+class TestLeaseManager:
+
+    def make_replica(self, path, owner):
+        from coordination import LeaseManager
+
+        return LeaseManager(
+            path, owner=owner, ttl=30, clock=lambda: self.now
+        )
+
+    def test_tenants_are_split_between_replicas(self, tmp_path):
+        self.now = 1000.0
+        path = str(tmp_path / 'leases.sqlite3')
+        first = self.make_replica(path, 'first')
+        second = self.make_replica(path, 'second')
+
+        assert first.heartbeat(TENANTS) == set(TENANTS)
+        assert second.heartbeat(TENANTS) == set(), (
+            'Занятых арендаторов нельзя брать до истечения аренды.'
+        )
+        first.heartbeat()
+        second.heartbeat()
+        assert len(first.owned) == len(second.owned) == 5
+        assert not first.owned & second.owned, (
+            'Арендатор не должен принадлежать двум репликам.'
+        )
+
+    def test_expired_leases_are_taken_over(self, tmp_path):
+        self.now = 1000.0
+        path = str(tmp_path / 'leases.sqlite3')
+        first = self.make_replica(path, 'first')
+        second = self.make_replica(path, 'second')
+        first.heartbeat(TENANTS)
+        second.heartbeat(TENANTS)
+        first.heartbeat()
+        second.heartbeat()
+
+        self.now += 20
+        assert len(first.heartbeat()) == 5, (
+            'Пока аренды второй реплики не истекли, их нельзя забрать.'
+        )
+        self.now += 20
+        assert first.heartbeat() == set(TENANTS), (
+            'Аренды упавшей реплики должны перейти к живой.'
+        )
+
+    def test_release_flushes_state_first(self, tmp_path):
+        self.now = 1000.0
+        calls = []
+        path = str(tmp_path / 'leases.sqlite3')
+        first = self.make_replica(path, 'first')
+        first.before_release = lambda: calls.append('flush')
+        first.heartbeat(TENANTS)
+        first.release_all()
+        assert calls, 'Перед передачей арендаторов нужно сбросить состояние.'
+
+        second = self.make_replica(path, 'second')
+        assert second.heartbeat(TENANTS) == set(TENANTS)
+
+    def test_unrenewed_lease_is_not_owned(self, tmp_path):
+        self.now = 1000.0
+        first = self.make_replica(str(tmp_path / 'leases.sqlite3'), 'first')
+        first.heartbeat(TENANTS)
+        assert first.owns(TENANTS[0])
+        self.now += 30
+        assert not first.owns(TENANTS[0]), (
+            'Аренду, не продлённую за ttl, могла забрать другая реплика.'
+        )
+
+    def test_standby_main_keeps_base_period(
+            self, monkeypatch, homework_module
+    ):
+        import inspect
+        import time
+
+        import pytest
+
+        import tests.check_utils as check_utils
+
+        class OtherReplica:
+            def owns(self, tenant):
+                return False
+
+            def stop(self):
+                pass
+
+        delays = []
+
+        def sleep(delay):
+            delays.append(delay)
+            if len(delays) == 5:
+                raise check_utils.BreakInfiniteLoop('break')
+
+        for name in ('PRACTICUM_TOKEN', 'TELEGRAM_TOKEN', 'TELEGRAM_CHAT_ID'):
+            monkeypatch.setattr(homework_module, name, 'token')
+        monkeypatch.setattr(
+            homework_module, 'TeleBot', check_utils.MockTelegramBot
+        )
+        monkeypatch.setattr(homework_module, 'open_store', lambda: None)
+        monkeypatch.setattr(
+            homework_module, 'lease_token', lambda store, key: OtherReplica()
+        )
+        monkeypatch.setattr(time, 'sleep', sleep)
+        with pytest.raises(check_utils.BreakInfiniteLoop):
+            inspect.unwrap(homework_module.main)()
+        assert delays == [homework_module.RETRY_PERIOD] * 5, (
+            'Резервная реплика не должна растягивать паузу до MAX_PERIOD.'
+        )
+
+
+class TestEngineLeases:
+
+    def test_engine_skips_tenants_of_other_replicas(
+            self, tmp_path, monkeypatch
+    ):
+        import requests
+
+        import engine
+        from coordination import LeaseManager
+        from storage import StateStore
+
+        def fail(*args, **kwargs):
+            raise AssertionError('Чужого арендатора опрашивать нельзя.')
+
+        monkeypatch.setattr(requests, 'get', fail)
+        path = str(tmp_path / 'state.sqlite3')
+        tenant = engine.Tenant(token='token-1', chat_id='1', timestamp=0)
+        other = LeaseManager(path, owner='other')
+        other.heartbeat([tenant.key])
+
+        store = StateStore(path)
+        store.save_watermark(tenant.key, 1000198000)
+        store.flush()
+        mine = LeaseManager(path, owner='mine')
+        mine.heartbeat([tenant.key])
+        polling = engine.PollingEngine(
+            [tenant], bot=None, period=60, leases=mine
+        )
+        assert asyncio.run(polling.poll_once(tenant)) == 60
+
+        other.release_all()
+        mine.heartbeat()
+        polling.store = store
+        assert asyncio.run(polling.take_turn(tenant))
+        assert tenant.timestamp == 1000198000, (
+            'Новый владелец продолжает с водяного знака прежнего.'
+        )
@@ -0,0 +1,156 @@
+import threading
+import time
+
+import telebot
+
+
+def telegram_error(code, **parameters):
+    return telebot.apihelper.ApiTelegramException(
+        'sendMessage', None,
+        {'error_code': code, 'description': 'error',
+         'parameters': parameters}
+    )
+
+
+class ScriptedBot:
+    def __init__(self, errors=()):
+        self.errors = list(errors)
+        self.sent = []
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def send_message(self, chat_id=None, text=None, **kwargs):
+        with self.lock:
+            self.calls.append((chat_id, text, time.monotonic()))
+            if self.errors:
+                raise self.errors.pop(0)
+            self.sent.append((chat_id, text))
+
+
+class TestSendQueue:
+
+    def test_messages_keep_order_per_chat(self):
+        from delivery import SendQueue
+
+        bot = ScriptedBot()
+        queue = SendQueue(bot, workers=3, global_rate=0, chat_rate=0)
+        for number in range(5):
+            queue.submit('a', f'a{number}')
+            queue.submit('b', f'b{number}')
+        queue.start()
+        assert queue.stop(timeout=1)
+
+        for chat in 'ab':
+            texts = [text for chat_id, text in bot.sent if chat_id == chat]
+            assert texts == [f'{chat}{number}' for number in range(5)], (
+                'Сообщения одного чата должны уходить по порядку.'
+            )
+        assert queue.stats()['sent'] == 10
+        assert queue.stats()['depth'] == 0
+
+    def test_retry_after_is_honored(self):
+        from delivery import SendQueue
+
+        bot = ScriptedBot([telegram_error(429, retry_after=0.1)])
+        queue = SendQueue(bot, workers=1, global_rate=0, chat_rate=0)
+        queue.start()
+        queue.submit('a', 'text')
+        assert queue.stop(timeout=1)
+
+        assert bot.sent == [('a', 'text')]
+        assert bot.calls[1][2] - bot.calls[0][2] >= 0.1, (
+            'Повтор после 429 должен выдерживать `retry_after`.'
+        )
+        assert queue.counters['retried'] == 1
+
+    def test_permanent_error_is_dropped(self, caplog):
+        from delivery import SendQueue
+
+        bot = ScriptedBot([telegram_error(403)])
+        queue = SendQueue(bot, workers=1, global_rate=0, chat_rate=0)
+        queue.start()
+        outcomes = []
+        queue.submit('a', 'blocked', outcomes.append)
+        queue.submit('a', 'next', outcomes.append)
+        assert queue.stop(timeout=1)
+
+        assert bot.sent == [('a', 'next')]
+        assert outcomes == [None, True], (
+            'Outbox должен узнать, что сообщение отброшено навсегда (DROP).'
+        )
+        assert queue.counters['failed'] == 1
+        assert any(record.levelname == 'ERROR' for record in caplog.records)
+
+    def test_unexpected_error_does_not_kill_worker(self):
+        from delivery import SendQueue
+
+        bot = ScriptedBot([ValueError('не JSON-объект')] * 2)
+        queue = SendQueue(bot, workers=1, global_rate=0, chat_rate=0,
+                          max_attempts=2, backoff=0)
+        queue.start()
+        outcomes = []
+        queue.submit('1', 'сломанное', outcomes.append)
+        queue.submit('1', 'следующее', outcomes.append)
+        assert queue.join(1.0), (
+            'Неожиданная ошибка клиента не должна останавливать поток.'
+        )
+        assert outcomes == [False, True]
+        assert bot.sent == [('1', 'следующее')]
+        assert queue.depth == 0 and all(
+            thread.is_alive() for thread in queue._threads
+        )
+        queue.stop(timeout=1)
+
+    def test_chat_rate_spaces_messages(self):
+        from delivery import SendQueue
+
+        bot = ScriptedBot()
+        queue = SendQueue(bot, workers=2, global_rate=0, chat_rate=20)
+        queue.start()
+        for number in range(3):
+            queue.submit('a', str(number))
+        assert queue.stop(timeout=1)
+
+        times = [call[2] for call in bot.calls]
+        assert times[2] - times[0] >= 0.09
+
+
+class TestPackMessages:
+
+    def test_statuses_are_packed_within_limit(self, homework_module):
+        from delivery import MESSAGE_LIMIT, pack_messages
+
+        texts = [
+            homework_module.parse_status({
+                'homework_name': f'hw{number:03}.zip', 'status': 'approved'
+            })
+            for number in range(100)
+        ]
+        packed = pack_messages(texts)
+        assert 1 < len(packed) < 10, 'Статусы должны склеиваться.'
+        assert all(len(message) <= MESSAGE_LIMIT for message, _ in packed)
+        assert sum(count for _, count in packed) == len(texts)
+        assert '\n\n'.join(message for message, _ in packed) == (
+            '\n\n'.join(texts)
+        ), 'Порядок и текст вердиктов должны сохраняться.'
+
+    def test_long_text_is_split(self):
+        from delivery import pack_messages
+
+        assert pack_messages(['abcdefg', 'x', 'y'], limit=5) == [
+            ('abcde', 0), ('fg\n\nx', 2), ('y', 1)
+        ]
+
+    def test_outbox_is_packed_per_chat(self):
+        from delivery import pack_outbox
+        from storage import OutboxMessage
+
+        messages = [
+            OutboxMessage(1, 'a', 'первый'),
+            OutboxMessage(2, 'b', 'другой чат'),
+            OutboxMessage(3, 'a', 'второй'),
+        ]
+        assert pack_outbox(messages) == [
+            ('a', 'первый\n\nвторой', [1, 3]),
+            ('b', 'другой чат', [2]),
+        ]
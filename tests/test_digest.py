@@ -0,0 +1,88 @@
+import time
+
+import pytest
+
+
+class TestDigest:
+
+    def test_schedule_parsing(self):
+        from digest import DigestSchedule
+
+        assert DigestSchedule.parse('') is None
+        assert DigestSchedule.parse(None) is None
+        assert DigestSchedule.parse('hourly').interval == 3600
+        assert DigestSchedule.parse('Daily').interval == 86400
+        assert DigestSchedule.parse('900').interval == 900
+        assert DigestSchedule.parse('09:30').at == (9, 30)
+        for spec in ('25:00', '-5', 'weekly'):
+            with pytest.raises(ValueError):
+                DigestSchedule.parse(spec)
+
+    def test_next_flush_time(self):
+        from digest import DigestSchedule
+
+        hourly = DigestSchedule.parse('hourly')
+        assert hourly.next_after(7200) == 10800
+        assert hourly.next_after(7201) == 10800
+
+        morning = DigestSchedule.parse('09:00')
+        today = time.mktime((2023, 3, 10, 8, 0, 0, 0, 0, -1))
+        due = morning.next_after(today)
+        assert time.localtime(due)[:5] == (2023, 3, 10, 9, 0)
+        due = morning.next_after(due)
+        assert time.localtime(due)[:5] == (2023, 3, 11, 9, 0), (
+            'После отправки дайджест переносится на следующий день.'
+        )
+
+    def test_chats_are_held_until_due(self):
+        from digest import Digests
+
+        self.now = 100.0
+        digests = Digests(clock=lambda: self.now)
+        digests.add('1', '60')
+        digests.add('2', '')
+        assert len(digests) == 1, 'Чат без расписания не копит сообщения.'
+        assert digests.held() == ['1']
+
+        self.now = 121.0
+        assert digests.held() == [], 'Срок наступил: чат нужно выгрузить.'
+        assert digests.held() == ['1'], (
+            'После выгрузки чат снова копит сообщения до следующего срока.'
+        )
+
+    def test_digest_needs_store(self):
+        from digest import build_digests
+
+        assert len(build_digests([('1', 'hourly')], durable=False)) == 0
+        assert len(build_digests([('1', 'hourly')], durable=True)) == 1
+
+    def test_digest_is_sent_as_one_message(
+            self, tmp_path, monkeypatch, homework_module
+    ):
+        from digest import Digests
+        from storage import StateStore
+
+        store = StateStore(str(tmp_path / 'state.sqlite3'))
+        for number in range(3):
+            store.enqueue('tenant', f'{number}:approved:x', '42', f'#{number}')
+        store.enqueue('tenant', 'other:approved:x', '7', 'сразу')
+        sent = []
+
+        def send_to_chat(bot, chat_id, message):
+            sent.append((chat_id, message))
+            return True
+
+        monkeypatch.setattr(homework_module, 'send_to_chat', send_to_chat)
+        self.now = 0.0
+        digests = Digests(clock=lambda: self.now)
+        digests.add('42', 'hourly')
+
+        assert homework_module.drain_outbox(None, store, digests.held()) == 1
+        assert sent == [('7', 'сразу')], (
+            'Сообщения чата с дайджестом должны копиться до срока.'
+        )
+        self.now = 3600.0
+        assert homework_module.drain_outbox(None, store, digests.held()) == 3
+        assert sent[1:] == [('42', '#0\n\n#1\n\n#2')]
+        assert store.pending() == 0
+        store.close()
@@ -0,0 +1,178 @@
+import asyncio
+import threading
+import time
+
+import requests
+
+import tests.check_utils as check_utils
+
+
+class RecordingBot:
+    def __init__(self):
+        self.sent = []
+
+    def send_message(self, chat_id=None, text=None, **kwargs):
+        self.sent.append((chat_id, text))
+
+
+class TestPollingEngine:
+
+    def test_poll_once_sends_status_and_moves_timestamp(
+            self, monkeypatch, random_timestamp, data_with_new_hw_status
+    ):
+        import engine
+
+        def mock_get(*args, **kwargs):
+            assert kwargs['headers']['Authorization'] == 'OAuth token-1'
+            return check_utils.MockResponseGET(
+                random_timestamp=random_timestamp,
+                data=data_with_new_hw_status
+            )
+
+        monkeypatch.setattr(requests, 'get', mock_get)
+        bot = RecordingBot()
+        tenant = engine.Tenant(token='token-1', chat_id='42', timestamp=0)
+        polling = engine.PollingEngine([tenant], bot, max_in_flight=2)
+
+        asyncio.run(polling.poll_once(tenant))
+        asyncio.run(polling.poll_once(tenant))
+
+        assert len(bot.sent) == 1, (
+            'Повторный статус не должен отправляться дважды.'
+        )
+        assert bot.sent[0][0] == '42'
+        assert 'hw123.zip' in bot.sent[0][1]
+        assert tenant.timestamp == random_timestamp
+
+    def test_in_flight_requests_are_capped(
+            self, monkeypatch, random_timestamp
+    ):
+        import engine
+
+        lock = threading.Lock()
+        state = {'current': 0, 'peak': 0}
+
+        def slow_get(*args, **kwargs):
+            with lock:
+                state['current'] += 1
+                state['peak'] = max(state['peak'], state['current'])
+            time.sleep(0.02)
+            with lock:
+                state['current'] -= 1
+            return check_utils.MockResponseGET(
+                random_timestamp=random_timestamp
+            )
+
+        monkeypatch.setattr(requests, 'get', slow_get)
+        tenants = [
+            engine.Tenant(token=f'token-{i}', chat_id=str(i))
+            for i in range(12)
+        ]
+        polling = engine.PollingEngine(tenants, RecordingBot(),
+                                       max_in_flight=3)
+
+        async def poll_all():
+            await asyncio.gather(*map(polling.poll_once, tenants))
+
+        asyncio.run(poll_all())
+        assert state['peak'] <= 3, (
+            'Число одновременных запросов к API должно быть ограничено.'
+        )
+        assert all(t.timestamp == random_timestamp for t in tenants)
+
+    def test_statuses_go_through_outbox(
+            self, monkeypatch, tmp_path, random_timestamp,
+            data_with_new_hw_status
+    ):
+        import engine
+        from storage import StateStore
+
+        monkeypatch.setattr(requests, 'get', lambda *args, **kwargs: (
+            check_utils.MockResponseGET(
+                random_timestamp=random_timestamp,
+                data=data_with_new_hw_status
+            )
+        ))
+        store = StateStore(str(tmp_path / 'state.sqlite3'))
+        bot = RecordingBot()
+        tenant = engine.Tenant(token='token-1', chat_id='42', timestamp=0)
+        polling = engine.PollingEngine([tenant], bot, store=store)
+
+        async def poll_and_drain():
+            await polling.poll_once(tenant)
+            tenant.index = type(tenant.index)()
+            await polling.poll_once(tenant)
+            return await polling.drain_outbox()
+
+        assert asyncio.run(poll_and_drain()) == 1, (
+            'Повторно найденный статус не должен дублироваться в outbox.'
+        )
+        assert len(bot.sent) == 1 and bot.sent[0][0] == '42'
+        assert store.pending_messages() == []
+        store.close()
+
+    def test_invalid_homework_is_skipped(
+            self, monkeypatch, random_timestamp
+    ):
+        import engine
+
+        data = {'homeworks': [
+            {'id': 1, 'homework_name': 'a.zip', 'status': 'approved'},
+            {'id': 2, 'homework_name': 'b.zip', 'status': 'weird'},
+        ], 'current_date': random_timestamp}
+        monkeypatch.setattr(requests, 'get', lambda *args, **kwargs: (
+            check_utils.MockResponseGET(
+                random_timestamp=random_timestamp, data=data
+            )
+        ))
+        bot = RecordingBot()
+        tenant = engine.Tenant(token='token-1', chat_id='42', timestamp=0)
+        polling = engine.PollingEngine([tenant], bot)
+
+        asyncio.run(polling.poll_once(tenant))
+        asyncio.run(polling.poll_once(tenant))
+
+        assert len(bot.sent) == 1 and '"a.zip"' in bot.sent[0][1], (
+            'Верная дз должна отправиться, несмотря на неверную в пачке.'
+        )
+        assert tenant.timestamp == random_timestamp
+
+    def test_store_errors_do_not_stop_polling(self, monkeypatch, tmp_path):
+        import sqlite3
+
+        import engine
+        from storage import StateStore
+
+        class LockedStore(StateStore):
+            def load_watermark(self, tenant):
+                raise sqlite3.OperationalError('database is locked')
+
+            def pending_messages(self, *args, **kwargs):
+                raise sqlite3.OperationalError('database is locked')
+
+        class OwnAll:
+            def owns(self, tenant):
+                return True
+
+        monkeypatch.setattr(engine, 'OUTBOX_INTERVAL', 0.01)
+        store = LockedStore(str(tmp_path / 'state.sqlite3'))
+        tenant = engine.Tenant(token='token-1', chat_id='42', timestamp=0)
+        polling = engine.PollingEngine(
+            [tenant], RecordingBot(), period=60, store=store, leases=OwnAll()
+        )
+
+        async def scenario():
+            delay = await polling.poll_once(tenant)
+            outbox = asyncio.ensure_future(polling._outbox_loop())
+            await asyncio.sleep(0.1)
+            alive = not outbox.done()
+            outbox.cancel()
+            return delay, alive
+
+        delay, alive = asyncio.run(scenario())
+        store.close()
+        assert delay == 60, (
+            'Сбой чтения водяного знака откладывает ход, а не роняет опрос.'
+        )
+        assert alive, 'Сбой выгрузки outbox не должен останавливать цикл.'
+        assert polling.counters['errors'] >= 2
@@ -0,0 +1,197 @@
+import asyncio
+import inspect
+import signal
+import threading
+import time
+
+import requests
+
+import tests.check_utils as check_utils
+
+
+def signal_later(signum, delay=0.05):
+    main = threading.main_thread().ident
+    timer = threading.Timer(delay, signal.pthread_kill, (main, signum))
+    timer.start()
+    return timer
+
+
+class RecordingBot:
+    def __init__(self):
+        self.sent = []
+
+    def send_message(self, chat_id=None, text=None, **kwargs):
+        self.sent.append((chat_id, text))
+
+
+class TestControl:
+
+    def test_poll_signal_interrupts_pause(self):
+        from lifecycle import Control
+
+        with Control() as control:
+            signal_later(signal.SIGUSR1)
+            started = time.monotonic()
+            control.sleep(5)
+            assert time.monotonic() - started < 1, (
+                'SIGUSR1 должен прерывать паузу между опросами.'
+            )
+            assert not control.poll_requested
+            assert not control.stopping
+
+    def test_stop_during_poll_skips_pause(self):
+        from lifecycle import Control
+
+        previous = signal.getsignal(signal.SIGTERM)
+        with Control() as control:
+            signal.raise_signal(signal.SIGTERM)
+            assert control.stopping, 'Сигнал вне паузы лишь ставит флаг.'
+            assert control.delay(5) == 0, (
+                'После сигнала остановки пауза не должна начинаться.'
+            )
+        assert signal.getsignal(signal.SIGTERM) is previous, (
+            'Прежний обработчик сигнала должен восстанавливаться.'
+        )
+
+    def test_signal_outside_pause_does_not_raise(self):
+        from lifecycle import Control
+
+        with Control() as control:
+            control.sleep(0.01)
+            signal.raise_signal(signal.SIGUSR1)
+            assert control.poll_requested, 'Вне паузы сигнал лишь ставит флаг.'
+            started = time.monotonic()
+            control.sleep(5)
+            assert time.monotonic() - started < 1, (
+                'Опрос, запрошенный во время работы, начинается без паузы.'
+            )
+            assert not control.poll_requested and not control.sleeping
+
+    def test_socket_command_wakes_loop(self, tmp_path):
+        from lifecycle import Control, send_command
+
+        path = str(tmp_path / 'control.sock')
+        with Control(path) as control:
+            threading.Timer(0.05, send_command, ('poll', path)).start()
+            started = time.monotonic()
+            control.sleep(5)
+            assert time.monotonic() - started < 1
+
+    def test_main_flushes_outbox_on_sigterm(
+            self, monkeypatch, tmp_path, homework_module,
+            random_timestamp, data_with_new_hw_status
+    ):
+        from storage import StateStore
+
+        path = str(tmp_path / 'state.sqlite3')
+        store = StateStore(path)
+
+        def get_api_answer(timestamp):
+            signal.raise_signal(signal.SIGTERM)
+            return dict(data_with_new_hw_status,
+                        current_date=random_timestamp)
+
+        results = iter([False, True])
+        sent = []
+
+        def send_to_chat(bot, chat_id, message):
+            ok = next(results)
+            if ok:
+                sent.append(message)
+            return ok
+
+        for name in ('PRACTICUM_TOKEN', 'TELEGRAM_TOKEN', 'TELEGRAM_CHAT_ID'):
+            monkeypatch.setattr(homework_module, name, 'token')
+        monkeypatch.setattr(
+            homework_module, 'TeleBot', check_utils.MockTelegramBot
+        )
+        monkeypatch.setattr(homework_module, 'open_store', lambda: store)
+        monkeypatch.setattr(homework_module, 'get_api_answer', get_api_answer)
+        monkeypatch.setattr(homework_module, 'send_to_chat', send_to_chat)
+
+        # test_bot оборачивает main таймаутом, которому нужен BreakInfiniteLoop.
+        inspect.unwrap(homework_module.main)()
+
+        assert len(sent) == 1 and 'hw123.zip' in sent[0], (
+            'При остановке неотправленные сообщения outbox нужно дослать.'
+        )
+        restored = StateStore(path)
+        assert restored.pending_messages() == []
+        assert restored.load_watermark(
+            homework_module.tenant_key('token')
+        ) == random_timestamp
+        restored.close()
+
+    def test_engine_polls_on_demand_and_stops_gracefully(
+            self, monkeypatch, tmp_path, random_timestamp,
+            data_with_new_hw_status
+    ):
+        import engine
+        from lifecycle import Control
+        from storage import StateStore
+
+        monkeypatch.setattr(requests, 'get', lambda *args, **kwargs: (
+            check_utils.MockResponseGET(
+                random_timestamp=random_timestamp,
+                data=data_with_new_hw_status
+            )
+        ))
+        store = StateStore(str(tmp_path / 'state.sqlite3'))
+        bot = RecordingBot()
+        tenant = engine.Tenant(token='token-1', chat_id='42', timestamp=0)
+        control = Control()
+        polling = engine.PollingEngine(
+            [tenant], bot, store=store, control=control
+        )
+        signal_later(signal.SIGUSR1, 0.1)
+        signal_later(signal.SIGTERM, 0.5)
+        started = time.monotonic()
+        with control:
+            asyncio.run(polling.run())
+
+        assert time.monotonic() - started < 5, (
+            'Движок должен завершаться по SIGTERM, не дожидаясь паузы.'
+        )
+        assert bot.sent and bot.sent[0][0] == '42', (
+            'SIGUSR1 должен запускать опрос до окончания паузы.'
+        )
+        assert tenant.timestamp == random_timestamp
+
+    def test_engine_shutdown_has_one_deadline(self, monkeypatch, tmp_path):
+        import engine
+        from delivery import SendQueue
+        from storage import StateStore
+
+        class SlowBot(RecordingBot):
+            def send_message(self, chat_id=None, text=None, **kwargs):
+                time.sleep(0.2)
+                super().send_message(chat_id, text)
+
+        monkeypatch.setattr(engine, 'SHUTDOWN_TIMEOUT', 0.5)
+        path = str(tmp_path / 'state.sqlite3')
+        store = StateStore(path)
+        for number in range(6):
+            store.enqueue('tenant', str(number), str(number), f'#{number}')
+        bot = SlowBot()
+        sender = SendQueue(bot, workers=1, global_rate=0, chat_rate=0)
+        polling = engine.PollingEngine(
+            [], bot, store=store, sender=sender.start()
+        )
+        polling.stopping = True
+        started = time.monotonic()
+        asyncio.run(polling.run())
+        assert time.monotonic() - started < 0.9, (
+            'Выгрузка outbox и остановка очереди делят один срок.'
+        )
+        sent_before_close = len(bot.sent)
+        time.sleep(0.5)
+        assert len(bot.sent) <= sent_before_close + 1, (
+            'После срока очередь не должна брать новые сообщения.'
+        )
+        restored = StateStore(path)
+        # Отметка сообщения, начатого до срока, может не успеть.
+        delivered = 6 - len(restored.pending_messages())
+        assert delivered >= min(sent_before_close, 2), (
+            'Отметки о доставке должны попасть в базу до её закрытия.'
+        )
+        restored.close()
@@ -0,0 +1,82 @@
+import gzip
+import logging
+from logging.handlers import QueueHandler
+
+
+class TestLogConfig:
+
+    def test_rotated_files_are_compressed(self, tmp_path):
+        from log_config import file_handler
+
+        path = tmp_path / 'program.log'
+        handler = file_handler(str(path), max_bytes=200, backups=2)
+        logger = logging.getLogger('test_rotation')
+        logger.propagate = False
+        logger.addHandler(handler)
+        try:
+            for number in range(20):
+                logger.error(f'Сообщение номер {number}')
+        finally:
+            logger.removeHandler(handler)
+            handler.close()
+
+        archive = tmp_path / 'program.log.1.gz'
+        assert archive.exists(), 'Старые логи должны сжиматься.'
+        assert 'Сообщение' in gzip.decompress(archive.read_bytes()).decode()
+        assert not (tmp_path / 'program.log.3.gz').exists()
+
+    def test_records_go_through_queue(self, tmp_path):
+        from log_config import parse_levels, setup_logging
+
+        root = logging.getLogger()
+        old_level = root.level
+        path = tmp_path / 'program.log'
+        listener = setup_logging(
+            str(path), level='DEBUG', levels='noisy=WARNING'
+        )
+        try:
+            logging.getLogger('noisy').info('скрыто')
+            logging.getLogger('engine').info('видно')
+        finally:
+            listener.stop()
+            for handler in root.handlers[:]:
+                if isinstance(handler, QueueHandler):
+                    root.removeHandler(handler)
+            root.setLevel(old_level)
+            logging.getLogger('noisy').setLevel(logging.NOTSET)
+
+        text = path.read_text(encoding='utf-8')
+        assert 'видно' in text
+        assert 'скрыто' not in text, (
+            'Уровень логирования должен настраиваться для каждого модуля.'
+        )
+        assert parse_levels(' a=info, b = Debug ,') == {
+            'a': 'INFO', 'b': 'DEBUG'
+        }
+
+    def test_repeated_setup_replaces_queue(self, tmp_path):
+        from log_config import setup_logging
+
+        root = logging.getLogger()
+        old_level = root.level
+        parent = setup_logging(str(tmp_path / 'parent.log'))
+        # Так настраивает логирование воркер, унаследовавший его через fork.
+        worker = setup_logging(str(tmp_path / 'worker.log'))
+        try:
+            queues = [handler for handler in root.handlers
+                      if isinstance(handler, QueueHandler)]
+            logging.getLogger('engine').info('из воркера')
+        finally:
+            worker.stop()
+            parent.stop()
+            for handler in root.handlers[:]:
+                if isinstance(handler, QueueHandler):
+                    root.removeHandler(handler)
+            root.setLevel(old_level)
+
+        assert len(queues) == 1, (
+            'Унаследованный QueueHandler должен заменяться: его очередь '
+            'в воркере никто не читает.'
+        )
+        assert 'из воркера' in (tmp_path / 'worker.log').read_text('utf-8')
+        assert not (tmp_path / 'parent.log').exists()
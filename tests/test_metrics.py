@@ -0,0 +1,76 @@
+import socket
+import urllib.request
+
+
+class TestMetrics:
+
+    def test_histogram_and_counter_render(self):
+        from metrics import Counter, Histogram
+
+        histogram = Histogram('latency_seconds', 'Задержка.', (0.1, 1))
+        for value in (0.05, 0.5, 5):
+            histogram.observe(value)
+        counter = Counter('errors_total', 'Ошибки.', 'exception',
+                          ['GetApiError'])
+        counter.inc('EndpointError')
+
+        text = '\n'.join(histogram.render() + counter.render())
+        assert 'latency_seconds_bucket{le="0.1"} 1' in text
+        assert 'latency_seconds_bucket{le="1"} 2' in text
+        assert 'latency_seconds_bucket{le="+Inf"} 3' in text
+        assert 'latency_seconds_count 3' in text
+        assert 'errors_total{exception="GetApiError"} 0' in text
+        assert 'errors_total{exception="EndpointError"} 1' in text
+
+    def test_every_project_exception_is_counted(self):
+        import exceptions
+        from metrics import ERRORS, count_error
+
+        for name in ('EndpointError', 'GetApiError', 'JSONError', 'SendError'):
+            assert name in ERRORS.values, (
+                f'Для исключения `{name}` должен быть счётчик.'
+            )
+        before = ERRORS.values['GetApiError']
+        count_error(exceptions.GetApiError('нет связи'))
+        assert ERRORS.values['GetApiError'] == before + 1
+
+    def test_api_latency_is_observed(
+            self, monkeypatch, homework_module, random_timestamp
+    ):
+        import requests
+
+        import tests.check_utils as check_utils
+        from metrics import API_LATENCY
+
+        monkeypatch.setattr(
+            requests, 'get',
+            lambda *args, **kwargs: check_utils.MockResponseGET(
+                random_timestamp=random_timestamp
+            )
+        )
+        before = sum(API_LATENCY.counts)
+        homework_module.get_api_answer(random_timestamp)
+        assert sum(API_LATENCY.counts) == before + 1
+
+    def test_endpoint_serves_prometheus_text(self):
+        from metrics import QUEUE_DEPTH, start_server
+
+        QUEUE_DEPTH.track('test', lambda: 7)
+        server = start_server(port=_free_port())
+        try:
+            url = f'http://127.0.0.1:{server.server_port}/metrics'
+            with urllib.request.urlopen(url, timeout=1) as response:
+                text = response.read().decode()
+        finally:
+            server.shutdown()
+            server.server_close()
+            QUEUE_DEPTH.sources.pop('test')
+        assert 'homework_queue_depth{queue="test"} 7' in text
+        assert '# TYPE homework_api_request_seconds histogram' in text
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
@@ -0,0 +1,129 @@
+import json
+import threading
+import time
+
+BODY = json.dumps({'homeworks': [], 'current_date': 1000198000}).encode()
+
+
+class FakeResponse:
+    status_code = 200
+    content = BODY
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class CountingTransport:
+    def __init__(self):
+        self.calls = 0
+
+    def get(self, url, **kwargs):
+        self.calls += 1
+        return FakeResponse()
+
+
+class SlowTransport(CountingTransport):
+    def __init__(self, delay):
+        super().__init__()
+        self.delay = delay
+        self.lock = threading.Lock()
+
+    def get(self, url, **kwargs):
+        time.sleep(self.delay)
+        with self.lock:
+            self.calls += 1
+        return FakeResponse()
+
+
+def poll_all(transport, tokens):
+    threads = [
+        threading.Thread(target=transport.get, args=('https://example.com/',),
+                         kwargs={'headers': {'Authorization': f'OAuth {token}'},
+                                 'params': {'from_date': 0}})
+        for token in tokens
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+class TestResponseCache:
+
+    def test_memory_cache_ttl_and_lru(self):
+        from response_cache import MemoryCache
+
+        now = [0.0]
+        cache = MemoryCache(ttl=30, maxsize=2, clock=lambda: now[0])
+        cache.put('a', b'1')
+        cache.put('b', b'2')
+        assert cache.get('a') == b'1'
+        cache.put('c', b'3')
+        assert cache.get('b') is None, (
+            'Вытесняться должна давно не читавшаяся запись.'
+        )
+        assert cache.get('a') == b'1'
+        now[0] = 30
+        assert cache.get('a') is None, 'Устаревшая запись не выдаётся.'
+
+    def test_disk_cache_is_shared(self, tmp_path):
+        from response_cache import DiskCache
+
+        path = str(tmp_path / 'cache.sqlite3')
+        now = [1000.0]
+        first = DiskCache(path, ttl=30, maxsize=2, clock=lambda: now[0])
+        second = DiskCache(path, ttl=30, maxsize=2, clock=lambda: now[0])
+        first.put('a', b'1')
+        assert second.get('a') == b'1', (
+            'Ответ должен быть виден другим процессам.'
+        )
+        now[0] += 1
+        second.put('b', b'2')
+        now[0] += 1
+        first.put('c', b'3')
+        assert len(second) == 2
+        assert first.get('a') is None
+        now[0] += 30
+        assert second.get('c') is None
+        first.close()
+        second.close()
+
+    def test_identical_polls_hit_endpoint_once(self):
+        from response_cache import MemoryCache
+        from transport import CachingTransport
+
+        inner = CountingTransport()
+        transport = CachingTransport(MemoryCache(ttl=30), inner)
+
+        def poll(token, from_date):
+            return transport.get(
+                'https://example.com/',
+                headers={'Authorization': f'OAuth {token}'},
+                params={'from_date': from_date}
+            )
+
+        assert poll('a', 0).json()['current_date'] == 1000198000
+        assert poll('a', 0).json()['current_date'] == 1000198000
+        assert inner.calls == 1, 'Одинаковый опрос должен браться из кэша.'
+        poll('a', 1)
+        poll('b', 0)
+        assert inner.calls == 3
+        assert transport.stats() == {'cache_hits': 1, 'cache_misses': 3}
+
+    def test_concurrent_misses_wait_only_for_same_key(self):
+        from response_cache import MemoryCache
+        from transport import CachingTransport
+
+        inner = SlowTransport(0.2)
+        transport = CachingTransport(MemoryCache(ttl=30), inner)
+        started = time.monotonic()
+        poll_all(transport, [f'token-{number}' for number in range(128)])
+        assert time.monotonic() - started < 0.6, (
+            'Опросы разных токенов не должны ждать друг друга.'
+        )
+        assert inner.calls == 128
+
+        poll_all(transport, ['same'] * 8)
+        assert inner.calls == 129, (
+            'Одновременные одинаковые промахи должны дать один запрос.'
+        )
@@ -0,0 +1,55 @@
+import pytest
+
+from exceptions import GetApiError
+
+
+class TestPollPolicy:
+
+    def test_first_idle_delay_is_base_period(self):
+        from scheduler import PollPolicy
+
+        policy = PollPolicy(600, maximum=3600)
+        assert policy.next_delay([]) == 600
+        second = policy.next_delay([])
+        assert 1080 <= second <= 1320, (
+            'При простое интервал должен расти экспоненциально.'
+        )
+        for _ in range(10):
+            assert policy.next_delay([]) <= 3600 * 1.1
+
+    def test_reviewing_polls_faster_until_verdict(self):
+        from scheduler import PollPolicy
+
+        policy = PollPolicy(600, fast=60)
+        assert policy.next_delay([{'id': 1, 'status': 'reviewing'}]) == 60
+        assert policy.next_delay([]) == 60, (
+            'Пока работа на ревью, опрос должен оставаться частым.'
+        )
+        assert policy.next_delay([{'id': 1, 'status': 'approved'}]) == 600
+
+    def test_endpoint_errors_back_off(self):
+        from scheduler import PollPolicy
+
+        policy = PollPolicy(600, maximum=10 ** 6, jitter=0)
+        delays = [policy.next_delay(error=GetApiError()) for _ in range(3)]
+        assert delays == [1200, 2400, 4800]
+        assert policy.next_delay([]) == 600
+
+
+class TestRequestBudget:
+
+    def test_budget_delays_requests_over_limit(self):
+        from scheduler import RequestBudget
+
+        now = [0.0]
+        budget = RequestBudget(per_hour=60, clock=lambda: now[0])
+        assert budget.reserve() == 0
+        assert budget.reserve() == pytest.approx(60)
+        now[0] += 120
+        assert budget.reserve() == 0
+
+    def test_zero_budget_is_unlimited(self):
+        from scheduler import RequestBudget
+
+        budget = RequestBudget(per_hour=0)
+        assert all(budget.reserve() == 0 for _ in range(100))
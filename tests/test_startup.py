@@ -0,0 +1,54 @@
+import os
+import sys
+import types
+
+
+class TestStartup:
+
+    def test_import_does_not_load_heavy_dependencies(self):
+        from benchmarks.startup import HEAVY, importtime
+
+        loaded = [name for name in HEAVY if name in importtime('homework')]
+        assert not loaded, (
+            f'Импорт homework не должен загружать {", ".join(loaded)}: '
+            'они нужны только при запросе или отправке.'
+        )
+
+    def test_lazy_module_is_shared(self, monkeypatch, tmp_path):
+        from lazy import lazy_import
+
+        name = 'lazy_import_probe'
+        (tmp_path / f'{name}.py').write_text(
+            'open(__file__ + ".ran", "w").close()\n'
+            'VALUE = 42\n'
+        )
+        marker = tmp_path / f'{name}.py.ran'
+        monkeypatch.syspath_prepend(str(tmp_path))
+        monkeypatch.delitem(sys.modules, name, raising=False)
+        module = lazy_import(name)
+        monkeypatch.setitem(sys.modules, name, module)
+        assert sys.modules[name] is module
+        assert lazy_import(name) is module
+        assert not marker.exists(), (
+            'Модуль не должен выполняться до обращения к атрибуту.'
+        )
+        import lazy_import_probe
+
+        assert lazy_import_probe is module
+        assert module.VALUE == 42 and marker.exists(), (
+            'Модуль должен загружаться при первом обращении к атрибуту.'
+        )
+
+    def test_env_is_loaded_only_for_project_scripts(self, monkeypatch):
+        import bootstrap
+
+        script = types.ModuleType('__main__')
+        monkeypatch.setitem(sys.modules, '__main__', script)
+        script.__file__ = os.path.join(bootstrap.ROOT, 'engine.py')
+        assert bootstrap.is_entry_point(), (
+            'Скрипты проекта должны читать .env до импорта настроек.'
+        )
+        script.__file__ = os.path.join(bootstrap.ROOT, 'tests', 'run.py')
+        assert not bootstrap.is_entry_point()
+        del script.__file__
+        assert not bootstrap.is_entry_point()
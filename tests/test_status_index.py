@@ -0,0 +1,150 @@
+class TestStatusIndex:
+
+    def test_diff_reports_only_transitions(self):
+        from status_index import StatusIndex
+
+        index = StatusIndex()
+        first = [
+            {'id': 1, 'status': 'reviewing', 'date_updated': 't1'},
+            {'id': 2, 'status': 'reviewing', 'date_updated': 't1'},
+        ]
+        assert index.diff(first) == first
+        assert index.diff(first) == [], (
+            'Повторный ответ без изменений не должен давать уведомлений.'
+        )
+        second = [
+            {'id': 1, 'status': 'approved', 'date_updated': 't2'},
+            {'id': 2, 'status': 'reviewing', 'date_updated': 't1'},
+            {'id': 3, 'status': 'reviewing', 'date_updated': 't2'},
+        ]
+        assert [hw['id'] for hw in index.diff(second)] == [1, 3], (
+            'Все изменившиеся работы должны попадать в уведомления.'
+        )
+        assert len(index) == 3
+        assert index.get(1).status == 'approved'
+
+    def test_state_is_compact(self):
+        from status_index import StatusIndex, date_code
+
+        assert date_code('2021-04-11T10:31:09Z') == 1618137069
+        assert date_code('t1') != date_code('t2')
+        index = StatusIndex()
+        hw = {
+            'id': 7, 'homework_name': 'hw07.zip', 'status': 'rejected',
+            'date_updated': '2021-04-11T10:31:09Z',
+            'reviewer_comment': 'Длинный комментарий' * 10,
+        }
+        index.diff([hw])
+        record = index.get(7)
+        assert (record.name, record.status, record.date_updated) == (
+            'hw07.zip', 'rejected', 1618137069
+        )
+        assert not hasattr(index, '__dict__'), (
+            'Индекс не должен хранить копии словарей дз.'
+        )
+        index.forget(hw)
+        assert 7 not in index and index.diff([hw]) == [hw]
+        assert len(index._names) == 1, 'Освобождённое место переиспользуется.'
+
+    def test_report_status_for_every_change(
+            self, monkeypatch, homework_module
+    ):
+        from status_index import StatusIndex
+
+        sent = []
+        monkeypatch.setattr(
+            homework_module, 'send_message',
+            lambda bot, message: sent.append(message)
+        )
+        index = StatusIndex()
+        homeworks = [
+            {'id': 1, 'homework_name': 'a.zip', 'status': 'approved'},
+            {'id': 2, 'homework_name': 'b.zip', 'status': 'rejected'},
+        ]
+        for hw in index.diff(homeworks):
+            homework_module.report_status(None, hw)
+        assert len(sent) == 2
+        assert '"a.zip"' in sent[0] and '"b.zip"' in sent[1]
+
+    def test_failed_send_is_retried(self, monkeypatch, homework_module):
+        import pytest
+
+        from exceptions import SendError
+        from status_index import StatusIndex
+
+        results = iter([False, True])
+        sent = []
+
+        def send_message(bot, message):
+            ok = next(results)
+            if ok:
+                sent.append(message)
+            return ok
+
+        monkeypatch.setattr(homework_module, 'send_message', send_message)
+        index = StatusIndex()
+        homeworks = [
+            {'id': 1, 'homework_name': 'a.zip', 'status': 'approved'},
+            {'id': 2, 'homework_name': 'b.zip', 'status': 'rejected'},
+        ]
+        with pytest.raises(SendError):
+            homework_module.report_changes(None, index, index.diff(homeworks))
+        homework_module.report_changes(None, index, index.diff(homeworks))
+        assert len(sent) == 1, 'Изменения опроса склеиваются в одно.'
+        assert '"a.zip"' in sent[0] and '"b.zip"' in sent[0], (
+            'Неотправленные статусы должны отправиться при следующем опросе.'
+        )
+
+    def test_invalid_homework_does_not_block_batch(
+            self, monkeypatch, homework_module
+    ):
+        from status_index import StatusIndex
+
+        sent = []
+        monkeypatch.setattr(
+            homework_module, 'send_message',
+            lambda bot, message: sent.append(message) or True
+        )
+        index = StatusIndex()
+        homeworks = [
+            {'id': 1, 'homework_name': 'a.zip', 'status': 'approved'},
+            {'id': 2, 'homework_name': 'b.zip', 'status': 'weird'},
+            {'id': 3, 'homework_name': 'c.zip', 'status': 'rejected'},
+        ]
+        for _ in range(2):
+            homework_module.report_changes(None, index, index.diff(homeworks))
+        assert len(sent) == 1
+        assert '"a.zip"' in sent[0] and '"c.zip"' in sent[0], (
+            'Неверная дз не должна мешать отправке остальных дз пачки.'
+        )
+        assert '"b.zip"' not in sent[0]
+
+    def test_invalid_homework_does_not_block_outbox(
+            self, monkeypatch, tmp_path, homework_module
+    ):
+        from status_index import StatusIndex
+        from storage import StateStore
+
+        for name in ('PRACTICUM_TOKEN', 'TELEGRAM_CHAT_ID'):
+            monkeypatch.setattr(homework_module, name, 'token')
+        sent = []
+        monkeypatch.setattr(
+            homework_module, 'send_to_chat',
+            lambda bot, chat_id, text: sent.append(text) or True
+        )
+        store = StateStore(str(tmp_path / 'state.sqlite3'))
+        index = StatusIndex()
+        homeworks = [
+            {'id': 1, 'homework_name': 'a.zip', 'status': 'approved'},
+            {'id': 2, 'homework_name': 'b.zip', 'status': 'weird'},
+            {'id': 3, 'homework_name': 'c.zip', 'status': 'rejected'},
+        ]
+        homework_module.report_changes(
+            None, index, index.diff(homeworks), store
+        )
+        store.close()
+        text = '\n'.join(sent)
+        assert '"a.zip"' in text and '"c.zip"' in text, (
+            'Верные дз пачки должны пройти через outbox, несмотря на неверную.'
+        )
+        assert '"b.zip"' not in text
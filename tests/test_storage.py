@@ -0,0 +1,148 @@
+import sqlite3
+
+
+class TestStateStore:
+
+    def test_state_survives_restart(self, tmp_path):
+        from storage import StateStore
+
+        path = str(tmp_path / 'state.sqlite3')
+        store = StateStore(path, flush_every=1000, flush_interval=1000)
+        store.save_watermark('tenant', 1000198000)
+        assert store.enqueue(
+            'tenant', '1:approved:2021-04-11T10:31:09Z', '42', 'Принято'
+        )
+        assert store.pending() == 2
+        assert store.load_watermark('tenant') == 1000198000
+        store.close()
+
+        restored = StateStore(path)
+        assert restored.load_watermarks() == {'tenant': 1000198000}, (
+            'Водяной знак должен восстанавливаться после перезапуска.'
+        )
+        assert not restored.enqueue(
+            'tenant', '1:approved:2021-04-11T10:31:09Z', '42', 'Принято'
+        ), 'Статус не должен попадать в outbox повторно.'
+        [message] = restored.pending_messages()
+        assert (message.chat_id, message.text) == ('42', 'Принято')
+        restored.mark_sent(message.id)
+        assert restored.is_delivered(
+            'tenant', '1:approved:2021-04-11T10:31:09Z'
+        )
+        assert not restored.is_delivered('tenant', '1:rejected:x')
+        assert restored.pending_messages() == []
+        restored.close()
+
+    def test_writes_are_batched(self, tmp_path):
+        from storage import StateStore
+
+        path = str(tmp_path / 'state.sqlite3')
+        store = StateStore(path, flush_every=3, flush_interval=1000)
+        store.save_watermark('a', 1)
+        store.save_watermark('b', 2)
+        count = sqlite3.connect(path).execute(
+            'SELECT COUNT(*) FROM watermarks'
+        ).fetchone()[0]
+        assert count == 0, 'Записи должны накапливаться до сброса.'
+        store.save_watermark('c', 3)
+        assert store.pending() == 0
+        mode = store._conn.execute('PRAGMA journal_mode').fetchone()[0]
+        assert mode == 'wal'
+        store.close()
+
+    def test_outbox_keeps_failed_messages(
+            self, tmp_path, monkeypatch, homework_module
+    ):
+        from storage import StateStore
+
+        store = StateStore(str(tmp_path / 'state.sqlite3'))
+        for number in range(3):
+            store.enqueue(
+                'tenant', f'{number}:approved:x', str(number), f'#{number}'
+            )
+        results = iter([True, False, True, True])
+        sent = []
+
+        def send_to_chat(bot, chat_id, message):
+            ok = next(results)
+            if ok:
+                sent.append(message)
+            return ok
+
+        monkeypatch.setattr(homework_module, 'send_to_chat', send_to_chat)
+        assert homework_module.drain_outbox(None, store) == 1
+        assert homework_module.drain_outbox(None, store) == 2
+        assert sent == ['#0', '#1', '#2'], (
+            'Неотправленное сообщение должно уйти при следующей выгрузке.'
+        )
+        assert homework_module.drain_outbox(None, store) == 0
+        store.close()
+
+    def test_failed_messages_are_retried_with_backoff(self, tmp_path):
+        from storage import StateStore
+
+        store = StateStore(str(tmp_path / 'state.sqlite3'), retry_delay=0)
+        store.enqueue('tenant', '1:approved:x', '42', 'Принято')
+        [message] = store.pending_messages()
+        for _ in range(12):
+            store.mark_failed(message.id)
+        assert store.pending_messages() == [message], (
+            'Сообщение нельзя терять после череды временных ошибок.'
+        )
+        assert not store.enqueue('tenant', '1:approved:x', '42', 'Принято')
+        store.retry_delay = 60
+        store.mark_failed(message.id)
+        assert store.pending_messages() == [], (
+            'Повторы должны выполняться с растущей паузой.'
+        )
+        store.close()
+
+    def test_permanent_failure_is_dropped_and_counted(self, tmp_path, caplog):
+        import metrics
+        from storage import StateStore
+
+        before = metrics.OUTBOX_DROPPED.values['permanent_error']
+        store = StateStore(str(tmp_path / 'state.sqlite3'), retry_delay=0)
+        store.enqueue('tenant', '1:approved:x', '42', 'Принято')
+        [message] = store.pending_messages()
+        store.mark_failed(message.id, permanent=True)
+        assert store.pending_messages() == []
+        assert metrics.OUTBOX_DROPPED.values['permanent_error'] == before + 1
+        assert f'Сообщение outbox {message.id} отброшено' in caplog.text
+        store.close()
+
+    def test_old_outbox_is_migrated(self, tmp_path):
+        from storage import StateStore
+
+        path = str(tmp_path / 'state.sqlite3')
+        conn = sqlite3.connect(path)
+        conn.execute(
+            'CREATE TABLE outbox (id INTEGER PRIMARY KEY, tenant TEXT '
+            'NOT NULL, fingerprint TEXT NOT NULL, chat_id TEXT NOT NULL, '
+            'text TEXT NOT NULL, created REAL NOT NULL, attempts INTEGER '
+            'NOT NULL DEFAULT 0, delivered REAL, '
+            'UNIQUE (tenant, fingerprint))'
+        )
+        conn.execute(
+            "INSERT INTO outbox (tenant, fingerprint, chat_id, text, created) "
+            "VALUES ('tenant', 'key', '42', 'Принято', 0)"
+        )
+        conn.commit()
+        conn.close()
+        store = StateStore(path)
+        assert [message.text for message in store.pending_messages()] == [
+            'Принято'
+        ]
+        store.close()
+
+    def test_main_resumes_from_saved_timestamp(
+            self, tmp_path, homework_module
+    ):
+        from storage import StateStore, tenant_key
+
+        store = StateStore(str(tmp_path / 'state.sqlite3'))
+        key = tenant_key('sometoken')
+        store.save_watermark(key, 1000198000)
+        assert homework_module.restore_timestamp(store, key) == 1000198000
+        assert homework_module.restore_timestamp(None, key) > 1000198000
+        store.close()
@@ -0,0 +1,67 @@
+import json
+
+import pytest
+
+from exceptions import CurrentDateKeyError, JSONError
+
+
+def chunked(data, size=7):
+    raw = json.dumps(data, ensure_ascii=False).encode()
+    return [raw[i:i + size] for i in range(0, len(raw), size)]
+
+
+class TestHomeworkStream:
+
+    def test_items_are_parsed_incrementally(self, homework_module):
+        from streaming import HomeworkStream, check_stream
+
+        homeworks = [
+            {'id': number, 'homework_name': f'дз_{number}.zip',
+             'status': 'approved', 'reviewer_comment': 'Принято!'}
+            for number in range(50)
+        ]
+        data = {'homeworks': homeworks, 'current_date': 1000198991}
+        stream = HomeworkStream(chunked(data))
+        messages = [
+            homework_module.parse_status(hw) for hw in check_stream(stream)
+        ]
+        assert len(messages) == 50
+        assert '"дз_49.zip"' in messages[-1]
+        assert stream.meta['current_date'] == 1000198991
+
+    def test_generator_does_not_read_ahead(self):
+        from streaming import HomeworkStream
+
+        data = {'current_date': 1,
+                'homeworks': [{'id': 1}, {'id': 2}, {'id': 3}]}
+        all_chunks = chunked(data, size=4)
+        read = []
+
+        def chunks():
+            for chunk in all_chunks:
+                read.append(chunk)
+                yield chunk
+
+        items = iter(HomeworkStream(chunks()))
+        assert next(items) == {'id': 1}
+        assert len(read) < len(all_chunks), (
+            'Поток должен читаться по мере потребления элементов.'
+        )
+
+    @pytest.mark.parametrize('data, error', [
+        ([], TypeError),
+        ({'homeworks': {}, 'current_date': 1}, TypeError),
+        ({'current_date': 1}, KeyError),
+        ({'homeworks': []}, CurrentDateKeyError),
+    ])
+    def test_invalid_responses(self, data, error):
+        from streaming import HomeworkStream, check_stream
+
+        with pytest.raises(error):
+            list(check_stream(HomeworkStream(chunked(data))))
+
+    def test_broken_json(self):
+        from streaming import HomeworkStream
+
+        with pytest.raises(JSONError):
+            list(HomeworkStream([b'{"homeworks": [{"id": 1}, {"id"']))
@@ -0,0 +1,103 @@
+import multiprocessing
+import time
+
+
+def report_and_exit(name, tenants, stats):
+    stats.put((name, {'polls': len(tenants)}))
+
+
+def sleep_forever(name, tenants, stats):
+    time.sleep(60)
+
+
+def make_tenants(count):
+    return [
+        {'token': f'token-{number}', 'chat_id': str(number)}
+        for number in range(count)
+    ]
+
+
+class TestHashRing:
+
+    def test_shards_are_balanced(self):
+        from supervisor import HashRing, worker_names
+
+        ring = HashRing(worker_names(4))
+        keys = [f'tenant-{number}' for number in range(4000)]
+        sizes = [len(shard) for shard in ring.assign(keys).values()]
+        assert sum(sizes) == len(keys)
+        assert min(sizes) > 600 and max(sizes) < 1400, (
+            f'Шарды распределены слишком неравномерно: {sizes}'
+        )
+
+    def test_adding_worker_moves_minimal_slice(self):
+        from supervisor import HashRing, worker_names
+
+        ring = HashRing(worker_names(4))
+        keys = [f'tenant-{number}' for number in range(4000)]
+        before = {key: ring.node_for(key) for key in keys}
+        ring.add('worker-4')
+        moved = [key for key in keys if ring.node_for(key) != before[key]]
+        assert all(ring.node_for(key) == 'worker-4' for key in moved), (
+            'Арендаторы должны переезжать только на новый воркер.'
+        )
+        assert len(moved) < len(keys) * 0.3
+
+        ring.remove('worker-4')
+        assert {key: ring.node_for(key) for key in keys} == before, (
+            'После удаления воркера раскладка должна вернуться.'
+        )
+
+
+class TestSupervisor:
+
+    def make_supervisor(self, target, workers=2, tenants=20):
+        from supervisor import Supervisor
+
+        return Supervisor(
+            make_tenants(tenants), workers=workers, target=target,
+            restart_delay=0, context=multiprocessing.get_context('fork')
+        )
+
+    def test_restarts_dead_workers_and_collects_stats(self):
+        supervisor = self.make_supervisor(report_and_exit)
+        try:
+            assert sorted(supervisor.rebalance()) == ['worker-0', 'worker-1']
+            for process in supervisor.processes.values():
+                process.join(5)
+            assert sorted(supervisor.check()) == ['worker-0', 'worker-1']
+            assert supervisor.restarts == {'worker-0': 1, 'worker-1': 1}
+
+            deadline = time.monotonic() + 5
+            while len(supervisor.collect()) < 2:
+                assert time.monotonic() < deadline, 'Нет статистики шардов.'
+                time.sleep(0.05)
+            stats = supervisor.stats()
+            assert sum(shard['polls'] for shard in stats.values()) == 20
+            assert sum(shard['tenants'] for shard in stats.values()) == 20
+        finally:
+            supervisor.stop()
+
+    def test_resize_restarts_only_changed_shards(self):
+        supervisor = self.make_supervisor(sleep_forever, workers=3)
+        try:
+            supervisor.rebalance()
+            before = {
+                name: list(tenants)
+                for name, tenants in supervisor.shards.items()
+            }
+            processes = dict(supervisor.processes)
+            restarted = supervisor.resize(4)
+            assert 'worker-3' in restarted
+            for name, tenants in before.items():
+                if supervisor.shards[name] == tenants:
+                    assert supervisor.processes[name] is processes[name], (
+                        'Воркер с неизменным шардом не должен перезапускаться.'
+                    )
+            assert not processes.keys() - supervisor.processes.keys()
+
+            supervisor.resize(2)
+            assert set(supervisor.processes) == {'worker-0', 'worker-1'}
+            assert not processes['worker-2'].is_alive()
+        finally:
+            supervisor.stop()
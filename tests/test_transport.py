@@ -0,0 +1,246 @@
+import gzip
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        body = b'{"homeworks": [], "current_date": 1}'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class ETagHandler(KeepAliveHandler):
+    etag = '"v1"'
+
+    def do_GET(self):
+        if self.headers.get('If-None-Match') == self.etag:
+            self.send_response(304)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        body = gzip.compress(b'{"homeworks": [], "current_date": 7}')
+        self.send_response(200)
+        self.send_header('ETag', self.etag)
+        self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def serve(handler):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+@pytest.fixture
+def local_server():
+    server = serve(KeepAliveHandler)
+    yield f'http://127.0.0.1:{server.server_port}/'
+    server.shutdown()
+    server.server_close()
+
+
+class TestPooledTransport:
+
+    def test_connections_are_reused(self, local_server):
+        from transport import PooledTransport
+
+        transport = PooledTransport(pool_connections=1, pool_maxsize=1)
+        for _ in range(5):
+            assert transport.get(local_server).json()['current_date'] == 1
+        transport.close()
+
+        stats = transport.stats()
+        assert stats['requests'] == 5
+        assert stats['connections_opened'] == 1, (
+            'Соединение с сервером должно переиспользоваться.'
+        )
+        assert stats['reuse_rate'] == pytest.approx(0.8)
+
+    def test_request_api_accepts_transport(
+            self, local_server, monkeypatch, homework_module
+    ):
+        from transport import PooledTransport
+
+        monkeypatch.setattr(homework_module, 'ENDPOINT', local_server)
+        transport = PooledTransport()
+        response = homework_module.request_api(
+            0, homework_module.make_headers('token'), transport
+        )
+        transport.close()
+        assert response == {'homeworks': [], 'current_date': 1}
+        assert transport.stats()['requests'] == 1
+
+
+class TestConditionalTransport:
+
+    def test_not_modified_returns_cached_answer(self):
+        import metrics
+        from transport import ConditionalTransport, PooledTransport
+
+        server = serve(ETagHandler)
+        url = f'http://127.0.0.1:{server.server_port}/'
+        transport = ConditionalTransport(PooledTransport())
+        headers = {'Authorization': 'OAuth token'}
+        saved_before = metrics.API_BYTES.values['saved']
+        try:
+            first = transport.get(url, headers=headers).json()
+            answer = transport.get(url, headers=headers)
+            second = answer.json()
+        finally:
+            transport.close()
+            server.shutdown()
+            server.server_close()
+
+        assert first == {'homeworks': [], 'current_date': 7}
+        assert second is first, (
+            'Неизменившийся ответ не должен декодироваться повторно.'
+        )
+        assert answer.poll['not_modified'] == 1, (
+            'Счётчики опроса должны возвращаться вместе с ответом.'
+        )
+        assert transport.stats()['bytes_saved'] > 0
+        assert metrics.API_BYTES.values['saved'] > saved_before
+
+    def test_identical_body_skips_decoding(self, local_server):
+        from transport import ConditionalTransport
+
+        transport = ConditionalTransport()
+        first = transport.get(local_server).json()
+        answer = transport.get(local_server)
+        second = answer.json()
+
+        assert second is first
+        assert answer.poll['decode_skipped'] == 1
+        assert transport.totals['polls'] == 2
+
+
+class SlowThenFast:
+    def __init__(self, delays):
+        self.delays = list(delays)
+        self.lock = threading.Lock()
+
+    def get(self, url, **kwargs):
+        with self.lock:
+            delay = self.delays.pop(0)
+        time.sleep(delay)
+        return FakeResponse(delay)
+
+
+class FakeResponse:
+    def __init__(self, delay):
+        self.delay = delay
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class TestHedgedTransport:
+
+    def test_slow_request_is_hedged(self):
+        from transport import HedgedTransport
+
+        transport = HedgedTransport(
+            SlowThenFast([0.5, 0.01]), deadline=1, hedge_after=0.05
+        )
+        started = time.monotonic()
+        response = transport.get('http://example/')
+        transport.close()
+        assert response.delay == 0.01
+        assert time.monotonic() - started < 0.3, (
+            'Дублирующий запрос должен сократить время ответа.'
+        )
+        assert transport.counters['hedge_won'] == 1
+
+    def test_deadline_raises_timeout(self):
+        from transport import HedgedTransport
+
+        transport = HedgedTransport(
+            SlowThenFast([0.5]), deadline=0.05, hedge=False
+        )
+        with pytest.raises(requests.Timeout):
+            transport.get('http://example/')
+        transport.close()
+        assert transport.counters['deadline_exceeded'] == 1
+
+    def test_queue_wait_does_not_count_against_deadline(self):
+        from transport import HedgedTransport
+
+        transport = HedgedTransport(
+            SlowThenFast([0.4, 0.2]), deadline=1, hedge=False, workers=1
+        )
+        busy = threading.Thread(target=transport.get, args=('http://a/',))
+        busy.start()
+        time.sleep(0.05)
+        # Очередь (~0.35 с) и запрос (0.2 с) укладываются в срок по
+        # отдельности, но не вместе.
+        transport.deadline = 0.45
+        response = transport.get('http://b/')
+        busy.join()
+        transport.close()
+        assert response.delay == 0.2, (
+            'Срок запроса должен отсчитываться с его начала, '
+            'а не с постановки в очередь пула.'
+        )
+
+    def test_busy_pool_times_out(self):
+        from transport import HedgedTransport
+
+        transport = HedgedTransport(
+            SlowThenFast([0.5]), deadline=1, hedge=False, workers=1
+        )
+        busy = threading.Thread(target=transport.get, args=('http://a/',))
+        busy.start()
+        time.sleep(0.05)
+        transport.deadline = 0.1
+        with pytest.raises(requests.Timeout):
+            transport.get('http://b/')
+        busy.join()
+        transport.close()
+
+    def test_main_poll_has_overall_deadline(
+            self, monkeypatch, homework_module
+    ):
+        def mock_get(url, **kwargs):
+            time.sleep(0.5)
+            raise AssertionError('Ответ не должен дожидаться конца.')
+
+        monkeypatch.setattr(requests, 'get', mock_get)
+        transport = homework_module.poll_transport()
+        monkeypatch.setattr(transport, 'deadline', 0.1)
+        started = time.monotonic()
+        with pytest.raises(homework_module.GetApiError):
+            homework_module.get_api_answer(0)
+        assert time.monotonic() - started < 0.4, (
+            'Опрос в main() должен ограничиваться общим сроком.'
+        )
+
+    def test_request_api_passes_timeouts(self, monkeypatch, homework_module):
+        seen = {}
+
+        def mock_get(url, **kwargs):
+            seen.update(kwargs)
+            raise requests.ConnectTimeout('timeout')
+
+        monkeypatch.setattr(requests, 'get', mock_get)
+        with pytest.raises(homework_module.GetApiError):
+            homework_module.get_api_answer(0)
+        assert seen['timeout'] == (
+            homework_module.CONNECT_TIMEOUT, homework_module.READ_TIMEOUT
+        ), 'Запрос к API должен выполняться с таймаутами.'
@@ -0,0 +1,482 @@
+import hashlib
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from http import HTTPStatus
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+import metrics
+from response_cache import cache_key
+
+POOL_CONNECTIONS = int(os.getenv('HTTP_POOL_CONNECTIONS', 4))
+POOL_MAXSIZE = int(os.getenv('HTTP_POOL_MAXSIZE', 32))
+KEEPALIVE_IDLE = int(os.getenv('HTTP_KEEPALIVE_IDLE', 60))
+POLL_DEADLINE = float(os.getenv('POLL_DEADLINE', 45))
+HEDGE_REQUESTS = os.getenv('HEDGE_REQUESTS', '') not in ('', '0')
+HEDGE_WORKERS = int(os.getenv('HEDGE_WORKERS', 32))
+HEDGE_QUANTILE = 0.95
+HEDGE_MIN_SAMPLES = 20
+LATENCY_WINDOW = 200
+
+try:
+    import brotli  # noqa: F401
+except ImportError:
+    ACCEPT_ENCODING = 'gzip, deflate'
+else:
+    ACCEPT_ENCODING = 'gzip, deflate, br'
+
+logger = logging.getLogger(__name__)
+
+
+class ConnectionCounter:
+    """Потокобезопасный счётчик открытых TCP-соединений."""
+
+    def __init__(self):
+        """Счётчик с нуля."""
+        self._lock = threading.Lock()
+        self.value = 0
+
+    def increment(self):
+        """Увеличивает счётчик на единицу."""
+        with self._lock:
+            self.value += 1
+
+
+def _counting_pool(base, counter):
+    """Создаёт класс пула, который учитывает новые соединения."""
+    class CountingPool(base):
+        def _new_conn(self):
+            counter.increment()
+            return super()._new_conn()
+
+    return CountingPool
+
+
+def keepalive_socket_options(idle=KEEPALIVE_IDLE):
+    """Опции сокета для TCP keepalive поверх стандартных опций urllib3."""
+    options = list(HTTPConnection.default_socket_options)
+    options.append((socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1))
+    if hasattr(socket, 'TCP_KEEPIDLE'):
+        options.append((socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, idle))
+        options.append((socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, idle))
+    return options
+
+
+class KeepAliveAdapter(HTTPAdapter):
+    """HTTP-адаптер с keepalive-сокетами и учётом новых соединений."""
+
+    def __init__(self, counter, keepalive_idle=KEEPALIVE_IDLE, **kwargs):
+        """Адаптер, считающий соединения в `counter`."""
+        self.counter = counter
+        self.keepalive_idle = keepalive_idle
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        """Настраивает менеджер пулов: keepalive и подсчёт соединений."""
+        kwargs['socket_options'] = keepalive_socket_options(
+            self.keepalive_idle
+        )
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _counting_pool(HTTPConnectionPool, self.counter),
+            'https': _counting_pool(HTTPSConnectionPool, self.counter),
+        }
+
+
+class PooledTransport:
+    """Общая для всех арендаторов сессия с ограниченным пулом соединений.
+
+    Повторно использует TCP+TLS соединения с эндпоинтом вместо нового
+    рукопожатия на каждый запрос. Совместима с `requests` по методу `get`.
+    """
+
+    def __init__(self, pool_connections=POOL_CONNECTIONS,
+                 pool_maxsize=POOL_MAXSIZE, keepalive_idle=KEEPALIVE_IDLE):
+        """Сессия с пулом на `pool_maxsize` соединений к хосту."""
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.connections = ConnectionCounter()
+        self.session = requests.Session()
+        adapter = KeepAliveAdapter(
+            self.connections,
+            keepalive_idle=keepalive_idle,
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            pool_block=True,
+        )
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def get(self, url, **kwargs):
+        """Выполняет GET-запрос через общий пул соединений."""
+        with self._lock:
+            self.requests += 1
+        return self.session.get(url, **kwargs)
+
+    def stats(self):
+        """Счётчики повторного использования соединений."""
+        opened = self.connections.value
+        reused = max(self.requests - opened, 0)
+        return {
+            'requests': self.requests,
+            'connections_opened': opened,
+            'connections_reused': reused,
+            'reuse_rate': reused / self.requests if self.requests else 0.0,
+        }
+
+    def close(self):
+        """Закрывает все соединения пула."""
+        self.session.close()
+
+
+class CachedAnswer:
+    """Ответ API, тело которого разбирается не более одного раза.
+
+    `poll` — счётчики трафика именно этого опроса, если ответ прошёл
+    через `ConditionalTransport`.
+    """
+
+    def __init__(self, entry, status_code=HTTPStatus.OK, poll=None):
+        """Ответ из записи кэша `entry`."""
+        self.status_code = status_code
+        self._entry = entry
+        self.poll = poll
+
+    @property
+    def content(self):
+        """Тело ответа в байтах."""
+        return self._entry.body
+
+    def json(self):
+        """Возвращает разобранное тело, декодируя JSON только при смене."""
+        if self._entry.parsed is None:
+            self._entry.parsed = json.loads(self._entry.body)
+        return self._entry.parsed
+
+
+class _Entry:
+    __slots__ = ('etag', 'digest', 'body', 'parsed')
+
+    def __init__(self, etag, digest, body):
+        self.etag = etag
+        self.digest = digest
+        self.body = body
+        self.parsed = None
+
+
+class ConditionalTransport:
+    """Экономный режим запросов поверх другого транспорта.
+
+    Запрашивает сжатый ответ, отправляет If-None-Match с последним ETag
+    и возвращает уже разобранный ответ, если тело не изменилось
+    побайтно. Последний ответ хранится отдельно для каждого токена.
+    """
+
+    def __init__(self, inner=None):
+        """Оборачивает транспорт `inner` (по умолчанию `requests`)."""
+        self.inner = inner or requests
+        self._lock = threading.Lock()
+        self._entries = {}
+        self.totals = {
+            'polls': 0,
+            'not_modified': 0,
+            'decode_skipped': 0,
+            'bytes_on_wire': 0,
+            'bytes_saved': 0,
+        }
+
+    def get(self, url, headers=None, **kwargs):
+        """Выполняет условный GET-запрос."""
+        headers = dict(headers or {})
+        key = (url, headers.get('Authorization'))
+        entry = self._entries.get(key)
+        headers.setdefault('Accept-Encoding', ACCEPT_ENCODING)
+        if entry is not None and entry.etag:
+            headers['If-None-Match'] = entry.etag
+        response = self.inner.get(url, headers=headers, **kwargs)
+        if response.status_code == HTTPStatus.NOT_MODIFIED and entry:
+            poll = self._account(0, len(entry.body), not_modified=True)
+            return CachedAnswer(entry, poll=poll)
+        if response.status_code != HTTPStatus.OK:
+            return response
+        body = response.content
+        wire = _wire_bytes(response, body)
+        digest = hashlib.blake2b(body, digest_size=16).digest()
+        if entry is not None and entry.digest == digest:
+            poll = self._account(wire, len(body) - wire, decode_skipped=True)
+            return CachedAnswer(entry, poll=poll)
+        entry = _Entry(response.headers.get('ETag'), digest, body)
+        self._entries[key] = entry
+        return CachedAnswer(entry, poll=self._account(wire, len(body) - wire))
+
+    def _account(self, wire, saved, not_modified=False,
+                 decode_skipped=False):
+        poll = {
+            'bytes_on_wire': wire,
+            'bytes_saved': max(saved, 0),
+            'not_modified': int(not_modified),
+            'decode_skipped': int(decode_skipped or not_modified),
+        }
+        with self._lock:
+            self.totals['polls'] += 1
+            for name, value in poll.items():
+                self.totals[name] += value
+        metrics.API_BYTES.inc('on_wire', poll['bytes_on_wire'])
+        metrics.API_BYTES.inc('saved', poll['bytes_saved'])
+        if not_modified:
+            metrics.CONDITIONAL.inc('not_modified')
+        elif decode_skipped:
+            metrics.CONDITIONAL.inc('decode_skipped')
+        else:
+            metrics.CONDITIONAL.inc('changed')
+        return poll
+
+    def stats(self):
+        """Счётчики сэкономленного трафика и внутреннего транспорта."""
+        stats = dict(self.totals)
+        if hasattr(self.inner, 'stats'):
+            stats.update(self.inner.stats())
+        return stats
+
+    def close(self):
+        """Закрывает внутренний транспорт."""
+        if hasattr(self.inner, 'close'):
+            self.inner.close()
+
+
+class CachingTransport:
+    """Кэш ответов поверх другого транспорта.
+
+    Успешные ответы запоминаются по ключу (хеш токена, from_date), и
+    такой же опрос в пределах TTL — например, для второго чата того же
+    студента — обслуживается без запроса к API. Одновременные одинаковые
+    промахи ждут друг друга, и в API уходит один запрос.
+    """
+
+    def __init__(self, cache, inner=None):
+        """Кэш `cache` поверх транспорта `inner`."""
+        self.cache = cache
+        self.inner = inner or requests
+        # Промахи, за которыми уже ушёл запрос: ключ -> событие готовности.
+        self._flights = {}
+        self._lock = threading.Lock()
+        self.counters = {'cache_hits': 0, 'cache_misses': 0}
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def _cached(self, key):
+        body = self.cache.get(key)
+        if body is None:
+            return None
+        self._count('cache_hits')
+        return CachedAnswer(_Entry(None, None, body))
+
+    def _lead(self, key):
+        """Ответ из кэша или событие, которое нужно выставить после запроса.
+
+        Пока за ключом идёт чужой запрос, ждём только его: запросы
+        с другими ключами друг друга не задерживают.
+        """
+        while True:
+            answer = self._cached(key)
+            if answer is not None:
+                return answer, None
+            with self._lock:
+                flight = self._flights.get(key)
+                if flight is None:
+                    flight = self._flights[key] = threading.Event()
+                    return None, flight
+            flight.wait()
+
+    def get(self, url, headers=None, params=None, **kwargs):
+        """GET-запрос, который берётся из кэша, если ответ ещё свежий."""
+        key = cache_key(
+            (headers or {}).get('Authorization'),
+            (params or {}).get('from_date')
+        )
+        answer, flight = self._lead(key)
+        if answer is not None:
+            return answer
+        try:
+            self._count('cache_misses')
+            response = self.inner.get(
+                url, headers=headers, params=params, **kwargs
+            )
+            if response.status_code == HTTPStatus.OK:
+                self.cache.put(key, response.content)
+            return response
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.set()
+
+    def stats(self):
+        """Попадания в кэш и счётчики внутреннего транспорта."""
+        stats = dict(self.counters)
+        if hasattr(self.inner, 'stats'):
+            stats.update(self.inner.stats())
+        return stats
+
+    def close(self):
+        """Закрывает кэш и внутренний транспорт."""
+        for part in (self.cache, self.inner):
+            if hasattr(part, 'close'):
+                part.close()
+
+
+def _wire_bytes(response, body):
+    """Число байт, фактически полученных по сети (до распаковки)."""
+    raw = getattr(response, 'raw', None)
+    try:
+        return int(raw.tell())
+    except (AttributeError, TypeError, ValueError):
+        return len(body)
+
+
+class LatencyWindow:
+    """Скользящее окно длительностей успешных запросов."""
+
+    def __init__(self, size=LATENCY_WINDOW, min_samples=HEDGE_MIN_SAMPLES):
+        """Окно из последних `size` задержек."""
+        self.min_samples = min_samples
+        self._values = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, value):
+        """Добавляет наблюдение."""
+        with self._lock:
+            self._values.append(value)
+
+    def quantile(self, share):
+        """Квантиль окна или None, пока наблюдений слишком мало."""
+        with self._lock:
+            if len(self._values) < self.min_samples:
+                return None
+            ordered = sorted(self._values)
+        return ordered[min(int(len(ordered) * share), len(ordered) - 1)]
+
+
+def _close_response(future):
+    if not future.cancelled() and future.exception() is None:
+        future.result().close()
+
+
+class HedgedTransport:
+    """Запросы со сроком на весь опрос и дублированием медленных.
+
+    Если ответ не пришёл за p95 последних запросов, отправляется второй
+    такой же запрос и берётся тот, что ответит первым. Если ни один не
+    ответил за `deadline` секунд, выбрасывается `requests.Timeout`.
+    Проигравший запрос дорабатывает в фоне и ограничен таймаутами чтения.
+    Пулу `workers` нужно по два потока на каждый одновременный запрос.
+    """
+
+    def __init__(self, inner=None, deadline=POLL_DEADLINE, hedge=True,
+                 hedge_after=None, workers=HEDGE_WORKERS):
+        """Транспорт `inner` с дедлайном и дублирующими запросами."""
+        self.inner = inner or requests
+        self.deadline = deadline
+        self.hedge = hedge
+        self.hedge_after = hedge_after
+        self.latencies = LatencyWindow()
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix='hedge'
+        )
+        self._lock = threading.Lock()
+        self.counters = {
+            'requests': 0, 'hedged': 0, 'hedge_won': 0,
+            'deadline_exceeded': 0,
+        }
+
+    def hedge_delay(self):
+        """Через сколько секунд дублировать запрос (None — не дублировать)."""
+        if not self.hedge:
+            return None
+        if self.hedge_after is not None:
+            return self.hedge_after
+        return self.latencies.quantile(HEDGE_QUANTILE)
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def _timed_get(self, url, kwargs, running=None):
+        if running is not None:
+            running.set()
+        started = time.perf_counter()
+        response = self.inner.get(url, **kwargs)
+        self.latencies.add(time.perf_counter() - started)
+        return response
+
+    def _start(self, url, kwargs):
+        # Срок и задержка дубля отсчитываются от начала запроса, а не от
+        # постановки в очередь пула; сама очередь ограничена тем же сроком.
+        running = threading.Event()
+        future = self._executor.submit(self._timed_get, url, kwargs, running)
+        if not running.wait(self.deadline):
+            future.cancel()
+            self._count('deadline_exceeded')
+            raise requests.Timeout(
+                f'Запрос не начался за {self.deadline:.0f} с: пул занят'
+            )
+        return future
+
+    def get(self, url, **kwargs):
+        """Выполняет GET-запрос с дублированием и общим сроком."""
+        self._count('requests')
+        first = self._start(url, kwargs)
+        deadline = time.monotonic() + self.deadline
+        pending = {first}
+        delay = self.hedge_delay()
+        if delay is not None and not wait(
+                pending, min(delay, self.deadline))[0]:
+            self._count('hedged')
+            pending.add(self._executor.submit(self._timed_get, url, kwargs))
+        error = None
+        while pending:
+            done, pending = wait(
+                pending, max(deadline - time.monotonic(), 0), FIRST_COMPLETED
+            )
+            if not done:
+                break
+            for future in done:
+                if future.exception() is None:
+                    for loser in pending:
+                        loser.add_done_callback(_close_response)
+                    if future is not first:
+                        self._count('hedge_won')
+                    return future.result()
+                error = future.exception()
+        if error is not None and not pending:
+            raise error
+        for loser in pending:
+            loser.add_done_callback(_close_response)
+        self._count('deadline_exceeded')
+        raise requests.Timeout(
+            f'Ответ не получен за {self.deadline:.0f} с'
+        )
+
+    def stats(self):
+        """Счётчики дублирования и p95 длительности запросов."""
+        stats = dict(self.counters)
+        stats['latency_p95'] = self.latencies.quantile(HEDGE_QUANTILE)
+        if hasattr(self.inner, 'stats'):
+            stats.update(self.inner.stats())
+        return stats
+
+    def close(self):
+        """Останавливает пул потоков и внутренний транспорт."""
+        self._executor.shutdown(wait=False)
+        if hasattr(self.inner, 'close'):
+            self.inner.close()